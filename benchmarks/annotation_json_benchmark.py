@@ -0,0 +1,86 @@
+"""
+Checks that BoxAnnotation emits JSON byte-identical to the sly.Annotation path used before
+and compares their speed. Boxes include fractional, degenerate and out of image coordinates.
+Exits with code 1 if any annotation differs.
+
+Usage:
+    python benchmarks/annotation_json_benchmark.py --images 2000 --boxes 50
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from utils import add_src_to_path
+
+add_src_to_path()
+
+import supervisely as sly  # noqa: E402
+
+from annotation import BoxAnnotation  # noqa: E402
+from labels import denormalize_boxes  # noqa: E402
+
+
+def build_sly_json(height, width, class_ids, rects, obj_classes, tag_meta):
+    labels = [
+        sly.Label(sly.Rectangle(top, left, bottom, right), obj_classes[class_id])
+        for class_id, (top, left, bottom, right) in zip(class_ids.tolist(), rects.tolist())
+    ]
+    tags = sly.TagCollection(items=[sly.Tag(tag_meta)])
+    return sly.Annotation(img_size=(height, width), labels=labels, img_tags=tags).to_json()
+
+
+def generate_cases(images, boxes, classes, rng):
+    cases = []
+    for idx in range(images):
+        height, width = [int(x) for x in rng.integers(1, 2000, size=2)]
+        count = int(rng.integers(0, boxes * 2))
+        normalized = rng.uniform(-0.2, 1.2, size=(count, 4))
+        normalized[:, 2:] = np.abs(normalized[:, 2:]) * rng.choice([0, 0.1, 1], size=(count, 1))
+        if idx % 3 == 0:
+            # Coordinates exactly on pixel halves and borders.
+            normalized = np.round(normalized * 8) / 8
+        rects = denormalize_boxes(normalized, width, height)
+        cases.append((height, width, rng.integers(0, classes, size=count), rects))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=1000)
+    parser.add_argument("--boxes", type=int, default=20)
+    parser.add_argument("--classes", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    class_names = tuple(f"class_{idx}" for idx in range(args.classes))
+    obj_classes = [sly.ObjClass(name, sly.Rectangle) for name in class_names]
+    tag_meta = sly.TagMeta("train", sly.TagValueType.NONE)
+    cases = generate_cases(args.images, args.boxes, args.classes, rng)
+
+    start = time.perf_counter()
+    expected = [build_sly_json(*case, obj_classes, tag_meta) for case in cases]
+    sly_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [BoxAnnotation(*case, class_names, "train").to_json() for case in cases]
+    fast_seconds = time.perf_counter() - start
+
+    mismatches = sum(json.dumps(exp) != json.dumps(act) for exp, act in zip(expected, actual))
+    boxes = sum(len(case[2]) for case in cases)
+    result = {
+        "images": len(cases),
+        "boxes": boxes,
+        "mismatches": mismatches,
+        "sly_annotation": {"seconds": sly_seconds, "boxes_per_sec": boxes / sly_seconds},
+        "box_annotation": {"seconds": fast_seconds, "boxes_per_sec": boxes / fast_seconds},
+        "speedup": sly_seconds / fast_seconds,
+    }
+    print(json.dumps(result, indent=4))
+    sys.exit(1 if mismatches > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
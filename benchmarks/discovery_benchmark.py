@@ -0,0 +1,114 @@
+"""
+Compares discovery of projects in the input tree by the code used before (junk is removed
+by a recursive listing, config names are collected by another one, project directories are found
+by `sly.fs.dirs_with_marker` and every marker is probed in every project) with a single walk
+building `discovery.InputIndex`. The tree consists of empty files.
+Exits with code 1 if found projects differ.
+
+Usage:
+    python benchmarks/discovery_benchmark.py --files 1000000 --projects 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from utils import add_src_to_path
+
+add_src_to_path()
+
+import supervisely as sly  # noqa: E402
+
+from discovery import InputIndex  # noqa: E402
+from sources import LocalSource  # noqa: E402
+
+CONFIG_NAME = "data_config.yaml"
+SPLITS = ["train", "val"]
+
+
+def generate_tree(root_dir, files_count, projects_count):
+    """
+    Projects with images and labels of train and val datasets, about `files_count` files in total.
+    """
+    pairs_per_dataset = max(1, files_count // (projects_count * len(SPLITS) * 2))
+    for project_idx in range(projects_count):
+        project_dir = os.path.join(root_dir, f"project_{project_idx}")
+        for split in SPLITS:
+            for subdir, ext in [("images", ".jpg"), ("labels", ".txt")]:
+                dir_path = os.path.join(project_dir, subdir, split)
+                os.makedirs(dir_path)
+                for idx in range(pairs_per_dataset):
+                    open(os.path.join(dir_path, f"{idx:08d}{ext}"), "wb").close()
+        with open(os.path.join(project_dir, CONFIG_NAME), "w") as f:
+            f.write("names: [a]\nnc: 1\ntrain: images/train\nval: images/val\n")
+        with open(os.path.join(project_dir, ".DS_Store"), "wb") as f:
+            f.write(b"\0")
+    return pairs_per_dataset * projects_count * len(SPLITS) * 2
+
+
+def discover_old(root_dir):
+    sly.fs.remove_junk_from_dir(root_dir)
+    paths = sly.fs.list_files_recursively(root_dir, valid_extensions=".yaml")
+    markers = list(set(os.path.basename(path) for path in paths))
+    projects = []
+    for project_dir in sly.fs.dirs_with_marker(root_dir, markers, ignore_case=True):
+        for marker in markers:
+            config_path = os.path.join(project_dir, marker)
+            if sly.fs.file_exists(config_path):
+                break
+        projects.append((os.path.normpath(project_dir), config_path))
+    return sorted(projects)
+
+
+def discover_new(root_dir):
+    index = InputIndex(root_dir, LocalSource())
+    projects = index.find_projects(CONFIG_NAME)
+    # Datasets are resolved against the index instead of listing their directories.
+    for project in projects:
+        for split in SPLITS:
+            index.count_images(os.path.join(project.dir, "images", split))
+    return sorted((project.dir, project.config_path) for project in projects)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--projects", type=int, default=10)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="discovery_benchmark_")
+    try:
+        files_count = generate_tree(work_dir, args.files, args.projects)
+        # The new walk runs first, because the old code removes junk files from the tree.
+        start = time.perf_counter()
+        new_projects = discover_new(work_dir)
+        new_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        old_projects = discover_old(work_dir)
+        old_seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    same = old_projects == new_projects
+    print(
+        json.dumps(
+            {
+                "files": files_count,
+                "projects": len(new_projects),
+                "old_seconds": round(old_seconds, 3),
+                "new_seconds": round(new_seconds, 3),
+                "speedup": round(old_seconds / new_seconds, 2),
+                "same_projects": same,
+            },
+            indent=4,
+        )
+    )
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Compares extraction of archives by the code used before (`extractall` followed by junk cleanup
+passes) with `archive.extract_tar` / `archive.extract_zip`. Archives contain junk files
+(`__MACOSX`, `._*`, `.DS_Store`) and a member outside of the archive root.
+Exits with code 1 if extracted trees differ or the outside member is extracted.
+
+Usage:
+    python benchmarks/extract_benchmark.py --images 2000 --workers 4
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+from synthetic import generate_tree, pack
+from utils import add_src_to_path
+
+add_src_to_path()
+
+import supervisely as sly  # noqa: E402
+
+from archive import extract_tar, extract_zip  # noqa: E402
+
+ROOT_NAME = "project"
+OUTSIDE_MEMBER = "../outside.txt"
+
+
+def add_junk(project_dir):
+    images_dir = os.path.join(project_dir, "images", "train")
+    for name in sorted(os.listdir(images_dir))[:20]:
+        with open(os.path.join(images_dir, "._" + name), "wb") as f:
+            f.write(b"\0" * 4096)
+    macosx_dir = os.path.join(project_dir, "__MACOSX", "images")
+    os.makedirs(macosx_dir)
+    for name in sorted(os.listdir(images_dir))[:20]:
+        shutil.copy(os.path.join(images_dir, name), macosx_dir)
+    with open(os.path.join(project_dir, ".DS_Store"), "wb") as f:
+        f.write(b"\0" * 4096)
+
+
+def add_outside_member(archive_path):
+    data = b"must not be extracted"
+    if archive_path.endswith(".zip"):
+        with zipfile.ZipFile(archive_path, "a") as archive:
+            archive.writestr(OUTSIDE_MEMBER, data)
+        return
+    # Compressed tar can not be appended, so it is rewritten.
+    mode = {".tar": "", ".gz": "gz", ".xz": "xz"}[os.path.splitext(archive_path)[1]]
+    with tarfile.open(archive_path, "r:" + mode) as src:
+        members = [(member, src.extractfile(member)) for member in src.getmembers()]
+        with tarfile.open(archive_path + ".tmp", "w:" + mode) as dst:
+            for member, f in members:
+                dst.addfile(member, f)
+            info = tarfile.TarInfo(OUTSIDE_MEMBER)
+            info.size = len(data)
+            dst.addfile(info, io.BytesIO(data))
+    os.replace(archive_path + ".tmp", archive_path)
+
+
+def extract_old(archive_path, extract_dir):
+    if tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path) as archive:
+            archive.extractall(extract_dir)
+    else:
+        with zipfile.ZipFile(archive_path, "r") as archive:
+            archive.extractall(extract_dir)
+    for path in sly.fs.list_dir_recursively(
+        extract_dir, include_subdirs=True, use_global_paths=True
+    ):
+        if sly.fs.get_file_name_with_ext(path).startswith("._"):
+            sly.fs.silent_remove(path)
+    sly.fs.remove_junk_from_dir(extract_dir)
+
+
+def list_tree(root_dir):
+    return sorted(
+        (os.path.relpath(path, root_dir), os.path.getsize(path))
+        for cur_dir, _, files in os.walk(root_dir)
+        for path in [os.path.join(cur_dir, name) for name in files]
+    )
+
+
+def measure(fn, archive_path, work_dir):
+    # The extract dir is nested, so a member outside of it stays in the work dir.
+    extract_dir = os.path.join(work_dir, "out", ROOT_NAME)
+    outside_path = os.path.join(work_dir, "out", "outside.txt")
+    start = time.perf_counter()
+    fn(archive_path, extract_dir)
+    seconds = time.perf_counter() - start
+    tree = list_tree(extract_dir)
+    # `ZipFile.extractall` removes ".." from member names and extracts it into the root instead.
+    outside = os.path.exists(outside_path) or os.path.exists(
+        os.path.join(extract_dir, "outside.txt")
+    )
+    tree = [item for item in tree if item[0] != "outside.txt"]
+    shutil.rmtree(os.path.join(work_dir, "out"))
+    return seconds, tree, outside
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=500, help="images per split")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--workers", type=int, default=4, help="zip extraction threads")
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="the best time of repeats is reported"
+    )
+    parser.add_argument(
+        "--formats", nargs="+", default=[".tar", ".tar.gz", ".tar.xz", ".zip", ".deflated.zip"]
+    )
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="extract_benchmark_")
+    try:
+        project_dir = os.path.join(work_dir, ROOT_NAME)
+        generate_tree(project_dir, images_count=args.images, width=args.width, height=args.height)
+        add_junk(project_dir)
+
+        results = []
+        failed = False
+        for fmt in args.formats:
+            archive_path = os.path.join(work_dir, "archive" + fmt)
+            compression = zipfile.ZIP_DEFLATED if fmt == ".deflated.zip" else zipfile.ZIP_STORED
+            pack(project_dir, archive_path, compression)
+            add_outside_member(archive_path)
+
+            if fmt.endswith(".zip"):
+                new_fn = lambda path, extract_dir: extract_zip(path, extract_dir, args.workers)
+            else:
+                new_fn = extract_tar
+            old_seconds = new_seconds = float("inf")
+            # Runs alternate, so both implementations see the same state of page cache.
+            for _ in range(args.repeats):
+                seconds, old_tree, old_outside = measure(extract_old, archive_path, work_dir)
+                old_seconds = min(old_seconds, seconds)
+                seconds, new_tree, new_outside = measure(new_fn, archive_path, work_dir)
+                new_seconds = min(new_seconds, seconds)
+            same = old_tree == new_tree
+            failed = failed or not same or new_outside
+            results.append(
+                {
+                    "format": fmt,
+                    "archive_mb": round(os.path.getsize(archive_path) / 1024 / 1024, 2),
+                    "files": len(new_tree),
+                    "old_seconds": round(old_seconds, 4),
+                    "new_seconds": round(new_seconds, 4),
+                    "speedup": round(old_seconds / new_seconds, 2),
+                    "same_tree": same,
+                    "old_extracts_outside_member": old_outside,
+                    "new_extracts_outside_member": new_outside,
+                }
+            )
+        print(json.dumps(results, indent=4))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+In-process stand-in for `sly.Api` that implements the subset of methods used by the converter.
+Team Files are backed by a local directory, uploaded images and annotations are kept in memory.
+Optional `latency` (seconds per request) and `bandwidth` (bytes per second) simulate network.
+"""
+
+import base64
+import hashlib
+import io
+import itertools
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from PIL import Image
+
+ProjectInfo = namedtuple("ProjectInfo", ["id", "name", "workspace_id"])
+DatasetInfo = namedtuple("DatasetInfo", ["id", "name", "project_id"])
+ImageInfo = namedtuple(
+    "ImageInfo", ["id", "name", "dataset_id", "size", "hash", "meta", "width", "height"]
+)
+FileInfo = namedtuple("FileInfo", ["team_id", "path", "name", "sizeb"])
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class _Response:
+    def __init__(self, path, api):
+        self._path = path
+        self._api = api
+
+    def iter_content(self, chunk_size=COPY_CHUNK_SIZE):
+        with open(self._path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if len(chunk) == 0:
+                    return
+                self._api._simulate_network(len(chunk), requests=0)
+                yield chunk
+
+
+class _Entity:
+    def __init__(self, api):
+        self._api = api
+
+
+class FakeFileApi(_Entity):
+    def _local(self, remote_path):
+        return os.path.join(self._api.team_files_dir, remote_path.lstrip("/"))
+
+    def is_on_agent(self, remote_path):
+        return False
+
+    def listdir(self, team_id, path, recursive=False):
+        self._api._simulate_network(0)
+        local_dir = self._local(path)
+        return [os.path.join(path, name) for name in sorted(os.listdir(local_dir))]
+
+    def list(self, team_id, path, recursive=True, return_type="dict"):
+        self._api._simulate_network(0)
+        result = []
+        for cur_dir, _, files in os.walk(self._local(path)):
+            for file_name in sorted(files):
+                local_path = os.path.join(cur_dir, file_name)
+                remote_path = "/" + os.path.relpath(local_path, self._api.team_files_dir)
+                result.append(
+                    FileInfo(team_id, remote_path, file_name, os.path.getsize(local_path))
+                )
+            if not recursive:
+                break
+        return result
+
+    def get_info_by_path(self, team_id, remote_path):
+        self._api._simulate_network(0)
+        local_path = self._local(remote_path)
+        if not os.path.isfile(local_path):
+            return None
+        return FileInfo(
+            team_id, remote_path, os.path.basename(local_path), os.path.getsize(local_path)
+        )
+
+    def get_directory_size(self, team_id, path):
+        return sum(info.sizeb for info in self.list(team_id, path))
+
+    def download(self, team_id, remote_path, local_save_path, cache=None, progress_cb=None):
+        os.makedirs(os.path.dirname(local_save_path) or ".", exist_ok=True)
+        size = os.path.getsize(self._local(remote_path))
+        self._api._simulate_network(size)
+        shutil.copyfile(self._local(remote_path), local_save_path)
+        if progress_cb is not None:
+            progress_cb(size)
+
+    def download_directory(self, team_id, remote_path, local_save_path, progress_cb=None):
+        size = self.get_directory_size(team_id, remote_path)
+        self._api._simulate_network(size)
+        shutil.copytree(self._local(remote_path), local_save_path, dirs_exist_ok=True)
+        if progress_cb is not None:
+            progress_cb(size)
+
+
+class FakeProjectApi(_Entity):
+    def create(self, workspace_id, name, change_name_if_conflict=False, **kwargs):
+        self._api._simulate_network(0)
+        project = ProjectInfo(self._api._next_id(), name, workspace_id)
+        self._api.projects[project.id] = project
+        return project
+
+    def update_meta(self, id, meta):
+        self._api._simulate_network(0)
+        self._api.metas[id] = meta
+
+    def get_meta(self, id, **kwargs):
+        self._api._simulate_network(0)
+        return self._api.metas[id]
+
+    def get_info_by_id(self, id, **kwargs):
+        self._api._simulate_network(0)
+        return self._api.projects.get(id)
+
+
+class FakeDatasetApi(_Entity):
+    def create(self, project_id, name, change_name_if_conflict=False, **kwargs):
+        self._api._simulate_network(0)
+        dataset = DatasetInfo(self._api._next_id(), name, project_id)
+        self._api.datasets[dataset.id] = dataset
+        return dataset
+
+    def get_info_by_id(self, id, **kwargs):
+        self._api._simulate_network(0)
+        return self._api.datasets.get(id)
+
+    def get_list(self, project_id, **kwargs):
+        self._api._simulate_network(0)
+        return [
+            dataset for dataset in self._api.datasets.values() if dataset.project_id == project_id
+        ]
+
+
+def _get_file_hash(path):
+    with open(path, "rb") as f:
+        return base64.b64encode(hashlib.sha256(f.read()).digest()).decode("utf-8")
+
+
+class FakeImageApi(_Entity):
+    def check_existing_hashes(self, hashes, progress_cb=None):
+        self._api._simulate_network(0)
+        with self._api.lock:
+            return [h for h in hashes if h in self._api.payloads]
+
+    def _upload_data_bulk(
+        self, func_item_to_byte_stream, items_hashes, retry_cnt=3, progress_cb=None
+    ):
+        # Like the SDK: payloads are checked and sent once per unique hash.
+        hash_to_item = {h: item for item, h in items_hashes}
+        pending = set(hash_to_item) - set(self.check_existing_hashes(list(hash_to_item)))
+        for h in pending:
+            with func_item_to_byte_stream(hash_to_item[h]) as stream:
+                data = stream.read()
+            size = len(data)
+            # Only the header is read to get the size of the image.
+            width, height = Image.open(io.BytesIO(data)).size
+            self._api._simulate_network(size)
+            with self._api.lock:
+                self._api.payloads[h] = size
+                self._api.shapes[h] = (width, height)
+                self._api.uploaded_bytes += size
+
+    def upload_hashes(self, dataset_id, names, hashes, progress_cb=None, metas=None, **kwargs):
+        self._api._simulate_network(0)
+        infos = []
+        with self._api.lock:
+            existing = self._api.image_names[dataset_id]
+            for name, h, meta in zip(names, hashes, metas or [None] * len(names)):
+                if h not in self._api.payloads:
+                    raise RuntimeError(f"Image data with hash {h!r} is not uploaded")
+                if name in existing:
+                    raise RuntimeError(
+                        f"Image with name {name!r} already exists in dataset {dataset_id}"
+                    )
+                info = ImageInfo(
+                    self._api._next_id(),
+                    name,
+                    dataset_id,
+                    self._api.payloads[h],
+                    h,
+                    meta or {},
+                    *self._api.shapes[h],
+                )
+                self._api.images[info.id] = info
+                existing.add(name)
+                infos.append(info)
+        return infos
+
+    def upload_paths(self, dataset_id, names, paths, progress_cb=None, metas=None, **kwargs):
+        hashes = [_get_file_hash(path) for path in paths]
+        self._upload_data_bulk(lambda path: open(path, "rb"), zip(paths, hashes))
+        return self.upload_hashes(dataset_id, names, hashes, metas=metas)
+
+    def get_list(self, dataset_id=None, project_id=None, **kwargs):
+        self._api._simulate_network(0)
+        with self._api.lock:
+            if dataset_id is not None:
+                return [info for info in self._api.images.values() if info.dataset_id == dataset_id]
+            return [
+                info
+                for info in self._api.images.values()
+                if self._api.datasets[info.dataset_id].project_id == project_id
+            ]
+
+    def get_meta(self, id):
+        self._api._simulate_network(0)
+        return self._api.images[id].meta
+
+    def update_meta(self, id, meta):
+        self._api._simulate_network(0)
+        with self._api.lock:
+            self._api.images[id] = self._api.images[id]._replace(meta=meta)
+        return meta
+
+    def edit_info(self, id, name):
+        self._api._simulate_network(0)
+        with self._api.lock:
+            info = self._api.images[id]
+            existing = self._api.image_names[info.dataset_id]
+            if name in existing:
+                raise RuntimeError(
+                    f"Image with name {name!r} already exists in dataset {info.dataset_id}"
+                )
+            existing.discard(info.name)
+            existing.add(name)
+            self._api.images[id] = info._replace(name=name)
+
+    def remove_batch(self, ids, progress_cb=None, batch_size=50):
+        self._api._simulate_network(0)
+        with self._api.lock:
+            for id in ids:
+                info = self._api.images.pop(id, None)
+                if info is not None:
+                    self._api.image_names[info.dataset_id].discard(info.name)
+                self._api.annotations.pop(id, None)
+
+
+class FakeAnnotationApi(_Entity):
+    def upload_jsons(self, img_ids, ann_jsons, progress_cb=None, **kwargs):
+        self._api._simulate_network(sum(len(str(ann)) for ann in ann_jsons))
+        with self._api.lock:
+            for img_id, ann_json in zip(img_ids, ann_jsons):
+                if img_id not in self._api.images:
+                    raise RuntimeError(f"Image with id {img_id} not found")
+                self._api.annotations[img_id] = ann_json
+
+    def upload_anns(self, img_ids, anns, progress_cb=None, **kwargs):
+        self.upload_jsons(img_ids, [ann.to_json() for ann in anns], progress_cb)
+
+
+class FakeTaskApi(_Entity):
+    def set_output_project(self, task_id, project_id, project_name=None, **kwargs):
+        if task_id is None:
+            raise RuntimeError("Task id is not defined")
+
+
+class FakeApi:
+    def __init__(self, team_files_dir, latency=0.0, bandwidth=None):
+        self.team_files_dir = team_files_dir
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.instance_version = "unknown"
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.projects = {}
+        self.datasets = {}
+        self.images = {}
+        self.image_names = defaultdict(set)
+        self.annotations = {}
+        self.metas = {}
+        self.payloads = {}
+        self.shapes = {}
+        self.requests_count = 0
+        self.uploaded_bytes = 0
+        self.file = FakeFileApi(self)
+        self.project = FakeProjectApi(self)
+        self.dataset = FakeDatasetApi(self)
+        self.image = FakeImageApi(self)
+        self.annotation = FakeAnnotationApi(self)
+        self.task = FakeTaskApi(self)
+
+    def _next_id(self):
+        return next(self._ids)
+
+    def _simulate_network(self, size, requests=1):
+        with self.lock:
+            self.requests_count += requests
+        delay = self.latency * requests
+        if self.bandwidth:
+            delay += size / self.bandwidth
+        if delay > 0:
+            time.sleep(delay)
+
+    def is_version_supported(self, version):
+        return False
+
+    def post(self, method, data, stream=False, **kwargs):
+        if method == "images.editInfo":
+            self.image.edit_info(data["id"], data["name"])
+            return None
+        if method != "file-storage.download":
+            raise NotImplementedError(method)
+        self._simulate_network(0)
+        return _Response(self.file._local(data["path"]), self)
@@ -0,0 +1,92 @@
+"""
+Compares image size probing by header with full decoding used before.
+
+Usage:
+    python benchmarks/image_size_benchmark.py --count 200 --width 4000 --height 3000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+from synthetic import generate_image
+from utils import add_src_to_path, peak_rss_kb
+
+add_src_to_path()
+
+import supervisely as sly  # noqa: E402
+
+from image_size import get_image_size  # noqa: E402
+
+FORMATS = [".jpg", ".png", ".webp", ".bmp", ".tiff"]
+
+
+def generate_images(output_dir, count, width, height):
+    rng = np.random.default_rng(0)
+    paths = []
+    for idx in range(count):
+        path = os.path.join(output_dir, f"image_{idx:06d}{FORMATS[idx % len(FORMATS)]}")
+        generate_image(path, width, height, rng)
+        paths.append(path)
+    return paths
+
+
+def _decode_size(path):
+    sly.image.validate_format(path)
+    return sly.image.read(path).shape[:2]
+
+
+def _run(mode, paths, queue):
+    size_fn = get_image_size if mode == "header" else _decode_size
+    baseline_rss_kb = peak_rss_kb()
+    start = time.perf_counter()
+    for path in paths:
+        size_fn(path)
+    elapsed = time.perf_counter() - start
+    final_rss_kb = peak_rss_kb()
+    queue.put(
+        {
+            "seconds": elapsed,
+            "peak_rss_mb": final_rss_kb / 1024,
+            "peak_rss_growth_mb": (final_rss_kb - baseline_rss_kb) / 1024,
+        }
+    )
+
+
+def run_mode(mode, paths):
+    # Each mode runs in a fresh process, so peak RSS is not affected by the other one.
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run, args=(mode, paths, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    result["images_per_sec"] = len(paths) / result["seconds"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = generate_images(tmp_dir, args.count, args.width, args.height)
+        report = {
+            "count": args.count,
+            "resolution": [args.width, args.height],
+            "decode": run_mode("decode", paths),
+            "header": run_mode("header", paths),
+        }
+    report["speedup"] = report["decode"]["seconds"] / report["header"]["seconds"]
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compares class colors generation by `sly.color.generate_rgb` in a loop (used before, quadratic)
+with `palette.generate_colors`. The old generator is measured on a smaller number of classes,
+the minimum distance between colors of neighbouring classes shows how distinguishable they are.
+Exits with code 1 if generated colors are not deterministic, not distinct or not valid RGB.
+
+Usage:
+    python benchmarks/palette_benchmark.py --classes 5000 --old-classes 200
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from utils import add_src_to_path
+
+add_src_to_path()
+
+import supervisely as sly  # noqa: E402
+
+from palette import _generate_palette, generate_colors  # noqa: E402
+
+
+def generate_colors_old(count):
+    colors = []
+    for _ in range(count):
+        colors.append(sly.color.generate_rgb(colors))
+    return colors
+
+
+def min_neighbour_distance(colors, window=10):
+    """Minimum RGB distance between colors of classes closer than `window` to each other."""
+    colors = np.array(colors, dtype=np.float64)
+    result = float("inf")
+    for shift in range(1, min(window, len(colors))):
+        distances = np.linalg.norm(colors[shift:] - colors[:-shift], axis=1)
+        result = min(result, float(distances.min()))
+    return round(result, 2)
+
+
+def measure(fn, count):
+    start = time.perf_counter()
+    colors = fn(count)
+    return time.perf_counter() - start, colors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--classes", type=int, default=5000)
+    parser.add_argument(
+        "--old-classes", type=int, default=200, help="classes for the old generator"
+    )
+    args = parser.parse_args()
+
+    old_seconds, old_colors = measure(generate_colors_old, args.old_classes)
+    _generate_palette.cache_clear()
+    new_seconds, new_colors = measure(generate_colors, args.classes)
+    cached_seconds, cached_colors = measure(generate_colors, args.classes)
+    _generate_palette.cache_clear()
+
+    valid = all(
+        len(color) == 3 and all(isinstance(c, int) and 0 <= c <= 255 for c in color)
+        for color in new_colors
+    )
+    deterministic = new_colors == cached_colors == generate_colors(args.classes)
+    distinct = len(set(map(tuple, new_colors))) == len(new_colors)
+    print(
+        json.dumps(
+            {
+                "old": {
+                    "classes": args.old_classes,
+                    "seconds": round(old_seconds, 4),
+                    "min_neighbour_distance": min_neighbour_distance(old_colors),
+                },
+                "new": {
+                    "classes": args.classes,
+                    "seconds": round(new_seconds, 4),
+                    "cached_seconds": round(cached_seconds, 4),
+                    "min_neighbour_distance": min_neighbour_distance(new_colors),
+                    "old_classes_min_neighbour_distance": min_neighbour_distance(
+                        new_colors[: args.old_classes]
+                    ),
+                },
+                "valid": valid,
+                "deterministic": deterministic,
+                "distinct": distinct,
+            },
+            indent=4,
+        )
+    )
+    sys.exit(0 if valid and deterministic and distinct else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Benchmark suite of the converter. Generates synthetic YOLOv5 project and measures
+config reading, label parsing, annotation building and the full conversion flow
+against in-process fake API (see fake_api.py). Every scenario runs in a separate process,
+so peak RSS is measured per scenario. Results are printed as JSON.
+
+Usage:
+    python benchmarks/run_benchmarks.py --images 500 --boxes 20 --output results.json
+    python benchmarks/run_benchmarks.py --scenarios full_folder full_zip --env PREPARE_POOL=thread
+    # with per-stage profile
+    python benchmarks/run_benchmarks.py --scenarios full_tar --env PROFILE=1
+    # offline, no API
+    python benchmarks/run_benchmarks.py --scenarios local_folder --env OUTPUT_LINK=copy
+    python benchmarks/run_benchmarks.py --scenarios delta_folder --env DELTA_COMPARE=hash
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from fake_api import FakeApi
+from synthetic import generate_image, generate_tree, pack
+from utils import add_src_to_path, peak_rss_kb
+
+TEAM_FILES_DIR = "team_files"
+PROJECT_NAME = "yolo_project"
+FULL_FLOW_INPUTS = {
+    "full_folder": None,
+    "full_folder_lazy": None,
+    "full_tar": ".tar",
+    "full_tar_gz": ".tar.gz",
+    "full_zip": ".zip",
+    "dry_run_folder": None,
+}
+# Offline conversion of the local input to a local Supervisely project (OUTPUT_DIR), without API.
+LOCAL_FLOW_INPUTS = {
+    "local_folder": None,
+    "local_zip": ".zip",
+}
+# Import of the changed input into the project uploaded before: new, changed and deleted images
+# and labels.
+DELTA_FLOW = "delta_folder"
+SCENARIOS = (
+    ["read_config_yaml", "parse_labels", "build_annotations"]
+    + list(FULL_FLOW_INPUTS)
+    + list(LOCAL_FLOW_INPUTS)
+    + [DELTA_FLOW]
+)
+
+
+def _list_files(root_dir, exts):
+    result = []
+    for cur_dir, _, files in os.walk(root_dir):
+        for file_name in files:
+            if os.path.splitext(file_name)[1].lower() in exts:
+                result.append(os.path.join(cur_dir, file_name))
+    return sorted(result)
+
+
+def _image_label_pairs(project_dir):
+    pairs = []
+    for image_path in _list_files(os.path.join(project_dir, "images"), [".jpg", ".png"]):
+        rel_path = os.path.relpath(image_path, os.path.join(project_dir, "images"))
+        label_path = os.path.join(project_dir, "labels", os.path.splitext(rel_path)[0] + ".txt")
+        pairs.append((image_path, label_path))
+    return pairs
+
+
+def bench_read_config_yaml(m, project_dir, repeats):
+    config_paths = _list_files(project_dir, [".yaml"])
+    for _ in range(repeats):
+        for path in config_paths:
+            m.read_config_yaml(path)
+    return {"configs": len(config_paths) * repeats}
+
+
+def bench_parse_labels(m, project_dir, repeats):
+    from annotation import labels_to_boxes
+    from labels import denormalize_boxes, read_labels
+
+    pairs = _image_label_pairs(project_dir)
+    boxes = 0
+    for _ in range(repeats):
+        for _, label_path in pairs:
+            groups, _ = read_labels(label_path, 1000)
+            class_ids, rects = labels_to_boxes(groups)
+            denormalize_boxes(rects, 640, 480)
+            boxes += len(class_ids)
+    return {"labels": len(pairs) * repeats, "boxes": boxes}
+
+
+def bench_build_annotations(m, project_dir, repeats):
+    from preparation import PrepareContext, prepare_image
+
+    pairs = _image_label_pairs(project_dir)
+    config = m.read_config_yaml(_list_files(project_dir, [".yaml"])[0])
+    context = PrepareContext(tuple(config["names"]), "train")
+    boxes = 0
+    for _ in range(repeats):
+        for image_path, label_path in pairs:
+            prepared = prepare_image(image_path, label_path, context)
+            boxes += len(prepared.ann_json["objects"])
+    return {"images": len(pairs) * repeats, "boxes": boxes}
+
+
+def bench_full_flow(m, scenario, team_files_dir, latency, bandwidth):
+    from workflow import Workflow
+
+    api = FakeApi(team_files_dir, latency=latency, bandwidth=bandwidth)
+    ext = FULL_FLOW_INPUTS[scenario]
+    if ext is None:
+        m.input_dir, m.input_file = f"/{PROJECT_NAME}/", None
+    else:
+        m.input_dir, m.input_file = None, f"/{PROJECT_NAME}{ext}"
+    m.folder_mode = "lazy" if scenario == "full_folder_lazy" else m.folder_mode
+    m.dry_run = scenario == "dry_run_folder"
+    m.workflow = Workflow(api)
+    m.yolov5_sly_converter(api)
+    if m.dry_run:
+        total = json.load(open(m.DRY_RUN_REPORT_PATH))["total"]
+        stats = {"images": total["images"], "boxes": total["boxes"], "requests": api.requests_count}
+    else:
+        stats = {
+            "images": len(api.images),
+            "boxes": sum(len(ann["objects"]) for ann in api.annotations.values()),
+            "requests": api.requests_count,
+            "uploaded_mb": round(api.uploaded_bytes / 1024 / 1024, 2),
+        }
+    if m.profiler.enabled:
+        stats["profile"] = m.profiler.report()
+    return stats
+
+
+def bench_local_flow(m, scenario, team_files_dir):
+    from local_project import LocalProjectApi
+    from workflow import Workflow
+
+    m.output_dir = os.path.join(os.getcwd(), "output")
+    api = LocalProjectApi(m.output_dir, m.output_writers, m.output_link)
+    m.input_dir, m.input_file = None, os.path.join(
+        team_files_dir, PROJECT_NAME + (LOCAL_FLOW_INPUTS[scenario] or "")
+    )
+    m.workflow = Workflow(api)
+    m.workflow.is_compatible = False
+    try:
+        m.yolov5_sly_converter(api)
+    finally:
+        api.close()
+    stats = {"images": 0, "boxes": 0}
+    for root, _, files in os.walk(m.output_dir):
+        if os.path.basename(root) != "ann":
+            continue
+        for name in files:
+            with open(os.path.join(root, name)) as f:
+                stats["boxes"] += len(json.load(f)["objects"])
+            stats["images"] += 1
+    stats["placed"] = api.placed_counts
+    if m.profiler.enabled:
+        stats["profile"] = m.profiler.report()
+    return stats
+
+
+def _get_project_state(api, project_id):
+    """Names and annotations of images of the project by dataset name."""
+    return sorted(
+        (
+            api.datasets[info.dataset_id].name,
+            info.name,
+            json.dumps(api.annotations.get(info.id), sort_keys=True),
+        )
+        for info in api.image.get_list(project_id=project_id)
+    )
+
+
+def _change_project(project_dir, width, height):
+    """Adds, changes and removes images and labels of the first split, returns counts of changes."""
+    images_dir = os.path.join(project_dir, "images", "train")
+    labels_dir = os.path.join(project_dir, "labels", "train")
+    names = sorted(os.listdir(images_dir))
+    rng = np.random.default_rng(1)
+    # New image with labels.
+    shutil.copyfile(os.path.join(images_dir, names[0]), os.path.join(images_dir, "new" + names[0]))
+    shutil.copyfile(
+        os.path.join(labels_dir, os.path.splitext(names[0])[0] + ".txt"),
+        os.path.join(labels_dir, "new" + os.path.splitext(names[0])[0] + ".txt"),
+    )
+    # Changed image: another size, so its annotation changes too.
+    generate_image(os.path.join(images_dir, names[1]), width // 2, height // 2, rng)
+    # Changed labels.
+    with open(os.path.join(labels_dir, os.path.splitext(names[2])[0] + ".txt"), "a") as f:
+        f.write("0 0.5 0.5 0.1 0.1\n")
+    # Removed image.
+    os.remove(os.path.join(images_dir, names[3]))
+    return {"new": 1, "changed_image": 1, "changed_labels": 1, "removed": 1}
+
+
+def bench_delta_flow(m, team_files_dir, width, height, latency, bandwidth):
+    """
+    Uploads the project, changes the input and imports it into the uploaded project with removal of
+    deleted images. The result must match a full import of the changed input (except with
+    transcoding: transcoded images are compared by name only, so the changed image is not found).
+    Only the delta import is timed.
+    """
+    from workflow import Workflow
+
+    # The input is changed, so it is copied: generated data may be reused by other runs.
+    delta_files_dir = os.path.join(os.getcwd(), TEAM_FILES_DIR)
+    source_dir = os.path.join(team_files_dir, PROJECT_NAME)
+    if not os.path.isfile(os.path.join(source_dir, "data_config.yaml")):
+        # Delta import needs a single project, the first one is taken.
+        source_dir = os.path.join(source_dir, sorted(os.listdir(source_dir))[0])
+    project_dir = os.path.join(delta_files_dir, PROJECT_NAME)
+    shutil.copytree(source_dir, project_dir)
+
+    api = FakeApi(delta_files_dir, latency=latency, bandwidth=bandwidth)
+    m.workflow = Workflow(api)
+
+    def _import(delta_project_id=None):
+        # The converter replaces the input directory with the downloaded one.
+        m.input_dir, m.input_file = f"/{PROJECT_NAME}/", None
+        m.delta_project_id = delta_project_id
+        m.yolov5_sly_converter(api)
+
+    _import()
+    project_id = next(iter(api.projects))
+    changes = _change_project(project_dir, width, height)
+
+    m.delta_remove_deleted = True
+    requests_count = api.requests_count
+    start = time.perf_counter()
+    _import(project_id)
+    seconds = time.perf_counter() - start
+    stats = {"delta_seconds": round(seconds, 4), **changes}
+    stats["requests"] = api.requests_count - requests_count
+    if m.profiler.enabled:
+        stats["profile"] = m.profiler.report()
+
+    _import()
+    full_project_id = max(api.projects)
+    full_state = _get_project_state(api, full_project_id)
+    stats["matches_full_import"] = _get_project_state(api, project_id) == full_state
+    return stats
+
+
+def _run_scenario(scenario, args, work_dir, queue):
+    # The converter reads env and cleans its storage directory in the working dir on import.
+    os.chdir(work_dir)
+    add_src_to_path()
+    import convert_yolov5_to_sly as m
+
+    project_dir = os.path.join(args.data_dir, TEAM_FILES_DIR, PROJECT_NAME)
+    start = time.perf_counter()
+    if scenario == "read_config_yaml":
+        stats = bench_read_config_yaml(m, project_dir, args.repeats * 100)
+    elif scenario == "parse_labels":
+        stats = bench_parse_labels(m, project_dir, args.repeats)
+    elif scenario == "build_annotations":
+        stats = bench_build_annotations(m, project_dir, args.repeats)
+    elif scenario in LOCAL_FLOW_INPUTS:
+        stats = bench_local_flow(m, scenario, os.path.join(args.data_dir, TEAM_FILES_DIR))
+    elif scenario == DELTA_FLOW:
+        team_files_dir = os.path.join(args.data_dir, TEAM_FILES_DIR)
+        stats = bench_delta_flow(
+            m, team_files_dir, args.width, args.height, args.latency, args.bandwidth
+        )
+    else:
+        team_files_dir = os.path.join(args.data_dir, TEAM_FILES_DIR)
+        stats = bench_full_flow(m, scenario, team_files_dir, args.latency, args.bandwidth)
+    seconds = time.perf_counter() - start
+
+    result = {"scenario": scenario, "seconds": round(seconds, 4)}
+    for key in ["images", "boxes", "labels", "configs"]:
+        if key in stats:
+            result[f"{key}_per_sec"] = round(stats[key] / seconds, 2)
+    result.update(stats)
+    result["peak_rss_mb"] = round(peak_rss_kb() / 1024, 1)
+    queue.put(result)
+
+
+def run_scenario(scenario, args):
+    work_dir = tempfile.mkdtemp(prefix=f"{scenario}_", dir=args.data_dir)
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_scenario, args=(scenario, args, work_dir, queue))
+    process.start()
+    process.join()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    if process.exitcode != 0:
+        return {"scenario": scenario, "error": f"exit code {process.exitcode}"}
+    return queue.get()
+
+
+def prepare_data(args):
+    team_files_dir = os.path.join(args.data_dir, TEAM_FILES_DIR)
+    project_dir = os.path.join(team_files_dir, PROJECT_NAME)
+    generate_tree(
+        project_dir,
+        projects_count=args.projects,
+        images_count=args.images,
+        width=args.width,
+        height=args.height,
+        boxes_per_image=args.boxes,
+        classes_count=args.classes,
+    )
+    for ext in (set(FULL_FLOW_INPUTS.values()) | set(LOCAL_FLOW_INPUTS.values())) - {None}:
+        pack(project_dir, os.path.join(team_files_dir, PROJECT_NAME + ext))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--images", type=int, default=200, help="images per split")
+    parser.add_argument("--boxes", type=int, default=10, help="boxes per image")
+    parser.add_argument("--classes", type=int, default=10)
+    parser.add_argument("--projects", type=int, default=1)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--repeats", type=int, default=1, help="repeats of micro benchmarks")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="fake API latency per request, sec"
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, default=None, help="fake API bandwidth, bytes/sec"
+    )
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument(
+        "--env", nargs="*", default=[], metavar="KEY=VALUE", help="converter env vars"
+    )
+    parser.add_argument("--data-dir", default=None, help="reuse generated data from this directory")
+    parser.add_argument("--output", default=None, help="path to save JSON results")
+    args = parser.parse_args()
+
+    # Spawned scenario processes inherit the environment of the converter.
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["TEAM_ID"] = "1"
+    os.environ.setdefault("SERVER_ADDRESS", "http://localhost")
+    os.environ["WORKSPACE_ID"] = "1"
+    for item in args.env:
+        key, value = item.split("=", 1)
+        os.environ[key] = value
+
+    tmp_dir = None
+    if args.data_dir is None:
+        tmp_dir = tempfile.mkdtemp(prefix="yolov5_benchmark_")
+        args.data_dir = tmp_dir
+    if not os.path.isdir(os.path.join(args.data_dir, TEAM_FILES_DIR)):
+        prepare_data(args)
+
+    try:
+        results = [run_scenario(scenario, args) for scenario in args.scenarios]
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report = {
+        "params": {
+            key: getattr(args, key)
+            for key in [
+                "images",
+                "boxes",
+                "classes",
+                "projects",
+                "width",
+                "height",
+                "latency",
+                "bandwidth",
+            ]
+        },
+        "env": dict(item.split("=", 1) for item in args.env),
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
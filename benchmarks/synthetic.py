@@ -0,0 +1,95 @@
+"""Generator of synthetic YOLOv5 projects for benchmarks."""
+
+import os
+import tarfile
+import zipfile
+
+import cv2
+import numpy as np
+import yaml
+
+IMAGE_FORMATS = [".jpg", ".png"]
+
+
+def generate_image(path, width, height, rng):
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None]
+    noise = rng.integers(0, 32, size=(max(1, height // 8), max(1, width // 8), 3), dtype=np.uint8)
+    img = gradient + cv2.resize(noise, (width, height), interpolation=cv2.INTER_NEAREST)
+    cv2.imwrite(path, img)
+
+
+def generate_labels(path, boxes_count, classes_count, rng):
+    class_ids = rng.integers(0, classes_count, size=boxes_count)
+    sizes = rng.uniform(0.01, 0.3, size=(boxes_count, 2))
+    centers = rng.uniform(sizes / 2, 1 - sizes / 2)
+    with open(path, "w") as f:
+        for class_id, (x, y), (w, h) in zip(class_ids, centers, sizes):
+            f.write(f"{class_id} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n")
+
+
+def generate_project(
+    project_dir,
+    images_count=100,
+    width=640,
+    height=480,
+    boxes_per_image=10,
+    classes_count=10,
+    splits=("train", "val"),
+    image_formats=IMAGE_FORMATS,
+    seed=0,
+):
+    """Creates YOLOv5 project with `images_count` images in every split."""
+    rng = np.random.default_rng(seed)
+    for split in splits:
+        images_dir = os.path.join(project_dir, "images", split)
+        labels_dir = os.path.join(project_dir, "labels", split)
+        os.makedirs(images_dir, exist_ok=True)
+        os.makedirs(labels_dir, exist_ok=True)
+        for idx in range(images_count):
+            name = f"{split}_{idx:07d}"
+            ext = image_formats[idx % len(image_formats)]
+            generate_image(os.path.join(images_dir, name + ext), width, height, rng)
+            generate_labels(
+                os.path.join(labels_dir, name + ".txt"), boxes_per_image, classes_count, rng
+            )
+
+    config = {"names": [f"class_{idx}" for idx in range(classes_count)], "nc": classes_count}
+    for split in splits:
+        config[split] = f"images/{split}"
+    with open(os.path.join(project_dir, "data_config.yaml"), "w") as f:
+        yaml.safe_dump(config, f)
+
+
+def generate_tree(root_dir, projects_count=1, **kwargs):
+    """
+    Creates `projects_count` projects. A single project is placed directly into `root_dir`,
+    several projects are placed into `root_dir/project_<idx>` subdirectories.
+    """
+    if projects_count == 1:
+        generate_project(root_dir, **kwargs)
+        return
+    for idx in range(projects_count):
+        generate_project(os.path.join(root_dir, f"project_{idx}"), seed=idx, **kwargs)
+
+
+def pack(src_dir, archive_path, zip_compression=zipfile.ZIP_STORED):
+    """
+    Packs directory to .zip, .tar, .tar.gz or .tar.xz archive (by extension),
+    the directory is the root of the archive.
+    """
+    arcname = os.path.basename(os.path.normpath(src_dir))
+    if archive_path.endswith(".zip"):
+        with zipfile.ZipFile(archive_path, "w", zip_compression) as archive:
+            for cur_dir, _, files in os.walk(src_dir):
+                for file_name in files:
+                    path = os.path.join(cur_dir, file_name)
+                    archive.write(path, os.path.join(arcname, os.path.relpath(path, src_dir)))
+        return archive_path
+    mode = "w"
+    if archive_path.endswith((".gz", ".tgz")):
+        mode = "w:gz"
+    elif archive_path.endswith(".xz"):
+        mode = "w:xz"
+    with tarfile.open(archive_path, mode) as archive:
+        archive.add(src_dir, arcname=arcname)
+    return archive_path
@@ -0,0 +1,231 @@
+from functools import lru_cache
+
+import numpy as np
+import supervisely as sly
+from supervisely.geometry.graph import KeypointsTemplate
+
+from labels import POLYGON, POSE, denormalize_boxes, denormalize_points, polygons_to_boxes
+
+RECTANGLE = sly.Rectangle.geometry_name()
+GRAPH = sly.GraphNodes.geometry_name()
+
+# Geometry types of object classes by their names.
+GEOMETRY_TYPES = {
+    RECTANGLE: sly.Rectangle,
+    sly.Polygon.geometry_name(): sly.Polygon,
+    GRAPH: sly.GraphNodes,
+    sly.AnyGeometry.geometry_name(): sly.AnyGeometry,
+}
+
+_NO_CLASS_IDS = np.empty(0, dtype=np.int64)
+_NO_BOXES = np.empty((0, 4), dtype=np.float64)
+
+
+def crop_rects(rects, img_height, img_width):
+    """
+    Converts pixel (top, left, bottom, right) float rects to int ones the same way as
+    `sly.Rectangle` (coordinates are floored) and crops them by image like `sly.Annotation` does:
+    rects outside of the image are removed.
+
+    :return: int array of shape (M, 4) and bool mask of shape (N,) of the kept rects
+    """
+    rects = np.floor(rects)
+    top = np.maximum(rects[:, 0], 0)
+    left = np.maximum(rects[:, 1], 0)
+    bottom = np.minimum(rects[:, 2], img_height - 1)
+    right = np.minimum(rects[:, 3], img_width - 1)
+    keep = (bottom >= top) & (right >= left)
+    rects = np.stack([top, left, bottom, right], axis=1)
+    return rects[keep].astype(np.int64), keep
+
+
+class BoxAnnotation:
+    """
+    Annotation of an image with rectangle labels stored as arrays. `to_json` emits the same JSON
+    as `sly.Annotation.to_json()` with `sly.Label(sly.Rectangle(...))` labels and a single image
+    tag, without creating an object per label.
+    """
+
+    __slots__ = ("img_height", "img_width", "class_ids", "rects", "class_names", "tag_name")
+
+    def __init__(self, img_height, img_width, class_ids, rects, class_names, tag_name):
+        """
+        :param class_ids: int array of shape (N,) with indices in `class_names`
+        :param rects: float array of shape (N, 4) with pixel top, left, bottom, right
+        """
+        self.img_height = img_height
+        self.img_width = img_width
+        self.class_ids = class_ids
+        self.rects = rects
+        self.class_names = class_names
+        self.tag_name = tag_name
+
+    def to_json(self):
+        rects, keep = crop_rects(self.rects, self.img_height, self.img_width)
+        class_names = self.class_names
+        objects = [
+            {
+                "classTitle": class_names[class_id],
+                "description": "",
+                "tags": [],
+                "points": {"exterior": [[left, top], [right, bottom]], "interior": []},
+                "geometryType": "rectangle",
+                "shape": "rectangle",
+            }
+            for class_id, (top, left, bottom, right) in zip(
+                self.class_ids[keep].tolist(), rects.tolist()
+            )
+        ]
+        return {
+            "description": "",
+            "size": {"height": self.img_height, "width": self.img_width},
+            "tags": [{"name": self.tag_name}],
+            "objects": objects,
+            "customBigData": {},
+        }
+
+
+def create_keypoints_template(kpt_shape):
+    """Template of keypoints classes: nodes are named by keypoint indices."""
+    template = KeypointsTemplate()
+    for idx in range(kpt_shape[0]):
+        template.add_point(label=str(idx), row=idx, col=idx)
+    return template
+
+
+def create_obj_class(name, geometry, color=None, kpt_shape=None):
+    geometry_config = create_keypoints_template(kpt_shape) if geometry == GRAPH else None
+    return sly.ObjClass(
+        name=name,
+        geometry_type=GEOMETRY_TYPES[geometry],
+        color=color,
+        geometry_config=geometry_config,
+    )
+
+
+# Tables of a dataset are built once per worker and shared by annotations of all its images.
+@lru_cache(maxsize=16)
+def _get_obj_classes(class_names, geometry, kpt_shape):
+    """Table of class id -> ObjClass."""
+    return [create_obj_class(name, geometry, kpt_shape=kpt_shape) for name in class_names]
+
+
+@lru_cache(maxsize=16)
+def _get_img_tags(tag_name):
+    tag_meta = sly.TagMeta(tag_name, sly.TagValueType.NONE)
+    return sly.TagCollection([sly.Tag(tag_meta)])
+
+
+def split_unsupported(groups, geometry):
+    """
+    Splits label groups into ones that can be converted to objects of `geometry` classes and
+    the rest: boxes and polygons are converted to each other, keypoints only to graphs.
+    """
+    supported = []
+    unsupported = []
+    for group in groups:
+        if (geometry == GRAPH) == (group.format == POSE) or geometry == RECTANGLE:
+            supported.append(group)
+        else:
+            unsupported.append(group)
+    return supported, unsupported
+
+
+def labels_to_boxes(groups):
+    """
+    Class ids and normalized (x_center, y_center, width, height) boxes of label groups in file
+    order: polygons are replaced by their bounding boxes, keypoints of pose labels are dropped.
+    """
+    if len(groups) == 0:
+        return _NO_CLASS_IDS, _NO_BOXES
+    boxes = [
+        polygons_to_boxes(group.coords) if group.format == POLYGON else group.coords[:, :4]
+        for group in groups
+    ]
+    if len(groups) == 1:
+        return groups[0].class_ids, boxes[0]
+    order = np.argsort(np.concatenate([group.line_nums for group in groups]), kind="stable")
+    class_ids = np.concatenate([group.class_ids for group in groups])
+    return class_ids[order], np.concatenate(boxes)[order]
+
+
+def _rectangles(coords, img_height, img_width, as_polygons):
+    rects = denormalize_boxes(coords[:, :4], img_width, img_height).tolist()
+    if not as_polygons:
+        return [sly.Rectangle(top, left, bottom, right) for top, left, bottom, right in rects]
+    return [
+        sly.Polygon(exterior=[[top, left], [top, right], [bottom, right], [bottom, left]])
+        for top, left, bottom, right in rects
+    ]
+
+
+def _polygons(coords, img_height, img_width):
+    # A closing point equal to the first one is dropped.
+    closed = (coords[:, 0] == coords[:, -2]) & (coords[:, 1] == coords[:, -1])
+    points = denormalize_points(coords, img_width, img_height)[:, :, ::-1].tolist()
+    polygons = []
+    for exterior, is_closed in zip(points, closed.tolist()):
+        if is_closed:
+            exterior = exterior[:-1]
+        polygons.append(sly.Polygon(exterior=exterior) if len(exterior) >= 3 else None)
+    return polygons
+
+
+def _graphs(coords, img_height, img_width, kpt_shape):
+    keypoints_count, dims = kpt_shape
+    keypoints = coords[:, 4:].reshape(len(coords), keypoints_count, dims)
+    # Keypoints are clamped to the image: graphs with a node outside are removed on crop entirely.
+    cols = np.clip(keypoints[:, :, 0] * img_width, 0, img_width - 1).tolist()
+    rows = np.clip(keypoints[:, :, 1] * img_height, 0, img_height - 1).tolist()
+    # Visibility: 0 - not labeled (skipped), 1 - labeled but not visible, 2 - visible.
+    if dims == 3:
+        visibility = keypoints[:, :, 2].tolist()
+    else:
+        visibility = np.full((len(coords), keypoints_count), 2).tolist()
+    graphs = []
+    for label_rows, label_cols, label_visibility in zip(rows, cols, visibility):
+        nodes = {
+            str(idx): sly.Node(sly.PointLocation(row, col), disabled=visible == 1)
+            for idx, (row, col, visible) in enumerate(zip(label_rows, label_cols, label_visibility))
+            if visible != 0
+        }
+        graphs.append(sly.GraphNodes(nodes) if len(nodes) > 0 else None)
+    return graphs
+
+
+def build_annotation_json(img_height, img_width, groups, context):
+    """
+    Builds annotation JSON of label groups (see `labels.read_labels`) with objects of
+    `context.geometry` classes. Rectangle classes are built from arrays by `BoxAnnotation`,
+    other geometries by `sly.Annotation`.
+    """
+    if context.geometry == RECTANGLE:
+        class_ids, boxes = labels_to_boxes(groups)
+        rects = denormalize_boxes(boxes, img_width, img_height)
+        ann = BoxAnnotation(
+            img_height, img_width, class_ids, rects, context.class_names, context.tag_name
+        )
+        return ann.to_json()
+
+    obj_classes = _get_obj_classes(context.class_names, context.geometry, context.kpt_shape)
+    labels = []
+    for group in groups:
+        if group.format == POSE:
+            geometries = _graphs(group.coords, img_height, img_width, context.kpt_shape)
+        elif group.format == POLYGON:
+            geometries = _polygons(group.coords, img_height, img_width)
+        else:
+            as_polygons = GEOMETRY_TYPES[context.geometry] is sly.Polygon
+            geometries = _rectangles(group.coords, img_height, img_width, as_polygons)
+        line_nums = group.line_nums if group.line_nums is not None else range(len(geometries))
+        for line_num, class_id, geometry in zip(line_nums, group.class_ids.tolist(), geometries):
+            if geometry is not None:
+                labels.append((line_num, sly.Label(geometry, obj_classes[class_id])))
+    labels.sort(key=lambda item: item[0])
+
+    ann = sly.Annotation(
+        (img_height, img_width),
+        labels=[label for _, label in labels],
+        img_tags=_get_img_tags(context.tag_name),
+    )
+    return ann.to_json()
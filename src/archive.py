@@ -0,0 +1,227 @@
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import supervisely as sly
+from supervisely.api.module_api import ApiField
+
+TAR_EXTENSIONS = [".tar", ".gz", ".tar.gz", ".tgz", ".xz"]
+COPY_BUFFER_SIZE = 1024 * 1024
+# External decompressors by signature of compressed data, used if they are found in PATH.
+# They run in a separate process (in several threads if the archive allows), so decompression
+# does not compete with writing of extracted files for GIL. Single-threaded gzip is not used:
+# it is not faster than zlib of tarfile.
+DECOMPRESSORS = [
+    (b"\x1f\x8b", [["pigz", "-dc"]]),
+    (b"\xfd7zXZ\x00", [["xz", "-dc", "-T0"]]),
+]
+
+
+JUNK_NAMES = frozenset(sly.fs.JUNK_FILES)
+
+
+def is_junk(member_name):
+    """Checks if archive member is a junk file (e.g. macOS resource forks and thumbnails)."""
+    parts = [part for part in member_name.replace("\\", "/").split("/") if part != ""]
+    if len(parts) == 0:
+        return True
+    return parts[-1].startswith("._") or any(part in JUNK_NAMES for part in parts)
+
+
+def safe_member_path(extract_dir, member_name):
+    """
+    Returns local path of archive member or None if it points outside of the extract dir.
+    Paths are normalized without resolving symlinks: links are never extracted from archives.
+    """
+    extract_dir = os.path.abspath(extract_dir)
+    path = os.path.abspath(os.path.join(extract_dir, member_name))
+    if not path.startswith(extract_dir + os.sep):
+        return None
+    return path
+
+
+class _ChunksReader(io.RawIOBase):
+    """File-like wrapper around iterator of bytes chunks (e.g. HTTP response body)."""
+
+    def __init__(self, chunks, progress_cb=None):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+        self._progress_cb = progress_cb
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self._buffer) == 0:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                return 0
+            self._buffer = memoryview(chunk)
+            if self._progress_cb is not None:
+                self._progress_cb(len(chunk))
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def open_remote_file(api, team_id, remote_path, progress_cb=None):
+    """Opens file from Team Files as a sequential binary stream without saving it to disk."""
+    response = api.post(
+        "file-storage.download",
+        {ApiField.TEAM_ID: team_id, ApiField.PATH: remote_path},
+        stream=True,
+    )
+    reader = _ChunksReader(response.iter_content(chunk_size=COPY_BUFFER_SIZE), progress_cb)
+    return io.BufferedReader(reader, buffer_size=COPY_BUFFER_SIZE)
+
+
+def _extract_tar_members(archive, extract_dir):
+    extracted = 0
+    for member in archive:
+        if is_junk(member.name) or not (member.isfile() or member.isdir()):
+            continue
+        path = safe_member_path(extract_dir, member.name)
+        if path is None:
+            sly.logger.warn(f"Archive member {member.name!r} is outside of archive root. Skipped.")
+            continue
+        if member.isdir():
+            os.makedirs(path, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with archive.extractfile(member) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        # Keep modification time like `tarfile.extractall`, it is a part of the hash cache key.
+        os.utime(path, (member.mtime, member.mtime))
+        extracted += 1
+    return extracted
+
+
+def extract_tar_stream(fileobj, extract_dir):
+    """
+    Extracts tar (optionally compressed) archive member by member while it is being read.
+    Junk files, links and members outside of `extract_dir` are skipped.
+
+    :return: number of extracted files
+    """
+    with tarfile.open(fileobj=fileobj, mode="r|*", bufsize=COPY_BUFFER_SIZE) as archive:
+        return _extract_tar_members(archive, extract_dir)
+
+
+def stream_tar_from_team_files(api, team_id, remote_path, extract_dir, progress_cb=None):
+    """
+    Downloads tar archive from Team Files and extracts it on the fly, so the archive itself
+    is never stored on disk.
+
+    :return: number of extracted files
+    """
+    with open_remote_file(api, team_id, remote_path, progress_cb) as stream:
+        return extract_tar_stream(stream, extract_dir)
+
+
+def _find_decompressor(archive_path):
+    with open(archive_path, "rb") as f:
+        signature = f.read(8)
+    for magic, commands in DECOMPRESSORS:
+        if signature.startswith(magic):
+            for command in commands:
+                if shutil.which(command[0]) is not None:
+                    return command
+    return None
+
+
+def extract_tar(archive_path, extract_dir):
+    """
+    Extracts tar archive (optionally compressed) with the same filtering as `extract_tar_stream`.
+    Compressed archives are decompressed by an external tool if it is available.
+
+    :return: number of extracted files
+    """
+    command = _find_decompressor(archive_path)
+    if command is None:
+        with tarfile.open(archive_path) as archive:
+            return _extract_tar_members(archive, extract_dir)
+
+    sly.logger.info(f"Decompressing archive with {command[0]}")
+    with open(archive_path, "rb") as f:
+        process = subprocess.Popen(
+            command,
+            stdin=f,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=COPY_BUFFER_SIZE,
+        )
+    # stderr is read concurrently, otherwise the decompressor may block on the full pipe.
+    stderr = []
+    stderr_reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()))
+    stderr_reader.start()
+    try:
+        extracted = extract_tar_stream(process.stdout, extract_dir)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        stderr_reader.join()
+    if returncode != 0:
+        raise tarfile.ReadError(
+            f"{command[0]} failed: {stderr[0].decode(errors='replace').strip()}"
+        )
+    return extracted
+
+
+def _extract_zip_members(archive_path, members):
+    extracted = 0
+    with zipfile.ZipFile(archive_path, "r") as archive:
+        for info, path in members:
+            with archive.open(info) as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(path, (mtime, mtime))
+            extracted += 1
+    return extracted
+
+
+def extract_zip(archive_path, extract_dir, workers=4):
+    """
+    Extracts zip archive in several threads, each one reads its own part of members
+    with a separate file handle (zlib releases GIL). Junk files and members outside
+    of `extract_dir` are skipped.
+
+    :return: number of extracted files
+    """
+    members = []
+    with zipfile.ZipFile(archive_path, "r") as archive:
+        for info in archive.infolist():
+            if is_junk(info.filename):
+                continue
+            path = safe_member_path(extract_dir, info.filename)
+            if path is None:
+                sly.logger.warn(
+                    f"Archive member {info.filename!r} is outside of archive root. Skipped."
+                )
+                continue
+            if info.is_dir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            members.append((info, path))
+
+    workers = max(1, min(workers, len(members)))
+    # Members are split by total compressed size, so workers get similar amount of work.
+    parts = [[] for _ in range(workers)]
+    sizes = [0] * workers
+    for info, path in sorted(members, key=lambda member: -member[0].compress_size):
+        idx = sizes.index(min(sizes))
+        parts[idx].append((info, path))
+        sizes[idx] += info.compress_size
+    if workers == 1:
+        return _extract_zip_members(archive_path, parts[0])
+    with ThreadPoolExecutor(workers) as executor:
+        futures = [executor.submit(_extract_zip_members, archive_path, part) for part in parts]
+        return sum(future.result() for future in futures)
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+
+import supervisely as sly
+
+
+def journal_path(checkpoint_dir, team_id, input_path):
+    """Journal file is named after the input path, so reruns of the same import find it."""
+    digest = hashlib.sha1(f"{team_id}:{input_path}".encode("utf-8")).hexdigest()[:12]
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", input_path.strip("/"))[-64:]
+    return os.path.join(checkpoint_dir, f"{name}_{digest}.jsonl")
+
+
+class ImportJournal:
+    """
+    Append-only JSONL journal of created projects and datasets and uploaded images.
+    Each record is flushed to disk immediately, so the journal survives a crash of the task
+    and the next run can continue the import instead of starting over.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._projects = {}
+        self._datasets = {}
+        self._uploaded = defaultdict(set)
+        sly.fs.ensure_base_path(path)
+        if resume and os.path.isfile(path):
+            self._load()
+            sly.logger.info(
+                f"Import journal {path} loaded: {len(self._projects)} projects, "
+                f"{len(self._datasets)} datasets, "
+                f"{sum(len(names) for names in self._uploaded.values())} uploaded images."
+            )
+        self._file = open(path, "a" if resume else "w")
+
+    def _load(self):
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete if the task was killed while writing it.
+                    continue
+                event = record.get("event")
+                if event == "project":
+                    self._projects[record["key"]] = record["id"]
+                elif event == "dataset":
+                    self._datasets[(record["project_key"], record["key"])] = record["id"]
+                elif event == "batch":
+                    self._uploaded[record["dataset_id"]].update(record["names"])
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def get_project_id(self, key):
+        return self._projects.get(key)
+
+    def add_project(self, key, project_id):
+        self._projects[key] = project_id
+        self._write({"event": "project", "key": key, "id": project_id})
+
+    def get_dataset_id(self, project_key, key):
+        return self._datasets.get((project_key, key))
+
+    def add_dataset(self, project_key, key, dataset_id):
+        self._datasets[(project_key, key)] = dataset_id
+        self._write({"event": "dataset", "project_key": project_key, "key": key, "id": dataset_id})
+
+    def get_uploaded_names(self, dataset_id):
+        with self._lock:
+            return set(self._uploaded[dataset_id])
+
+    def add_batch(self, dataset_id, names, image_ids):
+        with self._lock:
+            self._uploaded[dataset_id].update(names)
+        self._write({"event": "batch", "dataset_id": dataset_id, "names": names, "ids": image_ids})
+
+
+def get_or_create_project(api, journal, key, workspace_id, project_name):
+    project_id = journal.get_project_id(key)
+    if project_id is not None:
+        project = api.project.get_info_by_id(project_id)
+        if project is not None:
+            sly.logger.info(
+                f"Resuming import to existing project {project.name!r} (id: {project.id})."
+            )
+            return project
+    project = api.project.create(workspace_id, project_name, change_name_if_conflict=True)
+    journal.add_project(key, project.id)
+    return project
+
+
+def get_or_create_datasets(api, journal, project_key, project_id, datasets):
+    """
+    Creates all datasets of the project at once. Datasets from the journal are checked
+    by a single listing of the project instead of a request per dataset.
+
+    :param datasets: list of (dataset key, dataset name) pairs
+    :return: dict of dataset key -> (DatasetInfo, resumed), `resumed` is True for datasets
+        that existed before, so they may contain uploaded images
+    """
+    existing = {}
+    if any(journal.get_dataset_id(project_key, key) is not None for key, _ in datasets):
+        existing = {dataset.id: dataset for dataset in api.dataset.get_list(project_id)}
+    result = {}
+    for key, name in datasets:
+        dataset = existing.get(journal.get_dataset_id(project_key, key))
+        if dataset is not None:
+            sly.logger.info(
+                f"Resuming import to existing dataset {dataset.name!r} (id: {dataset.id})."
+            )
+            result[key] = (dataset, True)
+            continue
+        dataset = api.dataset.create(project_id, name, change_name_if_conflict=True)
+        journal.add_dataset(project_key, key, dataset.id)
+        result[key] = (dataset, False)
+    return result
+
+
+def get_uploaded_names(api, journal, dataset_id):
+    """
+    Returns names of images that were completely uploaded (with annotations) to the dataset.
+    Images uploaded by an interrupted batch are removed from the dataset to be uploaded again.
+    """
+    journal_names = journal.get_uploaded_names(dataset_id)
+    image_infos = api.image.get_list(dataset_id)
+    incomplete_ids = [info.id for info in image_infos if info.name not in journal_names]
+    if len(incomplete_ids) > 0:
+        sly.logger.info(f"Removing {len(incomplete_ids)} images of interrupted batches.")
+        api.image.remove_batch(incomplete_ids)
+    return journal_names & {info.name for info in image_infos}
@@ -1,6 +1,8 @@
+import itertools
 import os
 import tarfile
 import zipfile
+from collections import namedtuple
 from os.path import basename, dirname, normpath
 from pathlib import Path
 
@@ -8,6 +10,38 @@ import supervisely as sly
 import yaml
 from dotenv import load_dotenv
 
+from annotation import GRAPH, RECTANGLE, create_obj_class
+from archive import TAR_EXTENSIONS, extract_tar, extract_zip, stream_tar_from_team_files
+from checkpoint import (
+    ImportJournal,
+    get_or_create_datasets,
+    get_or_create_project,
+    get_uploaded_names,
+    journal_path,
+)
+from dedup import DedupUploader, HashCache, ImageHasher
+from delta import COMPARE_MODES, NAME, DatasetDelta, ProjectListing
+from discovery import SKIPPED_IMAGE_EXTS, InputIndex
+from label_index import LabelIndex, get_labels_dir
+from labels import BBOX, POLYGON, read_first_format
+from local_project import LINK_MODES, LocalProjectApi
+from palette import generate_colors
+from parse_cache import ParseCache
+from preparation import POOL_TYPES, ImagePreparer, PrepareContext, default_workers_count
+from profiler import Profiler
+from scheduler import ImportScheduler, InFlightBudget
+from sources import LocalSource, RemoteSource, TarSource, ZipSource
+from transcoding import (
+    FORMAT_EXTS,
+    TranscodeSettings,
+    TranscodeStats,
+    find_name_collisions,
+    get_transcoded_name,
+    transcode_chunk,
+)
+from uploader import AdaptiveBatcher, UploadBatch, UploadPipeline, upload_batch
+from validation import summarize_reports, validate_dataset, validate_items
+from walker import CONFIG, IMAGE, LABEL, batched, walk_files
 from workflow import Workflow
 
 if sly.is_development():
@@ -17,10 +51,22 @@ if sly.is_development():
 # region constants
 STORAGE_DIR = os.path.join(os.getcwd(), "storage")
 DATA_CONFIG_NAME = "data_config.yaml"
+# Long lists of skipped files are truncated in logs.
+MAX_LOGGED_NAMES = 100
+# Number of label files of every dataset sampled to detect geometry of classes.
+LABEL_FORMAT_SAMPLES = 100
 ARCHIVE_EXTENSIONS = [".zip", ".tar", ".gz", ".tar.gz", ".tgz", ".xz"]
 # region envvars
-team_id = sly.env.team_id()
-workspace_id = sly.env.workspace_id()
+# Convert to Supervisely projects in OUTPUT_DIR instead of uploading them to the platform:
+# FOLDER and FILE are local paths then, images are placed by OUTPUT_LINK ("link", "reflink" or
+# "copy") and written with annotations by OUTPUT_WRITERS threads.
+output_dir = os.environ.get("OUTPUT_DIR") or None
+output_writers = int(os.environ.get("OUTPUT_WRITERS", 8))
+output_link = os.environ.get("OUTPUT_LINK", "link").lower()
+if output_link not in LINK_MODES:
+    raise ValueError(f"OUTPUT_LINK must be one of {LINK_MODES}, got {output_link!r}")
+team_id = sly.env.team_id(raise_not_found=output_dir is None)
+workspace_id = sly.env.workspace_id(raise_not_found=output_dir is None)
 input_dir = sly.env.folder(raise_not_found=False)
 task_id = sly.env.task_id(raise_not_found=False)
 # If path to the import dir from env variable does not end with slash, add it, otherwise the error will occur.
@@ -30,14 +76,118 @@ if input_dir is not None and not input_dir.endswith("/"):
     )
     input_dir += "/"
 input_file = sly.env.file(raise_not_found=False)
+# Continue the previous import of the same input using the journal in CHECKPOINT_DIR.
+resume = os.environ.get("RESUME", "false").lower() in ["1", "true", "yes"]
+checkpoint_dir = os.environ.get("CHECKPOINT_DIR", os.path.join(os.getcwd(), "checkpoints"))
+# "lazy" downloads images of the input folder in batches right before upload, "download" downloads
+# the folder entirely.
+folder_mode = os.environ.get("FOLDER_MODE", "download").lower()
+download_workers = int(os.environ.get("DOWNLOAD_WORKERS", 8))
+# "stream" extracts tar archives while downloading and reads zip members on demand,
+# "extract" extracts archives entirely.
+archive_mode = os.environ.get("ARCHIVE_MODE", "stream").lower()
+# Number of threads extracting members of zip archive in "extract" mode.
+extract_workers = int(os.environ.get("EXTRACT_WORKERS", 4))
+# Pool used to prepare images and annotations before upload: "process", "thread" or "none".
+prepare_pool = os.environ.get("PREPARE_POOL", "process").lower()
+if prepare_pool not in POOL_TYPES:
+    raise ValueError(f"PREPARE_POOL must be one of {POOL_TYPES}, got {prepare_pool!r}")
+prepare_workers = int(os.environ.get("PREPARE_WORKERS", default_workers_count()))
+# Number of batches uploaded simultaneously and number of prepared batches waiting for upload.
+upload_concurrency = int(os.environ.get("UPLOAD_CONCURRENCY", 2))
+upload_queue_size = int(os.environ.get("UPLOAD_QUEUE_SIZE", upload_concurrency))
+# Initial size of uploaded batch (images and annotations) and upload time of a batch:
+# faster batches grow, slower or failed ones shrink.
+upload_batch_mb = float(os.environ.get("UPLOAD_BATCH_MB", 64))
+upload_batch_seconds = float(os.environ.get("UPLOAD_BATCH_SECONDS", 30))
+# Number of datasets (of all projects) converted simultaneously and limit of total size
+# of images that are fetched but not uploaded yet (0 - no limit).
+import_concurrency = int(os.environ.get("IMPORT_CONCURRENCY", 4))
+inflight_budget_mb = int(os.environ.get("INFLIGHT_BUDGET_MB", 1024))
+# Upload every unique image payload once, hashes are cached in HASH_CACHE_PATH between runs.
+deduplicate = os.environ.get("DEDUPLICATE", "false").lower() in ["1", "true", "yes"]
+hash_workers = int(os.environ.get("HASH_WORKERS", 4))
+hash_cache_path = os.environ.get(
+    "HASH_CACHE_PATH", os.path.join(checkpoint_dir, "hash_cache.sqlite3")
+)
+# Cache of annotations prepared from image and label files, so reruns do not prepare unchanged files
+# again. Size of the cache is limited to PARSE_CACHE_MB (0 - disabled, the default: filling
+# the cache slows down the first run, it pays off for reruns of the same input only).
+parse_cache_mb = int(os.environ.get("PARSE_CACHE_MB", 0))
+parse_cache_path = os.environ.get(
+    "PARSE_CACHE_PATH", os.path.join(checkpoint_dir, "parse_cache.sqlite3")
+)
+# Transcode images before upload to TRANSCODE_FORMAT ("jpeg" or "webp", empty - keep the format)
+# and downscale images whose longest side is larger than MAX_IMAGE_SIDE pixels (0 - no limit).
+transcode_format = os.environ.get("TRANSCODE_FORMAT", "").lower() or None
+if transcode_format is not None and transcode_format not in FORMAT_EXTS:
+    raise ValueError(
+        f"TRANSCODE_FORMAT must be one of {list(FORMAT_EXTS)}, got {transcode_format!r}"
+    )
+transcode_quality = int(os.environ.get("TRANSCODE_QUALITY", 90))
+max_image_side = int(os.environ.get("MAX_IMAGE_SIDE", 0))
+# Import the input into the existing project DELTA_PROJECT_ID: only new and changed images are
+# uploaded (compared with uploaded ones by name and DELTA_COMPARE: "size" or "hash"), annotations
+# are updated for changed labels, images not found locally are removed if DELTA_REMOVE_DELETED
+# is enabled.
+delta_project_id = os.environ.get("DELTA_PROJECT_ID") or None
+if delta_project_id is not None:
+    delta_project_id = int(delta_project_id)
+delta_compare = os.environ.get("DELTA_COMPARE", "size").lower()
+if delta_compare not in COMPARE_MODES:
+    raise ValueError(f"DELTA_COMPARE must be one of {COMPARE_MODES}, got {delta_compare!r}")
+delta_remove_deleted = os.environ.get("DELTA_REMOVE_DELETED", "false").lower() in [
+    "1",
+    "true",
+    "yes",
+]
+if output_dir is not None and delta_project_id is not None:
+    raise ValueError(
+        "DELTA_PROJECT_ID can not be used with OUTPUT_DIR: delta import requires the platform"
+    )
+# Only validate the input locally (no projects are created) and save the report to storage dir.
+dry_run = os.environ.get("DRY_RUN", "false").lower() in ["1", "true", "yes"]
+# Collect per-stage timings, log them every PROFILE_LOG_INTERVAL seconds
+# and save the report to storage dir.
+profile = os.environ.get("PROFILE", "false").lower() in ["1", "true", "yes"]
+profile_log_interval = float(os.environ.get("PROFILE_LOG_INTERVAL", 30))
 # endregion
 sly.logger.info(
     f"Team: {team_id}, Workspace: {workspace_id}, "
-    f"Input directory: {input_dir}, Input file: {input_file}"
+    f"Input directory: {input_dir}, Input file: {input_file}, "
+    f"Prepare pool: {prepare_pool} ({prepare_workers} workers), "
+    f"Upload concurrency: {upload_concurrency}, Import concurrency: {import_concurrency}"
 )
 if not task_id:
     sly.logger.info("Task id is not found. Looks like app working in development mode.")
+if output_dir is not None:
+    sly.logger.info(
+        f"Projects will be written to local directory {output_dir} (link mode: {output_link}, "
+        f"{output_writers} writers) instead of being uploaded."
+    )
+    if resume or deduplicate:
+        sly.logger.warn(
+            "RESUME and DEDUPLICATE are not supported with OUTPUT_DIR and are disabled."
+        )
+        resume = deduplicate = False
 sly.fs.mkdir(STORAGE_DIR, remove_content_if_exists=True)
+PROFILE_REPORT_PATH = os.path.join(STORAGE_DIR, "profile_report.json")
+DRY_RUN_REPORT_PATH = os.path.join(STORAGE_DIR, "dry_run_report.json")
+# Transcoded copies of images are kept here until they are uploaded.
+TRANSCODE_DIR = os.path.join(STORAGE_DIR, ".transcoded")
+profiler = Profiler(enabled=profile, log_interval=profile_log_interval)
+transcode_settings = None
+transcode_stats = None
+if transcode_format is not None or max_image_side > 0:
+    transcode_settings = TranscodeSettings(
+        transcode_format, transcode_quality, max_image_side, TRANSCODE_DIR
+    )
+    transcode_stats = TranscodeStats(transcode_settings)
+    sly.fs.mkdir(TRANSCODE_DIR)
+    sly.logger.info(
+        f"Images will be transcoded before upload: format {transcode_format or 'unchanged'}, "
+        f"quality {transcode_quality}, max side {max_image_side or 'unlimited'}"
+    )
 
 coco_classes = [
     "person",
@@ -123,14 +273,6 @@ coco_classes = [
 ]
 
 
-def generate_colors(count):
-    colors = []
-    for _ in range(count):
-        new_color = sly.color.generate_rgb(colors)
-        colors.append(new_color)
-    return colors
-
-
 def get_coco_names(config_yaml):
     if "names" not in config_yaml:
         sly.logger.warn(
@@ -142,11 +284,56 @@ def get_coco_names(config_yaml):
 
 
 def get_coco_classes_colors(config_yaml, default_count):
-    return config_yaml.get("colors", generate_colors(default_count))
+    if "colors" in config_yaml:
+        return config_yaml["colors"]
+    return generate_colors(default_count)
+
+
+def get_kpt_shape(config_yaml):
+    kpt_shape = config_yaml.get("kpt_shape")
+    if kpt_shape is None:
+        return None
+    if (
+        not isinstance(kpt_shape, list)
+        or len(kpt_shape) != 2
+        or not all(isinstance(value, int) for value in kpt_shape)
+        or kpt_shape[0] <= 0
+        or kpt_shape[1] not in [2, 3]
+    ):
+        raise Exception(
+            "Invalid 'kpt_shape' {!r} in {!r}: expected [number of keypoints, 2 or 3]".format(
+                kpt_shape, DATA_CONFIG_NAME
+            )
+        )
+    return tuple(kpt_shape)
+
+
+def detect_geometry(input_dir, config_yaml_info):
+    """
+    Detects geometry of object classes by the first lines of up to LABEL_FORMAT_SAMPLES label
+    files of every dataset: rectangles, polygons or both (any geometry).
+    Projects with 'kpt_shape' in the config are keypoints projects.
+    """
+    if config_yaml_info["kpt_shape"] is not None:
+        return GRAPH
+    formats = set()
+    for _, dataset_path in config_yaml_info["datasets"]:
+        labels_dir = get_labels_dir(input_dir, dataset_path)
+        if labels_dir is None:
+            continue
+        label_paths = (path for kind, path in walk_files(labels_dir) if kind == LABEL)
+        for path in itertools.islice(label_paths, LABEL_FORMAT_SAMPLES):
+            formats.add(read_first_format(path))
+    formats.discard(None)
+    if formats == {POLYGON}:
+        return sly.Polygon.geometry_name()
+    if formats == {BBOX, POLYGON}:
+        return sly.AnyGeometry.geometry_name()
+    return RECTANGLE
 
 
-def read_config_yaml(config_yaml_path):
-    result = {"names": None, "colors": None, "datasets": []}
+def read_config_yaml(config_yaml_path, create_missing_dirs=True):
+    result = {"names": None, "colors": None, "datasets": [], "kpt_shape": None}
 
     if not os.path.isfile(config_yaml_path):
         raise Exception("File {!r} not found".format(config_yaml_path))
@@ -154,6 +341,7 @@ def read_config_yaml(config_yaml_path):
     with open(config_yaml_path, "r") as config_yaml_info:
         config_yaml = yaml.safe_load(config_yaml_info)
         result["names"] = get_coco_names(config_yaml)
+        result["kpt_shape"] = get_kpt_shape(config_yaml)
         result["colors"] = get_coco_classes_colors(config_yaml, len(result["names"]))
 
         if "nc" not in config_yaml:
@@ -175,7 +363,9 @@ def read_config_yaml(config_yaml_path):
                     DATA_CONFIG_NAME
                 )
             )
-            result["colors"] = generate_colors(len(result["names"]))
+            # Colors are already generated if the key is missing.
+            if len(result["colors"]) != len(result["names"]):
+                result["colors"] = generate_colors(len(result["names"]))
         elif result["names"] == coco_classes or len(result["names"]) != len(
             config_yaml.get("colors")
         ):
@@ -222,24 +412,33 @@ def read_config_yaml(config_yaml_path):
                         "No 'train' or 'val' directories found. Please check the project directory or config file."
                     )
 
-                elif len(result["datasets"]) == 1:
+                elif len(result["datasets"]) == 1 and create_missing_dirs:
                     os.makedirs(cur_dataset_path)
                     sly.logger.info(
                         f"The directory {cur_dataset_path} wasn't found. It was created."
                     )
 
+                elif len(result["datasets"]) == 1:
+                    sly.logger.info(f"The directory {cur_dataset_path} wasn't found. Skipped.")
+
     sly.logger.info(f"Config file {DATA_CONFIG_NAME} has been successfully read.")
     sly.logger.info(f"Was found {len(result['datasets'])} datasets in {DATA_CONFIG_NAME}.")
 
     return result
 
 
-def upload_project_meta(api, project_id, config_yaml_info):
+def upload_project_meta(api, project_id, config_yaml_info, merge=False):
+    """
+    Updates meta of the project, classes and tags are added to the existing ones if `merge` is True.
+    """
     classes = []
     for class_id, class_name in enumerate(config_yaml_info["names"]):
         yaml_class_color = config_yaml_info["colors"][class_id]
-        obj_class = sly.ObjClass(
-            name=class_name, geometry_type=sly.Rectangle, color=yaml_class_color
+        obj_class = create_obj_class(
+            class_name,
+            config_yaml_info["geometry"],
+            yaml_class_color,
+            config_yaml_info["kpt_shape"],
         )
         classes.append(obj_class)
 
@@ -252,171 +451,336 @@ def upload_project_meta(api, project_id, config_yaml_info):
         obj_classes=sly.ObjClassCollection(items=classes),
         tag_metas=sly.TagMetaCollection(items=tags_arr),
     )
+    if merge:
+        # Raises an error if a class of the project has the same name, but another geometry.
+        existing_meta = sly.ProjectMeta.from_json(api.project.get_meta(project_id))
+        project_meta = existing_meta.merge(project_meta)
     api.project.update_meta(project_id, project_meta.to_json())
     return project_meta
 
 
-def convert_geometry(x_center, y_center, ann_width, ann_height, img_width, img_height):
-    x_center = float(x_center)
-    y_center = float(y_center)
-    ann_width = float(ann_width)
-    ann_height = float(ann_height)
-
-    px_x_center = x_center * img_width
-    px_y_center = y_center * img_height
-
-    px_ann_width = ann_width * img_width
-    px_ann_height = ann_height * img_height
-
-    left = px_x_center - (px_ann_width / 2)
-    right = px_x_center + (px_ann_width / 2)
-
-    top = px_y_center - (px_ann_height / 2)
-    bottom = px_y_center + (px_ann_height / 2)
-
-    return sly.Rectangle(top, left, bottom, right)
+# Dataset of a project created before conversion. `resumed` is True if the dataset
+# existed before, so it may already contain uploaded images. `images` is the number of images
+# found by discovery. `delta` is DatasetDelta if images are imported into an existing dataset.
+DatasetPlan = namedtuple(
+    "DatasetPlan", ["type", "path", "info", "resumed", "images", "delta"], defaults=[None]
+)
 
 
-def parse_line(line, img_width, img_height, project_meta, config_yaml_info):
-    line_parts = line.split()
-    if len(line_parts) != 5:
-        raise Exception("Invalid annotation format")
-    else:
-        class_id, x_center, y_center, ann_width, ann_height = line_parts
-        class_name = config_yaml_info["names"][int(class_id)]
-        return sly.Label(
-            convert_geometry(x_center, y_center, ann_width, ann_height, img_width, img_height),
-            project_meta.get_obj_class(class_name),
+def create_datasets(api, journal, project_key, project_id, config_yaml_info, index):
+    """Creates all non-empty datasets of the project up front and returns their DatasetPlans."""
+    datasets = []
+    for dataset_type, dataset_path in config_yaml_info["datasets"]:
+        if index.count_images(dataset_path) == 0:
+            sly.logger.warning(f"Dataset: {basename(dataset_path)} is empty. It will be skipped.")
+            continue
+        datasets.append((dataset_type, dataset_path))
+    infos = get_or_create_datasets(
+        api,
+        journal,
+        project_key,
+        project_id,
+        [(dataset_type, basename(dataset_path)) for dataset_type, dataset_path in datasets],
+    )
+    return [
+        DatasetPlan(
+            dataset_type, dataset_path, *infos[dataset_type], index.count_images(dataset_path)
         )
+        for dataset_type, dataset_path in datasets
+    ]
+
+
+def find_renamed_images(paths):
+    """Images whose transcoded names keep the original extension (see `find_name_collisions`)."""
+    if transcode_settings is None:
+        return set()
+    with profiler.stage("name_collisions"):
+        return find_name_collisions(paths, transcode_settings)
+
+
+def get_upload_name(image_path, transcoded, renamed):
+    """
+    Name of the uploaded image, `transcoded` is TranscodedImage
+    or None if the image is uploaded as is.
+    """
+    if transcoded is None:
+        return basename(image_path)
+    return get_transcoded_name(basename(image_path), transcode_settings, image_path in renamed)
+
+
+def is_uploaded(image_path, uploaded_names, renamed):
+    """
+    Checks if the image has been uploaded before: names of transcoded images have another extension.
+    """
+    name = basename(image_path)
+    if name in uploaded_names:
+        return True
+    return (
+        transcode_settings is not None
+        and get_transcoded_name(name, transcode_settings, image_path in renamed) in uploaded_names
+    )
 
 
-def process_coco_dir(input_dir, project, project_meta, api, config_yaml_info):
+def create_delta_datasets(api, project_id, config_yaml_info, index, hasher=None):
+    """
+    Finds datasets of the existing project by name (datasets that are not found are created)
+    and returns their DatasetPlans with differences from the local datasets.
+    """
+    with profiler.stage("list_project") as stage:
+        listing = ProjectListing(api, project_id)
+        stage.add(items=listing.images_count)
+    sly.logger.info(
+        f"Delta import: the project has {len(listing.datasets)} datasets "
+        f"and {listing.images_count} images."
+    )
+    # Sizes and hashes of transcoded images differ from the local ones.
+    compare = NAME if transcode_settings is not None else delta_compare
+    datasets = []
     for dataset_type, dataset_path in config_yaml_info["datasets"]:
-        tag_meta = project_meta.get_tag_meta(dataset_type)
+        images_count = index.count_images(dataset_path)
+        if images_count == 0:
+            sly.logger.warning(f"Dataset: {basename(dataset_path)} is empty. It will be skipped.")
+            continue
         dataset_name = basename(dataset_path)
-
-        images_list = sorted(
-            sly.fs.list_files(
-                dataset_path,
-                valid_extensions=sly.image.SUPPORTED_IMG_EXTS,
-                ignore_valid_extensions_case=True,
-            )
+        dataset = listing.datasets.get(dataset_name)
+        if dataset is None:
+            dataset = api.dataset.create(project_id, dataset_name)
+        delta = DatasetDelta(
+            dataset.id, listing.get_images(dataset.id), compare, hasher, delta_remove_deleted
         )
-        if len(images_list) == 0:
-            sly.logger.warning(f"Dataset: {dataset_name} is empty. It will be skipped.")
-            continue
-
-        dataset = api.dataset.create(project.id, dataset_name, change_name_if_conflict=True)
-        progress = sly.Progress(f"Processing {dataset_name} dataset", len(images_list))
-        bad_images = []
-        for batch in sly._utils.batched(images_list):
-            cur_img_names = []
-            cur_img_paths = []
-            cur_anns = []
-
-            for image_file_name in batch:
-                try:
-                    sly.image.validate_format(image_file_name)
-                except:
-                    bad_images.append(image_file_name)
-                    continue
-                image_name = basename(image_file_name)
-                cur_img_names.append(image_name)
-                cur_img_paths.append(image_file_name)
-                ann_file_name = os.path.join(
-                    input_dir,
-                    "labels",
-                    dataset_name,
-                    "{}.txt".format(os.path.splitext(image_name)[0]),
-                )
-                curr_img = sly.image.read(image_file_name)
-                height, width = curr_img.shape[:2]
-
-                labels_arr = []
-                if os.path.isfile(ann_file_name):
-                    with open(ann_file_name, "r") as f:
-                        for idx, line in enumerate(f):
-                            try:
-                                label = parse_line(
-                                    line, width, height, project_meta, config_yaml_info
-                                )
-                                labels_arr.append(label)
-                            except Exception as e:
-                                sly.logger.warn(
-                                    e,
-                                    {
-                                        "filename": ann_file_name,
-                                        "line": line,
-                                        "line_num": idx,
-                                    },
-                                )
-
-                tags_arr = sly.TagCollection(items=[sly.Tag(tag_meta)])
-                ann = sly.Annotation(img_size=(height, width), labels=labels_arr, img_tags=tags_arr)
-                cur_anns.append(ann)
+        datasets.append(
+            DatasetPlan(dataset_type, dataset_path, dataset, False, images_count, delta)
+        )
+    return datasets
+
+
+def process_dataset(input_dir, project, api, plan, config_yaml_info, journal, preparer, uploader):
+    dataset_type, dataset_path, dataset = plan.type, plan.path, plan.info
+    dataset_name = basename(dataset_path)
+    source = uploader.source
+
+    # Images are streamed from the directory, so datasets with millions of files
+    # are not listed in memory.
+    images = source.iter_images(dataset_path)
+    first_image = next(images, None)
+    if first_image is None:
+        return
+
+    with profiler.stage("match_labels") as stage:
+        label_index = LabelIndex(get_labels_dir(input_dir, dataset_path))
+        stage.add(items=label_index.labels_count)
+
+    # Transcoded images must not replace other images of the dataset with the same name.
+    renamed = find_renamed_images(source.iter_images(dataset_path))
+    # Datasets created by this run can not contain uploaded images.
+    uploaded_names = get_uploaded_names(api, journal, dataset.id) if plan.resumed else set()
+    # Total is corrected when all images are found: some of them may have been uploaded before.
+    progress = sly.Progress(f"Processing {project.name}/{dataset_name} dataset", plan.images)
+    counts = {"images": 0, "unlabeled": 0, "uploaded": 0}
+
+    context = PrepareContext(
+        tuple(config_yaml_info["names"]),
+        dataset_type,
+        config_yaml_info["geometry"],
+        config_yaml_info["kpt_shape"],
+        transcode_settings,
+        # Fingerprints of labels are stored only by delta imports, the next ones compare them.
+        label_hash=plan.delta is not None,
+    )
 
-            try:
-                img_infos = api.image.upload_paths(dataset.id, cur_img_names, cur_img_paths)
-                img_ids = [x.id for x in img_infos]
-                api.annotation.upload_anns(img_ids, cur_anns)
-            except Exception as e:
-                sly.logger.warn(msg=e)
+    def _iter_local_items():
+        for image_path in itertools.chain([first_image], images):
+            ann_path = label_index.find(image_path, dataset_path)
+            if is_uploaded(image_path, uploaded_names, renamed):
+                counts["uploaded"] += 1
+                continue
+            counts["unlabeled"] += ann_path is None
+            yield image_path, ann_path
+
+    def _iter_items():
+        items = _iter_local_items()
+        if plan.delta is not None:
+            # Only new and changed images are uploaded to the existing dataset.
+            items = plan.delta.filter(items, context, source, renamed)
+        for image_path, ann_path in items:
+            counts["images"] += 1
+            yield image_path, ann_path
+        uploader.set_progress_total(progress, counts["images"])
 
-            progress.iters_done_report(len(batch))
-        if len(bad_images) > 0:
-            sly.logger.warn(
-                f"{dataset_name}: skipped {len(bad_images)} images with unsupported format: {bad_images}"
+    bad_images = []
+    for batch in preparer.prepare(_iter_items(), context, source, budget=uploader.budget):
+        cur_img_names = []
+        cur_img_paths = []
+        cur_anns = []
+        cur_metas = []
+
+        for prepared in batch:
+            for msg, extra in prepared.warnings:
+                sly.logger.warn(msg, extra)
+            if prepared.ann_json is None:
+                bad_images.append(prepared.path)
+                uploader.release([prepared.path])
+                continue
+            if transcode_stats is not None:
+                transcode_stats.add(prepared.transcoded)
+            if prepared.transcoded is not None:
+                uploader.add_copy(prepared.path, prepared.transcoded.path)
+                cur_img_paths.append(prepared.transcoded.path)
+            else:
+                cur_img_paths.append(prepared.path)
+            name = get_upload_name(prepared.path, prepared.transcoded, renamed)
+            if plan.delta is not None:
+                name = plan.delta.get_upload_name(prepared.path, name)
+            cur_img_names.append(name)
+            cur_anns.append(prepared.ann_json)
+            cur_metas.append(prepared.meta)
+
+        uploader.submit(
+            UploadBatch(
+                dataset.id,
+                cur_img_names,
+                cur_img_paths,
+                cur_anns,
+                progress,
+                len(batch),
+                cur_metas if context.label_hash else None,
             )
-
-    sly.logger.info(f"Project {project.name} has been successfully uploaded.")
+        )
+        if plan.delta is not None:
+            # Annotations of images with changed labels are updated along with the uploads.
+            plan.delta.submit_updates(api, uploader, context)
+    if plan.delta is not None:
+        plan.delta.finish(api, uploader, context)
+        counts["uploaded"] += plan.delta.skipped_count
+    sly.logger.info(
+        f"Dataset: {dataset_name}: found {counts['images'] + counts['uploaded']} images and "
+        f"{label_index.labels_count} label files in {label_index.labels_dir}. "
+        f"Images without labels: {counts['unlabeled']}, "
+        f"labels without images: {label_index.orphans_count}."
+    )
+    if counts["uploaded"] > 0:
+        sly.logger.info(
+            f"Dataset: {dataset_name}: {counts['uploaded']} images had already been uploaded "
+            "and were skipped."
+        )
+    if len(bad_images) > 0:
+        sly.logger.warn(
+            f"{dataset_name}: skipped {len(bad_images)} images with unsupported format: {bad_images}"
+        )
+    uploader.wait_dataset(dataset.id)
+    if plan.delta is not None:
+        plan.delta.log_report(dataset_name)
+
+
+def process_coco_dir(
+    input_dir,
+    project,
+    api,
+    config_yaml_info,
+    datasets,
+    journal,
+    project_key,
+    preparer,
+    uploader,
+    scheduler,
+):
+    """Schedules conversion of all datasets of the project, see `process_dataset`."""
+    scheduler.add_project(project_key)
+    for plan in datasets:
+        scheduler.submit(
+            project_key,
+            process_dataset,
+            input_dir,
+            project,
+            api,
+            plan,
+            config_yaml_info,
+            journal,
+            preparer,
+            uploader,
+        )
 
 
-def upload_images_only(api: sly.Api, team_id, input_dir):
+def upload_images_only(
+    api: sly.Api, team_id, input_dir, source, journal, index, upload_fn=upload_batch
+):
     # global team_id, workspace_id, PROJECT_ID, input_dir, input_file
 
-    def _filter_image_file_extention(file_name):
-        ext = sly.fs.get_file_ext(file_name).lower()
-        return ext in sly.image.SUPPORTED_IMG_EXTS and ext != ".nrrd"
-
-    def _filter_unsupported_files(file_name):
-        ext = sly.fs.get_file_ext(file_name).lower()
-        return ext not in [".yaml", ".txt"] + sly.image.SUPPORTED_IMG_EXTS or ext == ".nrrd"
+    def _is_image(kind, path):
+        return kind == IMAGE and sly.fs.get_file_ext(path).lower() not in SKIPPED_IMAGE_EXTS
 
-    bad_files = sly.fs.list_files_recursively(input_dir, filter_fn=_filter_unsupported_files)
-    images_list = sly.fs.list_files_recursively(input_dir, filter_fn=_filter_image_file_extention)
-
-    if len(bad_files) > 0:
-        file_names = [sly.fs.get_file_name_with_ext(file_path) for file_path in bad_files]
-        sly.logger.warn(f"Skipped {len(bad_files)} files with unsupported format: {file_names}")
-    if len(images_list) == 0:
+    # Project name (common parent directory of all images) must be known before upload,
+    # so counters are taken from the discovery index and images are streamed from the source.
+    images_count = index.images_count
+    bad_files_count = index.unsupported_count
+    bad_file_names = index.unsupported_names
+    if bad_files_count > 0:
+        sly.logger.warn(
+            f"Skipped {bad_files_count} files with unsupported format: {bad_file_names}"
+            + (" ..." if bad_files_count > len(bad_file_names) else "")
+        )
+    if images_count == 0:
         raise Exception("Not found images in the input directory")
-    if len(images_list) == 1:
-        common_parent_dir = os.path.dirname(images_list[0])
-    else:
-        common_parent_dir = os.path.commonpath(images_list)
-    project_name = basename(common_parent_dir.strip("/"))
+    project_name = basename(index.get_images_dir().strip("/"))
+
+    project = get_or_create_project(api, journal, "", workspace_id, project_name)
+    datasets = get_or_create_datasets(api, journal, "", project.id, [("train", "train")])
+    dataset, resumed = datasets["train"]
+    uploaded_names = get_uploaded_names(api, journal, dataset.id) if resumed else set()
+    renamed = find_renamed_images(
+        path for kind, path in source.walk_files(input_dir) if _is_image(kind, path)
+    )
+    images = (
+        path
+        for kind, path in source.walk_files(input_dir)
+        if _is_image(kind, path) and not is_uploaded(path, uploaded_names, renamed)
+    )
+    if len(uploaded_names) > 0:
+        sly.logger.info(
+            f"{len(uploaded_names)} images have already been uploaded. "
+            f"{images_count - len(uploaded_names)} images left."
+        )
 
-    project = api.project.create(workspace_id, project_name, change_name_if_conflict=True)
-    dataset = api.dataset.create(project.id, "train", change_name_if_conflict=True)
+    def _on_uploaded(batch, img_ids):
+        journal.add_batch(batch.dataset_id, batch.names, img_ids)
 
     bad_images = []
-    progress = sly.Progress("Processing only images", len(images_list))
-    for batch in sly.batched(images_list):
-        img_names = []
-        img_paths = []
-        for img in batch:
-            try:
-                sly.image.validate_format(img)
-            except:
-                bad_images.append(img)
-                continue
-            img_names.append(basename(img))
-            img_paths.append(img)
-        try:
-            api.image.upload_paths(dataset.id, img_names, img_paths)
-        except Exception as e:
-            sly.logger.warn(msg=e)
-        progress.iters_done_report(len(batch))
+    progress = sly.Progress("Processing only images", images_count - len(uploaded_names))
+    # Batches are small, so every image is transcoded in the pool separately.
+    with ImagePreparer(
+        prepare_pool, prepare_workers, chunk_size=1, profiler=profiler
+    ) as preparer, UploadPipeline(
+        api,
+        source,
+        upload_concurrency,
+        upload_queue_size,
+        upload_fn=upload_fn,
+        on_uploaded=_on_uploaded,
+        profiler=profiler,
+        batcher=AdaptiveBatcher(int(upload_batch_mb * 1024 * 1024), upload_batch_seconds),
+    ) as uploader:
+        for batch in batched(images, 50):
+            img_names = []
+            img_paths = []
+            with profiler.stage("fetch", items=len(batch)):
+                source.fetch(batch)
+            with profiler.stage("validate", items=len(batch)):
+                for img in batch:
+                    try:
+                        sly.image.validate_format(img)
+                    except:
+                        bad_images.append(img)
+                        source.release([img])
+                        continue
+                    img_names.append(basename(img))
+                    img_paths.append(img)
+            if transcode_settings is not None:
+                img_names, img_paths = transcode_images(
+                    img_paths, source, preparer, uploader, renamed
+                )
+            uploader.submit(
+                UploadBatch(dataset.id, img_names, img_paths, None, progress, len(batch))
+            )
     if len(bad_images) > 0:
         sly.logger.warn(f"Skipped {len(bad_images)} images with unsupported format: {bad_images}")
     try:
@@ -432,22 +796,182 @@ def upload_images_only(api: sly.Api, team_id, input_dir):
     # ----------------------------------------------- - ---------------------------------------------- #
 
 
-def find_markers(input_dir):
-    paths = sly.fs.list_files_recursively(input_dir, valid_extensions=".yaml")
-    markers = [basename(path) for path in paths]
-    if len(markers) == 0:
-        sly.logger.warn("No config files found in directory. Keep by default: data_config.yaml")
-        markers = [DATA_CONFIG_NAME]
-    if len(markers) == 1:
-        sly.logger.info(f"Found config file: {paths}")
-    elif len(markers) > 1:
-        sly.logger.info(f"Found {len(markers)} config files in directory: {paths}")
-    return list(set(markers))
+def transcode_images(img_paths, source, preparer, uploader, renamed):
+    """
+    Transcodes fetched images in the pool of `preparer`, copies are uploaded instead of the images.
+    Returns names and paths of images to upload.
+    Images that can not be transcoded are uploaded as is.
+    """
+    img_names = []
+    upload_paths = []
+    items = [(path, None) for path in img_paths]
+    with profiler.stage("transcode", items=len(items)):
+        for chunk, results in preparer.map_chunks(
+            transcode_chunk, items, source, transcode_settings
+        ):
+            for (path, _), (transcoded, error) in zip(chunk, results):
+                transcode_stats.add(transcoded)
+                if error is not None:
+                    sly.logger.warn(
+                        "Image can not be transcoded, the original will be uploaded",
+                        extra={"filename": path, "error": error},
+                    )
+                if transcoded is None:
+                    img_names.append(basename(path))
+                    upload_paths.append(path)
+                    continue
+                uploader.add_copy(path, transcoded.path)
+                img_names.append(get_upload_name(path, transcoded, renamed))
+                upload_paths.append(transcoded.path)
+    return img_names, upload_paths
+
+
+def discover_input(input_dir, source):
+    """Indexes all files of the input in a single walk, see `InputIndex`."""
+    with profiler.stage("discover") as stage:
+        index = InputIndex(input_dir, source, MAX_LOGGED_NAMES)
+        stage.add(items=index.files_count)
+    config_paths = index.config_paths
+    if len(config_paths) == 0:
+        sly.logger.warn("No config files found in directory.")
+    elif len(config_paths) == 1:
+        sly.logger.info(f"Found config file: {config_paths}")
+    else:
+        sly.logger.info(f"Found {len(config_paths)} config files in directory: {config_paths}")
+    sly.logger.info(
+        f"Found {index.files_count} files: {index.images_count} images, "
+        f"{index.labels_count} label files, {index.unsupported_count} unsupported files."
+    )
+    return index
+
+
+def validate_input(input_dir, index, source):
+    """
+    Dry run: validates all projects found in the input locally, without creating anything
+    on the server or in the input directories. Images are read from `source` on demand.
+    The report is logged and saved to DRY_RUN_REPORT_PATH.
+    """
+    report = {"projects": []}
+    datasets = []
+    with ImagePreparer(prepare_pool, prepare_workers, profiler=profiler) as preparer:
+        for project_plan in index.find_projects(DATA_CONFIG_NAME):
+            yolo_dir = project_plan.dir
+            project_name = basename(os.path.normpath(yolo_dir))
+            project_report = {"name": project_name, "path": os.path.relpath(yolo_dir, input_dir)}
+            report["projects"].append(project_report)
+            try:
+                with profiler.stage("read_config"):
+                    config_yaml_info = read_config_yaml(
+                        project_plan.config_path, create_missing_dirs=False
+                    )
+                with profiler.stage("detect_geometry"):
+                    config_yaml_info["geometry"] = detect_geometry(yolo_dir, config_yaml_info)
+            except Exception as e:
+                sly.logger.warning(f"Dry run: project {project_name} can not be imported: {e}")
+                project_report["error"] = str(e)
+                continue
+            class_names = config_yaml_info["names"]
+            project_report["classes"] = class_names
+            project_report["geometry"] = config_yaml_info["geometry"]
+            project_report["datasets"] = []
+            for dataset_type, dataset_path in config_yaml_info["datasets"]:
+                with profiler.stage("validate_dataset"):
+                    dataset_report = validate_dataset(
+                        yolo_dir,
+                        dataset_path,
+                        class_names,
+                        source,
+                        preparer,
+                        config_yaml_info["geometry"],
+                        config_yaml_info["kpt_shape"],
+                    )
+                dataset_json = {"name": basename(dataset_path), "type": dataset_type}
+                dataset_json.update(dataset_report.to_json(class_names))
+                project_report["datasets"].append(dataset_json)
+                datasets.append(dataset_json)
+                _log_dataset_report(f"{project_name}/{dataset_json['name']}", dataset_json)
+
+        if len(report["projects"]) == 0:
+            sly.logger.warn("Dry run: no projects found, images would be uploaded without labels.")
+            counts = {"unsupported_files": 0}
+
+            def _iter_items():
+                for kind, path in source.walk_files(input_dir):
+                    if (
+                        kind == IMAGE
+                        and sly.fs.get_file_ext(path).lower() not in SKIPPED_IMAGE_EXTS
+                    ):
+                        yield path, None
+                    elif kind not in [LABEL, CONFIG]:
+                        counts["unsupported_files"] += 1
+
+            with profiler.stage("validate_dataset"):
+                dataset_json = validate_items(_iter_items(), [], source, preparer).to_json([])
+            dataset_json.update(counts)
+            report["images_only"] = dataset_json
+            datasets.append(dataset_json)
+            _log_dataset_report("images only", dataset_json)
+
+    report["total"] = summarize_reports(datasets)
+    sly.json.dump_json_file(report, DRY_RUN_REPORT_PATH, indent=4)
+    total = report["total"]
+    sly.logger.info(
+        f"Dry run: {len(report['projects'])} projects, {len(datasets)} datasets, "
+        f"{total['images']} images, {total['boxes']} boxes, estimated upload "
+        f"{total['estimated_upload_bytes'] / 1024 / 1024:.1f} MB. Report: {DRY_RUN_REPORT_PATH}",
+        extra={"total": total},
+    )
 
 
-def yolov5_sly_converter(api: sly.Api):
-    global team_id, workspace_id, PROJECT_ID, input_dir, input_file, DATA_CONFIG_NAME
-    sly.logger.info(f"Input paths: input_dir - {input_dir}. input_file - {input_file}.")
+def _log_dataset_report(name, dataset_json):
+    issues = {issue: count for issue, count in dataset_json["issues"].items() if count > 0}
+    sly.logger.info(
+        f"Dry run: {name}: {dataset_json['images']} images "
+        f"({dataset_json['unlabeled_images']} without labels), {dataset_json['boxes']} boxes, "
+        f"estimated upload {dataset_json['estimated_upload_bytes'] / 1024 / 1024:.1f} MB. "
+        f"Issues: {issues or 'none'}",
+        extra={"class_histogram": dataset_json["class_histogram"], "issues": issues},
+    )
+
+
+def extract_archive(archive_path, extract_dir, size):
+    """
+    Extracts the archive to `extract_dir` (members of zip archives are read on demand in "stream"
+    mode, members of all archives in dry run). Returns the source of images.
+    """
+    source = LocalSource()
+    # Dry run reads images from the archive on demand, so it is not extracted entirely.
+    # Junk files and members outside of the extract dir are skipped while extracting.
+    if tarfile.is_tarfile(archive_path) and dry_run:
+        with profiler.stage("extract"):
+            source = TarSource(archive_path, extract_dir)
+    elif tarfile.is_tarfile(archive_path):
+        with profiler.stage("extract", bytes=size) as stage:
+            files_count = extract_tar(archive_path, extract_dir)
+            stage.add(items=files_count)
+
+        sly.logger.info(f"Successfully extracted {files_count} files to {extract_dir}.")
+    elif zipfile.is_zipfile(archive_path) and (archive_mode == "stream" or dry_run):
+        with profiler.stage("extract"):
+            source = ZipSource(archive_path, extract_dir)
+    elif zipfile.is_zipfile(archive_path):
+        with profiler.stage("extract", bytes=size) as stage:
+            files_count = extract_zip(archive_path, extract_dir, extract_workers)
+            stage.add(items=files_count)
+
+        sly.logger.info(f"Successfully extracted {files_count} files to {extract_dir}.")
+    else:
+        sly.logger.warn("Archive cannot be unpacked {}".format(archive_path))
+        raise Exception("No such file: {}".format(archive_path))
+    return source
+
+
+def download_input(api: sly.Api, input_dir, input_file):
+    """
+    Downloads the input folder or archive from Team Files (the archive is extracted).
+    Returns the path of the input in Team Files, the local input directory and the source of images.
+    """
+    source = LocalSource()
 
     # check if file was uploaded in folder mode and change mode to file (and opposite)
     sly.logger.info("Checking input path...")
@@ -488,19 +1012,30 @@ def yolov5_sly_converter(api: sly.Api):
         extract_dir = os.path.join(STORAGE_DIR, str(Path(cur_files_path).parent).lstrip("/"))
         input_dir = os.path.join(extract_dir, Path(cur_files_path).name)
         archive_path = os.path.join(STORAGE_DIR, cur_files_path.strip("/") + ".tar")
-        project_name = Path(cur_files_path).name
-
-        sly.logger.info(
-            f"Start downloading directory from {cur_files_path} to local path: {input_dir}"
-        )
 
         if sly.fs.dir_exists(input_dir):
             sly.fs.clean_dir(input_dir)
-        size = api.file.get_directory_size(team_id, cur_files_path)
-        progress = sly.Progress("Downloading directory", total_cnt=size, is_size=True)
-        api.file.download_directory(team_id, cur_files_path, input_dir, progress.iters_done_report)
 
-        sly.logger.info(f"Successfully downloaded directory to {input_dir}.")
+        # Dry run reads images on demand, so the directory is not downloaded entirely.
+        if (folder_mode == "lazy" or dry_run) and not api.file.is_on_agent(cur_files_path):
+            sly.logger.info(
+                f"Images from {cur_files_path} will be downloaded on demand "
+                f"to local path: {input_dir}"
+            )
+            with profiler.stage("download"):
+                source = RemoteSource(api, team_id, cur_files_path, input_dir, download_workers)
+        else:
+            sly.logger.info(
+                f"Start downloading directory from {cur_files_path} to local path: {input_dir}"
+            )
+            size = api.file.get_directory_size(team_id, cur_files_path)
+            progress = sly.Progress("Downloading directory", total_cnt=size, is_size=True)
+            with profiler.stage("download", bytes=size):
+                api.file.download_directory(
+                    team_id, cur_files_path, input_dir, progress.iters_done_report
+                )
+
+            sly.logger.info(f"Successfully downloaded directory to {input_dir}.")
 
     else:
         # If the app is launched from archive file.
@@ -512,11 +1047,6 @@ def yolov5_sly_converter(api: sly.Api):
             extract_dir = os.path.splitext(extract_dir)[0]
         archive_path = os.path.join(STORAGE_DIR, sly.fs.get_file_name_with_ext(cur_files_path))
         input_dir = extract_dir
-        project_name = sly.fs.get_file_name(input_file)
-
-        sly.logger.info(
-            f"Start downloading archive from {cur_files_path} to local path: {archive_path}"
-        )
 
         if sly.fs.dir_exists(input_dir):
             sly.fs.clean_dir(input_dir)
@@ -525,53 +1055,203 @@ def yolov5_sly_converter(api: sly.Api):
             sly.fs.silent_remove(archive_path)
 
         size = api.file.get_info_by_path(team_id, cur_files_path).sizeb
-        progress = sly.Progress("Downloading archive", total_cnt=size, is_size=True)
-        api.file.download(
-            team_id, cur_files_path, archive_path, progress_cb=progress.iters_done_report
-        )
+        is_streamed = False
+        if (
+            archive_mode == "stream"
+            and not dry_run
+            and sly.fs.get_file_ext(cur_files_path).lower() in TAR_EXTENSIONS
+            and not api.file.is_on_agent(cur_files_path)
+        ):
+            sly.logger.info(
+                f"Start streaming archive from {cur_files_path} to local path: {extract_dir}"
+            )
+            progress = sly.Progress(
+                "Downloading and extracting archive", total_cnt=size, is_size=True
+            )
+            try:
+                with profiler.stage("download_extract", bytes=size) as stage:
+                    files_count = stream_tar_from_team_files(
+                        api, team_id, cur_files_path, extract_dir, progress.iters_done_report
+                    )
+                    stage.add(items=files_count)
+                is_streamed = True
+                sly.logger.info(f"Successfully extracted {files_count} files to {extract_dir}.")
+            except tarfile.ReadError as e:
+                sly.logger.warn(
+                    f"Archive can not be extracted while downloading: {e}. "
+                    "It will be downloaded entirely."
+                )
+                if sly.fs.dir_exists(extract_dir):
+                    sly.fs.clean_dir(extract_dir)
 
-        sly.logger.info(
-            f"Successfully downloaded archive to {archive_path}, will extract it to {extract_dir}."
-        )
+        if not is_streamed:
+            sly.logger.info(
+                f"Start downloading archive from {cur_files_path} to local path: {archive_path}"
+            )
 
-        if tarfile.is_tarfile(archive_path):
-            with tarfile.open(archive_path) as archive:
-                archive.extractall(extract_dir)
+            progress = sly.Progress("Downloading archive", total_cnt=size, is_size=True)
+            with profiler.stage("download", bytes=size):
+                api.file.download(
+                    team_id, cur_files_path, archive_path, progress_cb=progress.iters_done_report
+                )
 
-            sly.logger.info(f"Successfully extracted archive to {extract_dir}.")
-        elif zipfile.is_zipfile(archive_path):
-            with zipfile.ZipFile(archive_path, "r") as zip_ref:
-                zip_ref.extractall(extract_dir)
+            sly.logger.info(
+                f"Successfully downloaded archive to {archive_path}, "
+                f"will extract it to {extract_dir}."
+            )
 
-            sly.logger.info(f"Successfully extracted archive to {extract_dir}.")
-        else:
-            sly.logger.warn("Archive cannot be unpacked {}".format(archive_path))
-            raise Exception("No such file: {}".format(input_file))
+            source = extract_archive(archive_path, extract_dir, size)
+
+    return cur_files_path, input_dir, source
+
+
+def open_local_input(input_path):
+    """
+    Offline mode (OUTPUT_DIR): the local input folder is converted in place, the local archive
+    is extracted to storage dir.
+    Returns the input path, the input directory and the source of images.
+    """
+    if input_path is None:
+        raise Exception("Input is not defined: set FOLDER or FILE to a local directory or archive.")
+    input_path = os.path.abspath(input_path)
+    if os.path.isdir(input_path):
+        sly.logger.info(f"The app is launched from local directory: {input_path}")
+        return input_path, input_path, LocalSource()
+    if (
+        not os.path.isfile(input_path)
+        or sly.fs.get_file_ext(input_path).lower() not in ARCHIVE_EXTENSIONS
+    ):
+        raise Exception(f"Input {input_path!r} must be a local directory or archive file.")
+
+    sly.logger.info(f"The app is launched from local archive file: {input_path}")
+    extract_dir = os.path.join(STORAGE_DIR, sly.fs.get_file_name(input_path))
+    if sly.fs.get_file_ext(extract_dir) in ARCHIVE_EXTENSIONS:
+        extract_dir = os.path.splitext(extract_dir)[0]
+    source = extract_archive(input_path, extract_dir, os.path.getsize(input_path))
+    return input_path, extract_dir, source
 
-        extracted_paths = sly.fs.list_dir_recursively(
-            extract_dir, include_subdirs=True, use_global_paths=True
-        )
-        for path in extracted_paths:
-            if sly.fs.get_file_name_with_ext(path).startswith("._"):
-                sly.fs.silent_remove(path)
 
-    sly.fs.remove_junk_from_dir(input_dir)
+def yolov5_sly_converter(api: sly.Api):
+    global input_dir
+    sly.logger.info(f"Input paths: input_dir - {input_dir}. input_file - {input_file}.")
+    if output_dir is not None:
+        cur_files_path, input_dir, source = open_local_input(input_dir or input_file)
+    else:
+        cur_files_path, input_dir, source = download_input(api, input_dir, input_file)
+
+    index = discover_input(input_dir, source)
+    if dry_run:
+        validate_input(input_dir, index, source)
+        return
+
+    journal = ImportJournal(journal_path(checkpoint_dir, team_id, cur_files_path), resume)
+    sly.logger.info(f"Import journal: {journal.path}")
     project_count = 0
-    markers = find_markers(input_dir)
 
-    for yolo_dir in sly.fs.dirs_with_marker(input_dir, markers, ignore_case=True):
-        try:
-            config_yaml_path = os.path.join(yolo_dir, DATA_CONFIG_NAME)
-            for marker in markers:
-                config_yaml_path = os.path.join(yolo_dir, marker)
-                if sly.fs.file_exists(config_yaml_path):
-                    sly.logger.info(f"Found config file: {config_yaml_path}")
-                    break
-            project_name = basename(os.path.normpath(yolo_dir))
-            config_yaml_info = read_config_yaml(config_yaml_path)
-            project = api.project.create(workspace_id, project_name, change_name_if_conflict=True)
-            project_meta = upload_project_meta(api, project.id, config_yaml_info)
-            process_coco_dir(yolo_dir, project, project_meta, api, config_yaml_info)
+    # DatasetDelta of every dataset of delta import by dataset id.
+    deltas = {}
+
+    def _on_uploaded(batch, img_ids):
+        journal.add_batch(batch.dataset_id, batch.names, img_ids)
+        delta = deltas.get(batch.dataset_id)
+        if delta is not None:
+            delta.on_uploaded(api, batch.names, img_ids)
+
+    upload_fn = upload_batch
+    if output_dir is not None:
+        upload_fn = api.write_batch
+    elif deduplicate:
+        upload_fn = DedupUploader(ImageHasher(hash_workers, HashCache(hash_cache_path)))
+
+    project_plans = index.find_projects(DATA_CONFIG_NAME)
+    delta_hasher = None
+    if delta_project_id is not None:
+        if len(project_plans) != 1:
+            raise Exception(
+                f"Delta import into project {delta_project_id} requires a single YOLO project "
+                f"with config file in the input, found {len(project_plans)}."
+            )
+        if delta_compare == "hash" and deduplicate:
+            delta_hasher = upload_fn.hasher
+        elif delta_compare == "hash":
+            delta_hasher = ImageHasher(hash_workers, HashCache(hash_cache_path))
+
+    parse_cache = None
+    if parse_cache_mb > 0:
+        parse_cache = ParseCache(parse_cache_path, parse_cache_mb * 1024 * 1024)
+
+    # Projects and their datasets are converted concurrently and share the workers of preparation
+    # and upload, total size of images in flight is limited by the budget. The preparer is entered
+    # first, so its workers are forked before threads of the other pools are started.
+    projects = {}
+    budget = InFlightBudget(inflight_budget_mb * 1024 * 1024)
+    preparer = ImagePreparer(prepare_pool, prepare_workers, profiler=profiler, cache=parse_cache)
+    uploader = UploadPipeline(
+        api,
+        source,
+        upload_concurrency,
+        upload_queue_size,
+        upload_fn=upload_fn,
+        on_uploaded=_on_uploaded,
+        profiler=profiler,
+        batcher=AdaptiveBatcher(int(upload_batch_mb * 1024 * 1024), upload_batch_seconds),
+        budget=budget,
+    )
+    with preparer, uploader, ImportScheduler(import_concurrency) as scheduler:
+        for project_plan in project_plans:
+            yolo_dir = project_plan.dir
+            try:
+                config_yaml_path = project_plan.config_path
+                project_name = basename(os.path.normpath(yolo_dir))
+                with profiler.stage("read_config"):
+                    config_yaml_info = read_config_yaml(config_yaml_path)
+                with profiler.stage("detect_geometry"):
+                    config_yaml_info["geometry"] = detect_geometry(yolo_dir, config_yaml_info)
+                project_key = os.path.relpath(yolo_dir, input_dir)
+                if delta_project_id is not None:
+                    with profiler.stage("create_project"):
+                        project = api.project.get_info_by_id(delta_project_id)
+                        if project is None:
+                            raise Exception(f"Project {delta_project_id} not found.")
+                        sly.logger.info(
+                            f"Delta import into project {project.name!r} (id: {project.id})."
+                        )
+                        upload_project_meta(api, project.id, config_yaml_info, merge=True)
+                    datasets = create_delta_datasets(
+                        api, project.id, config_yaml_info, index, delta_hasher
+                    )
+                    deltas.update((plan.info.id, plan.delta) for plan in datasets)
+                else:
+                    with profiler.stage("create_project"):
+                        project = get_or_create_project(
+                            api, journal, project_key, workspace_id, project_name
+                        )
+                        upload_project_meta(api, project.id, config_yaml_info)
+                        datasets = create_datasets(
+                            api, journal, project_key, project.id, config_yaml_info, index
+                        )
+                projects[project_key] = (yolo_dir, project)
+                process_coco_dir(
+                    yolo_dir,
+                    project,
+                    api,
+                    config_yaml_info,
+                    datasets,
+                    journal,
+                    project_key,
+                    preparer,
+                    uploader,
+                    scheduler,
+                )
+            except Exception as e:
+                sly.logger.warning(f"There was a problem while processing {yolo_dir}: {e}")
+
+        for project_key, error in scheduler.results():
+            yolo_dir, project = projects[project_key]
+            if error is not None:
+                sly.logger.warning(f"There was a problem while processing {yolo_dir}: {error}")
+                continue
+            sly.logger.info(f"Project {project.name} has been successfully uploaded.")
             try:
                 api.task.set_output_project(task_id, project.id, project.name)
             except Exception as e:
@@ -584,23 +1264,47 @@ def yolov5_sly_converter(api: sly.Api):
             # -------------------------------------- Add Workflow Output ------------------------------------- #
             workflow.add_output(project.id)
             # ----------------------------------------------- - ---------------------------------------------- #
-        except Exception as e:
-            sly.logger.warning(f"There was a problem while processing {yolo_dir}: {e}")
 
     if project_count > 0:
         sly.logger.info(f"{project_count} projects have been successfully uploaded.")
+    elif delta_project_id is not None:
+        raise Exception(f"Delta import into project {delta_project_id} has failed, see logs above.")
     else:
         try:
             sly.logger.warn("No projects found. Trying to upload images only.")
-            upload_images_only(api, team_id, input_dir)
+            upload_images_only(api, team_id, input_dir, source, journal, index, upload_fn)
         except Exception as e:
             raise Exception(
                 "No projects have been uploaded. Please check logs and ensure that "
                 f"the input data meets the requirements specified in the README: {e}"
             )
 
+    if deduplicate:
+        upload_fn.log_report()
+        upload_fn.hasher.close()
+    elif delta_hasher is not None:
+        delta_hasher.close()
+    if parse_cache is not None:
+        parse_cache.log_report()
+        parse_cache.close()
+    if transcode_stats is not None:
+        transcode_stats.log_report()
+    if output_dir is not None:
+        api.log_report()
+
 
 if __name__ == "__main__":
-    api = sly.Api.from_env()
+    if output_dir is not None:
+        api = LocalProjectApi(output_dir, output_writers, output_link)
+    else:
+        api = sly.Api.from_env()
     workflow = Workflow(api)
-    yolov5_sly_converter(api)
+    if output_dir is not None:
+        # Workflow requires the platform.
+        workflow.is_compatible = False
+    try:
+        yolov5_sly_converter(api)
+    finally:
+        profiler.save_report(PROFILE_REPORT_PATH)
+        if output_dir is not None:
+            api.close()
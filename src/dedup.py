@@ -0,0 +1,243 @@
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import supervisely as sly
+
+from uploader import upload_anns
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def get_file_hash(path):
+    """Same hash as `sly.fs.get_file_hash` (base64 of sha256), but the file is read by chunks."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b""):
+            sha256.update(chunk)
+    return base64.b64encode(sha256.digest()).decode("utf-8")
+
+
+class HashCache:
+    """
+    Persistent cache of image hashes keyed by path, size and modification time,
+    so unchanged files are not hashed again when the import is restarted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        sly.fs.ensure_base_path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes "
+            "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """:param keys: list of (path, size, mtime_ns)
+        :return: dict path -> hash for the keys found in the cache"""
+        result = {}
+        with self._lock:
+            for path, size, mtime_ns in keys:
+                row = self._conn.execute(
+                    "SELECT hash FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                    (path, size, mtime_ns),
+                ).fetchone()
+                if row is not None:
+                    result[path] = row[0]
+        return result
+
+    def put_many(self, items):
+        """:param items: list of (path, size, mtime_ns, hash)"""
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)", items)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ImageHasher:
+    """Hashes files in a pool of threads (hashlib releases GIL) using optional HashCache."""
+
+    def __init__(self, workers=4, cache=None):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max(1, workers), thread_name_prefix="hasher")
+        self._lock = threading.Lock()
+        self.hashed_count = 0
+        self.cached_count = 0
+
+    def hash_files(self, paths):
+        stats = [os.stat(path) for path in paths]
+        keys = [(path, st.st_size, st.st_mtime_ns) for path, st in zip(paths, stats)]
+        cached = self.cache.get_many(keys) if self.cache is not None else {}
+        missing = [key for key in keys if key[0] not in cached]
+        hashes = dict(cached)
+        new_hashes = self._executor.map(get_file_hash, [path for path, _, _ in missing])
+        for key, file_hash in zip(missing, new_hashes):
+            hashes[key[0]] = file_hash
+        if self.cache is not None and len(missing) > 0:
+            self.cache.put_many([key + (hashes[key[0]],) for key in missing])
+        with self._lock:
+            self.hashed_count += len(missing)
+            self.cached_count += len(cached)
+        return [hashes[path] for path in paths]
+
+    def close(self):
+        self._executor.shutdown()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def _select(items, idxs):
+    """Items at `idxs` or None if there are no items (e.g. the batch has no image metas)."""
+    if items is None:
+        return None
+    return [items[idx] for idx in idxs]
+
+
+class DedupUploader:
+    """
+    Upload function for `UploadPipeline` that uploads every unique image payload once.
+    Images are identified by content hash (the same as used by Supervisely): payloads
+    that are already on the server or were uploaded earlier by this import are not sent again,
+    images are added to the dataset by hash.
+    Hashes are claimed before their payloads are uploaded, so a payload found in batches
+    of several datasets at once is uploaded by one of them while the others wait for it.
+    """
+
+    def __init__(self, hasher):
+        self.hasher = hasher
+        self._lock = threading.Lock()
+        self._uploaded_hashes = set()
+        self._pending = {}
+        self.images_count = 0
+        self.images_bytes = 0
+        self.uploaded_count = 0
+        self.uploaded_bytes = 0
+
+    def _claim(self, hashes):
+        """
+        Returns hashes that are not uploaded yet and are claimed for upload by the caller
+        and (hash, event) pairs of hashes being uploaded by other batches.
+        """
+        claimed = []
+        awaited = []
+        with self._lock:
+            for file_hash in dict.fromkeys(hashes):
+                if file_hash in self._uploaded_hashes:
+                    continue
+                event = self._pending.get(file_hash)
+                if event is None:
+                    self._pending[file_hash] = threading.Event()
+                    claimed.append(file_hash)
+                else:
+                    awaited.append((file_hash, event))
+        return claimed, awaited
+
+    def _release(self, hashes, uploaded):
+        """Ends the upload of claimed hashes and wakes up the batches waiting for them."""
+        with self._lock:
+            if uploaded:
+                self._uploaded_hashes.update(hashes)
+            for file_hash in hashes:
+                self._pending.pop(file_hash).set()
+
+    def _upload_paths(self, api, batch, hashes, payload_hashes, sizes, profiler):
+        """
+        Uploads the first image of every hash of `payload_hashes` with its payload,
+        returns dict index in the batch -> image id.
+        """
+        first_idxs = {}
+        for idx, file_hash in enumerate(hashes):
+            if file_hash in payload_hashes:
+                first_idxs.setdefault(file_hash, idx)
+        idxs = sorted(first_idxs.values())
+        if len(idxs) == 0:
+            return {}
+        with profiler.stage("upload_data", items=len(idxs)) as stage:
+            img_infos = api.image.upload_paths(
+                batch.dataset_id,
+                [batch.names[idx] for idx in idxs],
+                [batch.paths[idx] for idx in idxs],
+                metas=_select(batch.metas, idxs),
+            )
+            stage.add(bytes=sum(sizes[hashes[idx]] for idx in idxs))
+        with self._lock:
+            self.uploaded_count += len(idxs)
+            self.uploaded_bytes += sum(sizes[hashes[idx]] for idx in idxs)
+        return {idx: info.id for idx, info in zip(idxs, img_infos)}
+
+    def __call__(self, api, batch, profiler):
+        if len(batch.names) == 0:
+            return []
+        with profiler.stage("hash", items=len(batch.paths)):
+            hashes = self.hasher.hash_files(batch.paths)
+        sizes = {file_hash: os.path.getsize(path) for path, file_hash in zip(batch.paths, hashes)}
+
+        claimed, awaited = self._claim(hashes)
+        uploaded = False
+        try:
+            new_hashes = set()
+            if len(claimed) > 0:
+                existing_hashes = set(api.image.check_existing_hashes(claimed))
+                new_hashes = {h for h in claimed if h not in existing_hashes}
+            img_ids = self._upload_paths(api, batch, hashes, new_hashes, sizes, profiler)
+            uploaded = True
+        finally:
+            self._release(claimed, uploaded)
+
+        try:
+            for _, event in awaited:
+                event.wait()
+            with self._lock:
+                # Payloads whose upload by another batch failed are uploaded by this one.
+                failed_hashes = {h for h, _ in awaited if h not in self._uploaded_hashes}
+            img_ids.update(self._upload_paths(api, batch, hashes, failed_hashes, sizes, profiler))
+            with self._lock:
+                self._uploaded_hashes.update(failed_hashes)
+
+            idxs = [idx for idx in range(len(hashes)) if idx not in img_ids]
+            if len(idxs) > 0:
+                with profiler.stage("upload_images", items=len(idxs)):
+                    img_infos = api.image.upload_hashes(
+                        batch.dataset_id,
+                        [batch.names[idx] for idx in idxs],
+                        [hashes[idx] for idx in idxs],
+                        metas=_select(batch.metas, idxs),
+                    )
+                img_ids.update((idx, info.id) for idx, info in zip(idxs, img_infos))
+        except Exception:
+            # The batch is written entirely or not at all, so it can be uploaded again.
+            if len(img_ids) > 0:
+                api.image.remove_batch(list(img_ids.values()))
+            raise
+        img_ids = [img_ids[idx] for idx in range(len(hashes))]
+        if batch.anns is not None:
+            upload_anns(api, img_ids, batch.anns, profiler)
+        with self._lock:
+            self.images_count += len(hashes)
+            self.images_bytes += sum(sizes[file_hash] for file_hash in hashes)
+        return img_ids
+
+    def log_report(self):
+        saved_bytes = self.images_bytes - self.uploaded_bytes
+        sly.logger.info(
+            f"Deduplication: {self.images_count} images, "
+            f"{self.uploaded_count} unique payloads uploaded, "
+            f"{saved_bytes / 1024 / 1024:.1f} MB saved. Hashed files: {self.hasher.hashed_count}, "
+            f"taken from cache: {self.hasher.cached_count}.",
+            extra={
+                "images": self.images_count,
+                "images_bytes": self.images_bytes,
+                "uploaded_payloads": self.uploaded_count,
+                "uploaded_bytes": self.uploaded_bytes,
+                "saved_bytes": saved_bytes,
+            },
+        )
@@ -0,0 +1,233 @@
+from collections import defaultdict
+from os.path import basename
+
+import supervisely as sly
+from supervisely.api.module_api import ApiField
+
+from preparation import LABEL_HASH_KEY, get_label_hash, prepare_image
+from transcoding import get_transcoded_name
+from walker import batched
+
+# How images of the local tree are compared with images already uploaded to the dataset:
+# by size or by content hash (the same as used by Supervisely).
+# Transcoded images are matched by name only.
+SIZE = "size"
+HASH = "hash"
+NAME = "name"
+COMPARE_MODES = [SIZE, HASH]
+
+NEW = "new"
+CHANGED_IMAGE = "changed_image"
+CHANGED_LABELS = "changed_labels"
+UNCHANGED = "unchanged"
+
+# Number of images compared (and hashed) at once.
+DIFF_BATCH_SIZE = 50
+
+# Changed images are uploaded under a temporary name with this prefix and the id of the image they
+# replace: names in a dataset are unique, and the uploaded image is removed only after its
+# replacement is uploaded.
+REPLACEMENT_PREFIX = "__replacement_"
+
+
+def rename_image(api, id, name):
+    # Image info is edited by the same request as image meta, the SDK has no method for the name.
+    api.post("images.editInfo", {ApiField.ID: id, ApiField.NAME: name})
+
+
+class ProjectListing:
+    """
+    Datasets and images of an existing project listed in bulk: a single request for datasets
+    and a single paginated request for images of the whole project.
+    """
+
+    def __init__(self, api, project_id):
+        self.datasets = {info.name: info for info in api.dataset.get_list(project_id)}
+        self._images = defaultdict(dict)
+        for info in api.image.get_list(project_id=project_id):
+            self._images[info.dataset_id][info.name] = info
+        self.images_count = sum(len(images) for images in self._images.values())
+
+    def get_images(self, dataset_id):
+        """Images of the dataset by name."""
+        return self._images.get(dataset_id, {})
+
+
+class DatasetDelta:
+    """
+    Difference between images of a local dataset and images already uploaded to the dataset
+    of the existing project:
+     - new images (not found by name) and changed images (different size or hash) are uploaded,
+       changed images replace the uploaded ones after their upload, see `get_upload_name`;
+     - annotations of unchanged images are updated if their labels fingerprint differs from the one
+       stored in image meta by the previous delta import. Images uploaded by an ordinary import
+       have none, so all of them are annotated again by the first delta import once;
+     - uploaded images that are not found locally are removed if `remove_deleted` is True.
+    Annotations are updated and deleted images are removed by the workers of the upload pipeline
+    along with uploads of the dataset. Image meta and names have no bulk update, so a request
+    is sent for every updated annotation and every replaced image.
+    """
+
+    def __init__(self, dataset_id, remote_images, compare=SIZE, hasher=None, remove_deleted=False):
+        self.dataset_id = dataset_id
+        self.remote_images = remote_images
+        self.compare = compare
+        self.hasher = hasher
+        self.remove_deleted = remove_deleted
+        self.counts = {NEW: 0, CHANGED_IMAGE: 0, CHANGED_LABELS: 0, UNCHANGED: 0}
+        self.removed_count = 0
+        self._seen_names = set()
+        self._replaced_ids = {}
+        self._replacements = {}
+        self._changed_labels = []
+
+    @property
+    def skipped_count(self):
+        """Number of images that are already uploaded and are not uploaded again."""
+        return self.counts[CHANGED_LABELS] + self.counts[UNCHANGED]
+
+    def _find_remote(self, image_path, context, renamed):
+        name = basename(image_path)
+        info = self.remote_images.get(name)
+        if info is None and context.transcode is not None:
+            keep_ext = image_path in renamed
+            info = self.remote_images.get(get_transcoded_name(name, context.transcode, keep_ext))
+        return info
+
+    def _find_changed_images(self, existing, source):
+        """Paths of images whose content differs from the uploaded images with the same names."""
+        if self.compare == NAME or len(existing) == 0:
+            return set()
+        if self.compare == SIZE:
+            return {path for path, info in existing if source.get_size(path) != int(info.size)}
+        paths = [path for path, _ in existing]
+        source.fetch(paths)
+        try:
+            hashes = self.hasher.hash_files(paths)
+        finally:
+            source.release(paths)
+        return {path for (path, info), file_hash in zip(existing, hashes) if file_hash != info.hash}
+
+    def _get_status(self, image_path, ann_path, info, changed, context):
+        if info is None:
+            return NEW
+        if image_path in changed:
+            return CHANGED_IMAGE
+        meta = info.meta or {}
+        if meta.get(LABEL_HASH_KEY) != get_label_hash(ann_path, context):
+            return CHANGED_LABELS
+        return UNCHANGED
+
+    def filter(self, items, context, source, renamed=frozenset()):
+        """
+        Compares (image_path, ann_path) items with the uploaded images and yields only the items
+        to upload: new and changed images. Annotations to update are collected for `apply`.
+
+        :param renamed: paths of images whose transcoded names keep the original extension
+        """
+        for batch in batched(items, DIFF_BATCH_SIZE):
+            infos = [self._find_remote(image_path, context, renamed) for image_path, _ in batch]
+            existing = [
+                (image_path, info)
+                for (image_path, _), info in zip(batch, infos)
+                if info is not None
+            ]
+            changed = self._find_changed_images(existing, source)
+            for (image_path, ann_path), info in zip(batch, infos):
+                status = self._get_status(image_path, ann_path, info, changed, context)
+                self.counts[status] += 1
+                if info is not None:
+                    self._seen_names.add(info.name)
+                if status == CHANGED_IMAGE:
+                    self._replaced_ids[image_path] = info.id
+                elif status == CHANGED_LABELS:
+                    self._changed_labels.append((image_path, ann_path, info))
+                if status in [NEW, CHANGED_IMAGE]:
+                    yield image_path, ann_path
+
+    def get_upload_name(self, image_path, name):
+        """
+        Name to upload the image with: changed images get a temporary name until the image they
+        replace is removed by `on_uploaded`.
+        """
+        replaced_id = self._replaced_ids.pop(image_path, None)
+        if replaced_id is None:
+            return name
+        temp_name = f"{REPLACEMENT_PREFIX}{replaced_id}_{name}"
+        self._replacements[temp_name] = (replaced_id, name)
+        return temp_name
+
+    def on_uploaded(self, api, names, img_ids):
+        """
+        Removes images replaced by the uploaded ones and gives their names to the replacements.
+        A replacement left with the temporary name (e.g. the import is interrupted) is not found
+        locally by the next delta import, while the changed image is uploaded again as a new one.
+        """
+        replaced = [
+            (img_id, *self._replacements.pop(name))
+            for name, img_id in zip(names, img_ids)
+            if name in self._replacements
+        ]
+        if len(replaced) == 0:
+            return
+        api.image.remove_batch([replaced_id for _, replaced_id, _ in replaced])
+        for img_id, _, name in replaced:
+            rename_image(api, img_id, name)
+
+    def submit_updates(self, api, pipeline, context, flush=False):
+        """
+        Submits updates of annotations of images with changed labels found by `filter` to the upload
+        pipeline by chunks of DIFF_BATCH_SIZE, the last incomplete chunk is submitted with `flush`.
+        """
+        count = len(self._changed_labels)
+        if not flush:
+            count -= count % DIFF_BATCH_SIZE
+        if count == 0:
+            return
+        # Images on the server are not transcoded again, their annotations are built for their size.
+        context = context._replace(transcode=None)
+        for batch in batched(self._changed_labels[:count], DIFF_BATCH_SIZE):
+            pipeline.submit_task(self.dataset_id, self._update_annotations, api, batch, context)
+        self._changed_labels = self._changed_labels[count:]
+
+    def _update_annotations(self, api, batch, context):
+        prepared = [
+            prepare_image(image_path, ann_path, context, size=(info.height, info.width))
+            for image_path, ann_path, info in batch
+        ]
+        for image in prepared:
+            for msg, extra in image.warnings:
+                sly.logger.warn(msg, extra)
+        api.annotation.upload_jsons(
+            [info.id for _, _, info in batch], [image.ann_json for image in prepared]
+        )
+        for (_, _, info), image in zip(batch, prepared):
+            api.image.update_meta(info.id, {**(info.meta or {}), **image.meta})
+
+    def finish(self, api, pipeline, context):
+        """
+        Submits the rest of annotation updates and removal of deleted images when all items
+        are filtered. They are done when the pipeline has processed the dataset.
+        """
+        self.submit_updates(api, pipeline, context, flush=True)
+        if self.remove_deleted:
+            ids = [
+                info.id for name, info in self.remote_images.items() if name not in self._seen_names
+            ]
+            if len(ids) > 0:
+                pipeline.submit_task(self.dataset_id, self._remove_images, api, ids)
+
+    def _remove_images(self, api, ids):
+        api.image.remove_batch(ids)
+        self.removed_count = len(ids)
+
+    def log_report(self, dataset_name):
+        deleted_count = len(self.remote_images) - len(self._seen_names)
+        sly.logger.info(
+            f"Dataset: {dataset_name}: delta import: {self.counts[NEW]} new images, "
+            f"{self.counts[CHANGED_IMAGE]} changed images, "
+            f"{self.counts[CHANGED_LABELS]} updated annotations, "
+            f"{self.counts[UNCHANGED]} unchanged images, {deleted_count} images not found locally"
+            + (f" ({self.removed_count} removed)." if self.remove_deleted else " (kept)."),
+            extra={**self.counts, "deleted": deleted_count, "removed": self.removed_count},
+        )
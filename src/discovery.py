@@ -0,0 +1,85 @@
+import os
+from collections import defaultdict, namedtuple
+
+import supervisely as sly
+
+from walker import CONFIG, IMAGE, LABEL
+
+# Project found in the input: its directory and config file.
+ProjectPlan = namedtuple("ProjectPlan", ["dir", "config_path"])
+
+# Volumes have image extension, but are not uploaded as images.
+SKIPPED_IMAGE_EXTS = [".nrrd"]
+
+
+class InputIndex:
+    """
+    Index of the input tree built by a single walk of the source: config files and numbers of
+    images and label files of every directory. Projects, their datasets and images of input
+    without projects are found in the index instead of walking the tree again.
+    Junk files (e.g. `__MACOSX`, `.DS_Store`) are skipped by the walker, so they are never indexed.
+    """
+
+    def __init__(self, root_dir, source, max_logged_names=100):
+        self.root_dir = root_dir
+        self.files_count = 0
+        self.images_count = 0
+        self.labels_count = 0
+        self.unsupported_count = 0
+        self.unsupported_names = []
+        self._configs = defaultdict(list)
+        self._images_by_dir = defaultdict(int)
+        self._labels_by_dir = defaultdict(int)
+
+        last_dir = None
+        dir_key = None
+        for kind, path in source.walk_files(root_dir):
+            self.files_count += 1
+            # Files of a directory are yielded together, so the key is normalized once.
+            cur_dir = os.path.dirname(path)
+            if cur_dir != last_dir:
+                last_dir = cur_dir
+                dir_key = os.path.normpath(cur_dir)
+            if kind == IMAGE:
+                if sly.fs.get_file_ext(path).lower() not in SKIPPED_IMAGE_EXTS:
+                    self.images_count += 1
+                    self._images_by_dir[dir_key] += 1
+            elif kind == LABEL:
+                self.labels_count += 1
+                self._labels_by_dir[dir_key] += 1
+            elif kind == CONFIG:
+                self._configs[dir_key].append(path)
+            else:
+                self.unsupported_count += 1
+                if len(self.unsupported_names) < max_logged_names:
+                    self.unsupported_names.append(sly.fs.get_file_name_with_ext(path))
+
+    @property
+    def config_paths(self):
+        return sorted(path for paths in self._configs.values() for path in paths)
+
+    def count_images(self, dir_path):
+        """Number of images directly in the directory."""
+        return self._images_by_dir.get(os.path.normpath(dir_path), 0)
+
+    def count_labels(self, dir_path):
+        """Number of label files directly in the directory."""
+        return self._labels_by_dir.get(os.path.normpath(dir_path), 0)
+
+    def get_images_dir(self):
+        """Common parent directory of all images or None if there are no images."""
+        if len(self._images_by_dir) == 0:
+            return None
+        return os.path.commonpath(list(self._images_by_dir))
+
+    def find_projects(self, config_name):
+        """
+        Returns ProjectPlan for every directory with config files sorted by path.
+        If a directory has several configs, `config_name` is preferred, otherwise the first by name.
+        """
+        projects = []
+        for project_dir in sorted(self._configs):
+            paths = sorted(self._configs[project_dir])
+            preferred = [path for path in paths if os.path.basename(path).lower() == config_name]
+            projects.append(ProjectPlan(project_dir, (preferred or paths)[0]))
+        return projects
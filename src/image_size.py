@@ -0,0 +1,222 @@
+import io
+import struct
+
+import supervisely as sly
+
+# Number of bytes enough to recognize every supported header by its signature.
+SIGNATURE_SIZE = 32
+
+# EXIF orientations that rotate the image by 90 degrees (width and height are swapped).
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# JPEG markers without length field.
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+# Start Of Frame markers (except DHT, JPG and DAC, which share the same range).
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+JPEG_SOS_MARKER = 0xDA
+JPEG_APP1_MARKER = 0xE1
+
+# Number of bytes at the end of a JPEG or PNG file searched for the End Of Image marker (IEND
+# chunk): some writers append padding or trailers after it.
+TAIL_SIZE = 1024
+JPEG_EOI = b"\xff\xd9"
+PNG_IEND_CHUNK = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+TIFF_TAG_WIDTH = 256
+TIFF_TAG_HEIGHT = 257
+TIFF_TAG_ORIENTATION = 274
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise EOFError("Unexpected end of file")
+    return data
+
+
+def _tiff_tags(f, tags):
+    """
+    Reads values of the given tags from the first IFD of a TIFF structure
+    starting at the current position.
+    """
+    base = f.tell()
+    header = _read_exact(f, 8)
+    if header[:4] == b"II*\x00":
+        endian = "<"
+    elif header[:4] == b"MM\x00*":
+        endian = ">"
+    else:
+        return None
+    (ifd_offset,) = struct.unpack(endian + "I", header[4:8])
+    f.seek(base + ifd_offset)
+    (entries_count,) = struct.unpack(endian + "H", _read_exact(f, 2))
+    entries = _read_exact(f, entries_count * 12)
+    result = {}
+    for entry_offset in range(0, len(entries), 12):
+        tag, value_type = struct.unpack(endian + "HH", entries[entry_offset : entry_offset + 4])
+        if tag not in tags:
+            continue
+        value = entries[entry_offset + 8 : entry_offset + 12]
+        if value_type == 3:  # SHORT
+            result[tag] = struct.unpack(endian + "H", value[:2])[0]
+        elif value_type == 4:  # LONG
+            result[tag] = struct.unpack(endian + "I", value)[0]
+    return result
+
+
+def _exif_orientation(data):
+    tags = _tiff_tags(io.BytesIO(data), {TIFF_TAG_ORIENTATION})
+    if tags is None:
+        return None
+    return tags.get(TIFF_TAG_ORIENTATION)
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    orientation = None
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b"\xff":
+            raise ValueError("Invalid JPEG marker")
+        marker = _read_exact(f, 1)[0]
+        while marker == 0xFF:  # fill bytes
+            marker = _read_exact(f, 1)[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == JPEG_SOS_MARKER:
+            raise ValueError("Image data started before SOF marker")
+        (length,) = struct.unpack(">H", _read_exact(f, 2))
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack(">BHH", _read_exact(f, 5))
+            break
+        if marker == JPEG_APP1_MARKER and orientation is None:
+            segment = _read_exact(f, length - 2)
+            if segment.startswith(b"Exif\x00\x00"):
+                orientation = _exif_orientation(segment[6:])
+            continue
+        f.seek(length - 2, 1)
+    if orientation in TRANSPOSED_ORIENTATIONS:
+        height, width = width, height
+    return height, width
+
+
+def _png_size(f, header):
+    width, height = struct.unpack(">II", header[16:24])
+    # OpenCV applies the orientation from eXIf chunk, which always precedes image data.
+    f.seek(8)
+    while True:
+        length, chunk_type = struct.unpack(">I4s", _read_exact(f, 8))
+        if chunk_type in (b"IDAT", b"IEND"):
+            break
+        if chunk_type == b"eXIf":
+            if _exif_orientation(_read_exact(f, length)) in TRANSPOSED_ORIENTATIONS:
+                height, width = width, height
+            break
+        f.seek(length + 4, 1)  # chunk data and CRC
+    return height, width
+
+
+def _webp_size(header):
+    chunk_type = header[12:16]
+    if chunk_type == b"VP8 ":
+        width, height = struct.unpack("<HH", header[26:30])
+        return height & 0x3FFF, width & 0x3FFF
+    if chunk_type == b"VP8L":
+        bits = struct.unpack("<I", header[21:25])[0]
+        return ((bits >> 14) & 0x3FFF) + 1, (bits & 0x3FFF) + 1
+    if chunk_type == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return height, width
+    return None
+
+
+def _bmp_size(header):
+    (dib_header_size,) = struct.unpack("<I", header[14:18])
+    if dib_header_size == 12:
+        width, height = struct.unpack("<hh", header[18:22])
+    else:
+        width, height = struct.unpack("<ii", header[18:26])
+    # Negative height means top-down row order.
+    return abs(height), width
+
+
+def _tiff_size(f):
+    f.seek(0)
+    tags = _tiff_tags(f, {TIFF_TAG_WIDTH, TIFF_TAG_HEIGHT, TIFF_TAG_ORIENTATION})
+    if tags is None or TIFF_TAG_WIDTH not in tags or TIFF_TAG_HEIGHT not in tags:
+        return None
+    if tags.get(TIFF_TAG_ORIENTATION, 1) != 1:
+        return None
+    return tags[TIFF_TAG_HEIGHT], tags[TIFF_TAG_WIDTH]
+
+
+def _read_tail(f, size):
+    file_size = f.seek(0, 2)
+    f.seek(max(0, file_size - size))
+    return f.read(size)
+
+
+def _is_complete(f, header):
+    """
+    Cheap integrity check of the file by its end: JPEG must end with EOI marker and PNG with IEND
+    chunk (optionally followed by padding), WebP and BMP must not be shorter than the size in their
+    headers. TIFF is not checked.
+    """
+    file_size = f.seek(0, 2)
+    if header.startswith(b"\xff\xd8"):
+        return JPEG_EOI in _read_tail(f, TAIL_SIZE)
+    if header.startswith(b"\x89PNG"):
+        return PNG_IEND_CHUNK in _read_tail(f, TAIL_SIZE)
+    if header.startswith(b"RIFF"):
+        (riff_size,) = struct.unpack("<I", header[4:8])
+        return file_size >= riff_size + 8
+    if header.startswith(b"BM"):
+        (bmp_size,) = struct.unpack("<I", header[2:6])
+        return file_size >= bmp_size
+    return True
+
+
+def read_header_size(path):
+    """
+    Returns (height, width) of the image reading only its header (and the end of the file
+    to check that it is not truncated), or None if the format is not recognized or the file looks
+    broken, so the image must be decoded.
+    The size matches the shape of the array returned by `sly.image.read`.
+    """
+    with open(path, "rb") as f:
+        header = f.read(SIGNATURE_SIZE)
+        if len(header) < SIGNATURE_SIZE:
+            return None
+        if header.startswith(b"\xff\xd8"):
+            size = _jpeg_size(f)
+        elif header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+            size = _png_size(f, header)
+        elif header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+            size = _webp_size(header)
+        elif header.startswith(b"BM"):
+            size = _bmp_size(header)
+        elif header[:4] in (b"II*\x00", b"MM\x00*"):
+            size = _tiff_size(f)
+        else:
+            return None
+        if size is None or size[0] <= 0 or size[1] <= 0 or not _is_complete(f, header):
+            return None
+    return size
+
+
+def get_image_size(path):
+    """
+    Returns (height, width) of the image. Only the file header and end are read for JPEG, PNG, WebP,
+    BMP and TIFF, other formats, broken headers and truncated files are validated and fully decoded
+    as `sly.image.read` does, so corrupt images are rejected.
+    Raises an exception if the image can not be read.
+    """
+    try:
+        size = read_header_size(path)
+    except (OSError, EOFError, ValueError, struct.error):
+        size = None
+    if size is not None:
+        return size
+    sly.image.validate_format(path)
+    return sly.image.read(path).shape[:2]
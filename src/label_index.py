@@ -0,0 +1,62 @@
+import os
+
+from walker import LABEL, walk_files
+
+
+def get_labels_dir(input_dir, dataset_path):
+    """
+    Finds labels directory of the dataset: `<project>/labels/<dataset name>` or the dataset path
+    with the last `images` component replaced by `labels` (YOLO convention).
+    """
+    candidates = [os.path.join(input_dir, "labels", os.path.basename(dataset_path))]
+    parts = os.path.normpath(dataset_path).split(os.sep)
+    for idx in range(len(parts) - 1, -1, -1):
+        if parts[idx] == "images":
+            candidates.append(os.sep.join(parts[:idx] + ["labels"] + parts[idx + 1 :]))
+            break
+    for labels_dir in candidates:
+        if os.path.isdir(labels_dir):
+            return labels_dir
+    return None
+
+
+class LabelIndex:
+    """
+    Maps images of a dataset to their label files. Labels are matched by the path relative
+    to the images directory without extension (so nested subfolders are supported),
+    or by the file name if it is unique across the labels directory.
+    """
+
+    def __init__(self, labels_dir):
+        self.labels_dir = labels_dir
+        self._by_rel_stem = {}
+        self._by_stem = {}
+        self._matched = set()
+        if labels_dir is None:
+            return
+        for kind, path in walk_files(labels_dir):
+            if kind != LABEL:
+                continue
+            rel_path = os.path.relpath(path, labels_dir)
+            self._by_rel_stem[os.path.splitext(rel_path)[0]] = path
+            stem = os.path.splitext(os.path.basename(rel_path))[0]
+            # None marks names that are ambiguous without the subfolder
+            self._by_stem[stem] = None if stem in self._by_stem else path
+
+    def find(self, image_path, images_dir):
+        rel_stem = os.path.splitext(os.path.relpath(image_path, images_dir))[0]
+        path = self._by_rel_stem.get(rel_stem)
+        if path is None:
+            path = self._by_stem.get(os.path.basename(rel_stem))
+        if path is not None:
+            self._matched.add(path)
+        return path
+
+    @property
+    def labels_count(self):
+        return len(self._by_rel_stem)
+
+    @property
+    def orphans_count(self):
+        """Number of label files that were not matched with any image."""
+        return self.labels_count - len(self._matched)
@@ -0,0 +1,213 @@
+import io
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+# class_id, x_center, y_center, width, height
+LABEL_COLUMNS = 5
+
+# Kinds of skipped lines, stored in the "issue" field of warning extra.
+MALFORMED_LINE = "malformed_line"
+CLASS_OUT_OF_RANGE = "class_out_of_range"
+INVALID_BOX_SIZE = "invalid_box_size"
+
+BBOX = "bbox"
+POLYGON = "polygon"
+POSE = "pose"
+
+# Label format: `is_applicable(columns, kpt_shape)` recognizes lines of the format by number
+# of columns (including class id), `is_valid(coords)` checks normalized coordinates of rows.
+LabelFormat = namedtuple("LabelFormat", ["is_applicable", "is_valid"])
+
+
+def _is_finite(coords):
+    return np.isfinite(coords).all(axis=1)
+
+
+def _is_valid_box(coords):
+    return _is_finite(coords) & (coords[:, 2] >= 0) & (coords[:, 3] >= 0)
+
+
+# Registry of supported formats in order of detection:
+# - bbox: class x_center y_center width height
+# - polygon (segmentation): class x1 y1 x2 y2 ... with at least 3 points,
+#   oriented boxes (class and 4 points) are polygons too
+# - pose: class x_center y_center width height and `kpt_shape` = [keypoints, 2 or 3 dims]
+#   from the config: x y or x y visibility of every keypoint
+LABEL_FORMATS = {
+    BBOX: LabelFormat(lambda columns, kpt_shape: columns == LABEL_COLUMNS, _is_valid_box),
+    POLYGON: LabelFormat(
+        lambda columns, kpt_shape: kpt_shape is None and columns >= 7 and columns % 2 == 1,
+        _is_finite,
+    ),
+    POSE: LabelFormat(
+        lambda columns, kpt_shape: kpt_shape is not None
+        and columns == LABEL_COLUMNS + kpt_shape[0] * kpt_shape[1],
+        _is_valid_box,
+    ),
+}
+
+# Rows of a label file in the same format with the same number of columns.
+# `coords` are normalized coordinates without class id, `line_nums` are indices of file lines
+# (None if the file has a single group, lines are in file order then).
+LabelGroup = namedtuple("LabelGroup", ["format", "class_ids", "coords", "line_nums"])
+
+
+def detect_format(columns, kpt_shape=None):
+    """Returns name of the label format of a line with `columns` values or None if it is unknown."""
+    for name, label_format in LABEL_FORMATS.items():
+        if label_format.is_applicable(columns, kpt_shape):
+            return name
+    return None
+
+
+def _label_warning(message, path, line, line_num, issue):
+    return (message, {"filename": path, "line": line, "line_num": line_num, "issue": issue})
+
+
+def _parse_rows_by_line(lines, path, kpt_shape):
+    """
+    Slow path: parses lines one by one to find out their formats and which of them are invalid.
+    """
+    rows_by_columns = {}
+    label_warnings = []
+    for idx, line in enumerate(lines):
+        line_parts = line.split()
+        if len(line_parts) == 0:
+            continue
+        if detect_format(len(line_parts), kpt_shape) is None:
+            label_warnings.append(
+                _label_warning("Invalid annotation format", path, line, idx, MALFORMED_LINE)
+            )
+            continue
+        try:
+            row = [float(part) for part in line_parts]
+        except ValueError as e:
+            label_warnings.append(_label_warning(str(e), path, line, idx, MALFORMED_LINE))
+            continue
+        rows, line_nums = rows_by_columns.setdefault(len(row), ([], []))
+        rows.append(row)
+        line_nums.append(idx)
+    groups = [
+        (np.array(rows, dtype=np.float64), np.array(line_nums, dtype=np.int64))
+        for rows, line_nums in rows_by_columns.values()
+    ]
+    return groups, label_warnings
+
+
+def _validate_rows(rows, line_nums, lines, path, classes_count, kpt_shape, label_warnings):
+    label_format = detect_format(rows.shape[1], kpt_shape)
+    class_ids = rows[:, 0]
+    coords = rows[:, 1:]
+    valid_class = (
+        (class_ids == np.floor(class_ids)) & (class_ids >= 0) & (class_ids < classes_count)
+    )
+    valid_coords = LABEL_FORMATS[label_format].is_valid(coords)
+    valid = valid_class & valid_coords
+    if not valid.all():
+        if line_nums is None:
+            line_nums = np.array(
+                [idx for idx, line in enumerate(lines) if line.strip() != ""], dtype=np.int64
+            )
+        for row_idx in np.flatnonzero(~valid).tolist():
+            line_num = int(line_nums[row_idx])
+            if not valid_class[row_idx]:
+                message = (
+                    f"Class id {lines[line_num].split()[0]} is out of range [0, {classes_count})"
+                )
+                issue = CLASS_OUT_OF_RANGE
+            else:
+                message = "Invalid bounding box size"
+                issue = INVALID_BOX_SIZE
+            label_warnings.append(_label_warning(message, path, lines[line_num], line_num, issue))
+        class_ids = class_ids[valid]
+        coords = coords[valid]
+        line_nums = line_nums[valid]
+    return LabelGroup(label_format, class_ids.astype(np.int64), coords, line_nums)
+
+
+def read_labels(path, classes_count, kpt_shape=None):
+    """
+    Reads YOLO label file. Files where all lines have the same number of columns (e.g. only boxes)
+    are read in a single vectorized pass, other files are parsed line by line.
+
+    :param kpt_shape: [keypoints count, 2 or 3] from the config of pose datasets
+    :return: tuple (groups, warnings), where `groups` is a list of LabelGroup
+        and `warnings` is a list of (message, extra) pairs describing skipped lines.
+    """
+    with open(path, "r") as f:
+        text = f.read()
+    lines = text.split("\n")
+
+    rows = None
+    if text.strip() == "":
+        return [], []
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            rows = np.loadtxt(io.StringIO(text), dtype=np.float64, comments=None, ndmin=2)
+    except ValueError:
+        rows = None
+    if rows is not None and detect_format(rows.shape[1], kpt_shape) is None:
+        rows = None
+
+    label_warnings = []
+    if rows is not None:
+        row_groups = [(rows, None)]
+    else:
+        row_groups, label_warnings = _parse_rows_by_line(lines, path, kpt_shape)
+    groups = [
+        _validate_rows(rows, line_nums, lines, path, classes_count, kpt_shape, label_warnings)
+        for rows, line_nums in row_groups
+    ]
+    if len(groups) == 1 and rows is None:
+        # Lines of a single group are in file order.
+        groups[0] = groups[0]._replace(line_nums=None)
+    label_warnings.sort(key=lambda warning: warning[1]["line_num"])
+    return groups, label_warnings
+
+
+def read_first_format(path, kpt_shape=None):
+    """Detects format of a label file by its first non-empty line (None for empty or unknown)."""
+    with open(path, "r") as f:
+        for line in f:
+            columns = len(line.split())
+            if columns > 0:
+                return detect_format(columns, kpt_shape)
+    return None
+
+
+def denormalize_boxes(boxes, img_width, img_height):
+    """Converts normalized YOLO boxes to pixel (top, left, bottom, right) array of shape (N, 4)."""
+    px_x_center = boxes[:, 0] * img_width
+    px_y_center = boxes[:, 1] * img_height
+
+    px_ann_width = boxes[:, 2] * img_width
+    px_ann_height = boxes[:, 3] * img_height
+
+    left = px_x_center - (px_ann_width / 2)
+    right = px_x_center + (px_ann_width / 2)
+
+    top = px_y_center - (px_ann_height / 2)
+    bottom = px_y_center + (px_ann_height / 2)
+
+    return np.stack([top, left, bottom, right], axis=1)
+
+
+def denormalize_points(coords, img_width, img_height):
+    """
+    Converts normalized x y pairs of shape (N, 2 * P) to pixel (x, y) array of shape (N, P, 2).
+    """
+    return coords.reshape(len(coords), -1, 2) * np.array([img_width, img_height], dtype=np.float64)
+
+
+def polygons_to_boxes(coords):
+    """
+    Bounding boxes (x_center, y_center, width, height) of normalized polygons of shape (N, 2 * P).
+    """
+    xs = coords[:, 0::2]
+    ys = coords[:, 1::2]
+    x1, x2 = xs.min(axis=1), xs.max(axis=1)
+    y1, y2 = ys.min(axis=1), ys.max(axis=1)
+    return np.stack([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], axis=1)
@@ -0,0 +1,216 @@
+import errno
+import fcntl
+import itertools
+import json
+import os
+import shutil
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import supervisely as sly
+
+from image_size import get_image_size
+
+# How images are placed into the output project: "link" tries a hardlink, then a reflink
+# (copy-on-write clone on btrfs, XFS and similar file systems), then copies; "reflink" skips
+# hardlinks, so output images do not share data with the input; "copy" always copies.
+LINK_MODES = ["link", "reflink", "copy"]
+
+# ioctl request of Linux that clones the source file into the destination one.
+FICLONE = 0x40049409
+# Errors meaning that the file system or the pair of files does not support the way of linking.
+_LINK_NOT_SUPPORTED = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EMLINK,
+    errno.EOPNOTSUPP,
+    errno.EINVAL,
+    errno.ENOTTY,
+}
+
+LocalProjectInfo = namedtuple("LocalProjectInfo", ["id", "name", "path"])
+LocalDatasetInfo = namedtuple("LocalDatasetInfo", ["id", "name", "project_id", "path"])
+
+
+def reflink(src, dst):
+    with open(src, "rb") as src_file, open(dst, "xb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            sly.fs.silent_remove(dst)
+            raise
+
+
+def place_file(src, dst, mode="link"):
+    """Places the file to `dst` by the first supported way of `mode`, returns the way used."""
+    # Images with the same name in a dataset are rejected as by the platform.
+    if os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, "Image with the same name already exists", dst)
+    if mode == "link":
+        try:
+            os.link(src, dst)
+            return "link"
+        except OSError as e:
+            if e.errno not in _LINK_NOT_SUPPORTED:
+                raise
+    if mode in ["link", "reflink"]:
+        try:
+            reflink(src, dst)
+            return "reflink"
+        except OSError as e:
+            if e.errno not in _LINK_NOT_SUPPORTED:
+                raise
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def _dump_json(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+class LocalProjectApi:
+    """
+    Offline replacement of `sly.Api` for the converter: projects are written to `output_dir`
+    in Supervisely format (meta.json, `img/` and `ann/` directories of every dataset, `meta/`
+    for images with meta) instead of being uploaded, so they can be converted without access
+    to the platform and uploaded later. Implements only the calls used to create projects
+    and datasets, batches are written by `write_batch` used as upload function of `UploadPipeline`.
+    Images and annotation JSONs of a batch are written by a pool of `writers` threads.
+    """
+
+    def __init__(self, output_dir, writers=8, link_mode="link"):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode {link_mode!r}. Supported modes: {LINK_MODES}")
+        self.output_dir = output_dir
+        self.link_mode = link_mode
+        self._executor = ThreadPoolExecutor(max(1, writers), thread_name_prefix="writer")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._projects = {}
+        self._datasets = {}
+        self.placed_counts = {mode: 0 for mode in LINK_MODES}
+        self.project = SimpleNamespace(
+            create=self._create_project,
+            get_info_by_id=lambda id, **kwargs: None,
+            update_meta=self._update_meta,
+            get_meta=self._get_meta,
+        )
+        self.dataset = SimpleNamespace(
+            create=self._create_dataset,
+            get_list=self._get_datasets,
+            get_info_by_id=lambda id, **kwargs: self._datasets.get(id),
+        )
+        self.task = SimpleNamespace(set_output_project=self._set_output_project)
+        sly.fs.mkdir(output_dir)
+
+    def _next_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def _create_project(self, workspace_id, name, change_name_if_conflict=False, **kwargs):
+        path = os.path.join(self.output_dir, name)
+        with self._lock:
+            if change_name_if_conflict:
+                for idx in itertools.count(1):
+                    if not os.path.exists(path):
+                        break
+                    path = os.path.join(self.output_dir, f"{name}_{idx:03d}")
+            os.makedirs(path)
+        project = LocalProjectInfo(self._next_id(), os.path.basename(path), path)
+        self._projects[project.id] = project
+        # Projects of images only are not given a meta.
+        self._update_meta(project.id, sly.ProjectMeta().to_json())
+        return project
+
+    def _update_meta(self, id, meta):
+        sly.json.dump_json_file(meta, os.path.join(self._projects[id].path, "meta.json"))
+
+    def _get_meta(self, id):
+        return sly.json.load_json_file(os.path.join(self._projects[id].path, "meta.json"))
+
+    def _create_dataset(self, project_id, name, change_name_if_conflict=False, **kwargs):
+        path = os.path.join(self._projects[project_id].path, name)
+        for dir_name in [sly.Dataset.item_dir_name, sly.Dataset.ann_dir_name]:
+            os.makedirs(os.path.join(path, dir_name), exist_ok=True)
+        dataset = LocalDatasetInfo(self._next_id(), name, project_id, path)
+        self._datasets[dataset.id] = dataset
+        return dataset
+
+    def _get_datasets(self, project_id, **kwargs):
+        return [info for info in self._datasets.values() if info.project_id == project_id]
+
+    def _set_output_project(self, task_id, project_id, project_name=None, **kwargs):
+        sly.logger.info(
+            f"Project {project_name!r} has been written to {self._projects[project_id].path}"
+        )
+
+    def _write_item(self, dataset, name, path, ann_json, meta):
+        """
+        Writes the image, its annotation and meta.
+        Returns the way the image is placed and written paths.
+        """
+        img_path = os.path.join(dataset.path, sly.Dataset.item_dir_name, name)
+        mode = place_file(path, img_path, self.link_mode)
+        written = [img_path]
+        try:
+            if ann_json is None:
+                # Every image of a project must have an annotation.
+                ann_json = sly.Annotation(get_image_size(path)).to_json()
+            written.append(os.path.join(dataset.path, sly.Dataset.ann_dir_name, name + ".json"))
+            _dump_json(ann_json, written[-1])
+            if meta is not None:
+                meta_dir = os.path.join(dataset.path, sly.Dataset.meta_dir_name)
+                os.makedirs(meta_dir, exist_ok=True)
+                written.append(os.path.join(meta_dir, name + ".json"))
+                _dump_json(meta, written[-1])
+        except Exception:
+            for written_path in written:
+                sly.fs.silent_remove(written_path)
+            raise
+        return mode, written
+
+    def write_batch(self, api, batch, profiler):
+        """
+        Upload function for `UploadPipeline` that writes the batch to the local project.
+        As upload to the platform, the batch is written entirely or not at all,
+        so it can be retried.
+        """
+        if len(batch.names) == 0:
+            return []
+        dataset = self._datasets[batch.dataset_id]
+        anns = batch.anns if batch.anns is not None else [None] * len(batch.names)
+        metas = batch.metas if batch.metas is not None else [None] * len(batch.names)
+        with profiler.stage("write_items", items=len(batch.names)):
+            futures = [
+                self._executor.submit(self._write_item, dataset, *item)
+                for item in zip(batch.names, batch.paths, anns, metas)
+            ]
+            results = []
+            error = None
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    error = error or e
+        if error is not None:
+            for _, written in results:
+                for path in written:
+                    sly.fs.silent_remove(path)
+            raise error
+        with self._lock:
+            for mode, _ in results:
+                self.placed_counts[mode] += 1
+        return [self._next_id() for _ in batch.names]
+
+    def log_report(self):
+        sly.logger.info(
+            f"Images placed into output projects: {self.placed_counts['link']} hardlinked, "
+            f"{self.placed_counts['reflink']} reflinked, {self.placed_counts['copy']} copied.",
+            extra=self.placed_counts,
+        )
+
+    def close(self):
+        self._executor.shutdown()
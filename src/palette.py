@@ -0,0 +1,58 @@
+import colorsys
+import itertools
+from functools import lru_cache
+
+# Hues of consecutive classes are stepped by the golden ratio conjugate, so every prefix
+# of the palette is spread evenly around the color wheel.
+GOLDEN_RATIO_CONJUGATE = 0.6180339887498949
+# Saturation and value cycles have coprime lengths, so classes with close hues
+# differ in brightness.
+SATURATIONS = [0.9, 0.65, 0.8]
+VALUES = [0.95, 0.75, 0.85, 0.65]
+
+
+def _neighbours(color, distance):
+    """Colors at the given Chebyshev distance from the color in the RGB cube, in a fixed order."""
+    offsets = range(-distance, distance + 1)
+    for offset in itertools.product(offsets, offsets, offsets):
+        if max(abs(shift) for shift in offset) != distance:
+            continue
+        neighbour = tuple(channel + shift for channel, shift in zip(color, offset))
+        if all(0 <= channel <= 255 for channel in neighbour):
+            yield neighbour
+
+
+def _unique_color(color, used):
+    """
+    The color or the closest one that is not used yet
+    (colors of large palettes collide after rounding).
+    """
+    if color not in used:
+        return color
+    for distance in itertools.count(1):
+        for neighbour in _neighbours(color, distance):
+            if neighbour not in used:
+                return neighbour
+
+
+@lru_cache(maxsize=16)
+def _generate_palette(count):
+    palette = []
+    used = set()
+    for idx in range(count):
+        hue = (idx * GOLDEN_RATIO_CONJUGATE) % 1.0
+        saturation = SATURATIONS[idx % len(SATURATIONS)]
+        value = VALUES[idx % len(VALUES)]
+        rgb = colorsys.hsv_to_rgb(hue, saturation, value)
+        color = _unique_color(tuple(round(channel * 255) for channel in rgb), used)
+        used.add(color)
+        palette.append(color)
+    return tuple(palette)
+
+
+def generate_colors(count):
+    """
+    Returns `count` distinct [r, g, b] colors in O(count). Colors are deterministic:
+    the same class gets the same color in every run, and palettes are cached by count.
+    """
+    return [list(color) for color in _generate_palette(count)]
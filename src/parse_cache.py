@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import supervisely as sly
+
+# Cached entries are evicted down to this part of the size limit,
+# so eviction does not run on every write.
+EVICT_TO_RATIO = 0.9
+# Entries are written by batches of prepared images, fast compression keeps writes cheap.
+COMPRESS_LEVEL = 1
+# New entries and uses of the found ones are buffered and written by a background thread
+# in one transaction per this number of entries, so writes do not slow down the preparation.
+FLUSH_ITEMS = 512
+# Limit of parameters of a SQLite query in old versions of SQLite.
+SQL_MAX_VARIABLES = 999
+
+
+def get_cache_key(image_path, ann_path, context):
+    """
+    Key of the prepared image: paths, sizes and modification times of the image and its label file
+    and the settings of the dataset the annotation depends on. None if a file can not be accessed.
+    """
+    try:
+        image_stat = os.stat(image_path)
+        ann_stat = os.stat(ann_path) if ann_path is not None else None
+    except OSError:
+        return None
+    key = (
+        image_path,
+        image_stat.st_size,
+        image_stat.st_mtime_ns,
+        ann_path,
+        ann_stat.st_size if ann_stat is not None else None,
+        ann_stat.st_mtime_ns if ann_stat is not None else None,
+        context.class_names,
+        context.tag_name,
+        context.geometry,
+        context.kpt_shape,
+        context.label_hash,
+    )
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """
+    Persistent cache of prepared images: annotation JSON (image size and denormalized objects),
+    label warnings and image meta, keyed by `get_cache_key`. Reruns of the import do not read
+    image headers, parse label files and build annotations of unchanged files again.
+    Total size of compressed entries is limited by `max_bytes`,
+    least recently used entries are evicted. Writes are buffered, `close` flushes them.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        sly.fs.ensure_base_path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Commits are not synced to disk:
+        # losing the last entries on power failure only causes cache misses.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, value BLOB, bytes INTEGER, used INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+        self._conn.commit()
+        total_bytes, last_used = self._conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0), COALESCE(MAX(used), 0) FROM entries"
+        ).fetchone()
+        self.total_bytes = total_bytes
+        # Order of use of entries, persisted with them.
+        self._used = last_used
+        self.hits = 0
+        self.misses = 0
+        self.evicted_count = 0
+        # Buffered entries (key, ann_json, warnings, meta) and used keys with their order of use.
+        self._new_items = []
+        self._used_keys = []
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="parse_cache")
+        self._write_future = None
+
+    def get_many(self, keys):
+        """:param keys: list of cache keys, None keys are skipped
+        :return: dict key -> (ann_json, warnings, meta) for the keys found in the cache"""
+        keys = [key for key in keys if key is not None]
+        if len(keys) == 0:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM entries WHERE key IN ({', '.join('?' * len(keys))})", keys
+            )
+            result = dict(rows.fetchall())
+            self._used += 1
+            self._used_keys.extend((self._used, key) for key in result)
+            self.hits += len(result)
+            self.misses += len(keys) - len(result)
+        self._flush_if_full()
+        return {key: json.loads(zlib.decompress(value)) for key, value in result.items()}
+
+    def put_many(self, items):
+        """:param items: list of (key, ann_json, warnings, meta)"""
+        self._new_items.extend(items)
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if len(self._new_items) + len(self._used_keys) >= FLUSH_ITEMS:
+            self.flush(wait=False)
+
+    def flush(self, wait=True):
+        """Writes buffered entries in the background, waits for the write if `wait` is set."""
+        new_items, self._new_items = self._new_items, []
+        used_keys, self._used_keys = self._used_keys, []
+        # At most one write is in flight, so buffered entries do not pile up in memory.
+        if self._write_future is not None:
+            self._write_future.result()
+            self._write_future = None
+        if len(new_items) > 0 or len(used_keys) > 0:
+            self._write_future = self._writer.submit(self._write, new_items, used_keys)
+            if wait:
+                self._write_future.result()
+                self._write_future = None
+
+    def _write(self, items, used_keys):
+        rows = []
+        for key, ann_json, warnings, meta in items:
+            value = zlib.compress(
+                json.dumps([ann_json, warnings, meta]).encode("utf-8"), COMPRESS_LEVEL
+            )
+            rows.append((key, value, len(value)))
+        with self._lock:
+            self._conn.executemany("UPDATE entries SET used = ? WHERE key = ?", used_keys)
+            if len(rows) > 0:
+                self._used += 1
+                replaced = 0
+                for chunk_start in range(0, len(rows), SQL_MAX_VARIABLES):
+                    keys = [
+                        key for key, _, _ in rows[chunk_start : chunk_start + SQL_MAX_VARIABLES]
+                    ]
+                    replaced += self._conn.execute(
+                        "SELECT COALESCE(SUM(bytes), 0) FROM entries "
+                        f"WHERE key IN ({', '.join('?' * len(keys))})",
+                        keys,
+                    ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    [(key, value, size, self._used) for key, value, size in rows],
+                )
+                self.total_bytes += sum(size for _, _, size in rows) - replaced
+                if self.total_bytes > self.max_bytes:
+                    self._evict(int(self.max_bytes * EVICT_TO_RATIO))
+            self._conn.commit()
+
+    def _evict(self, target_bytes):
+        keys = []
+        for key, size in self._conn.execute("SELECT key, bytes FROM entries ORDER BY used"):
+            if self.total_bytes <= target_bytes:
+                break
+            keys.append((key,))
+            self.total_bytes -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+        self.evicted_count += len(keys)
+
+    def log_report(self):
+        self.flush()
+        total = self.hits + self.misses
+        sly.logger.info(
+            f"Parse cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hits / total * 100 if total > 0 else 0:.1f}% hit rate), "
+            f"{self.evicted_count} entries evicted, {self.total_bytes / 1024 / 1024:.1f} MB "
+            f"of {self.max_bytes / 1024 / 1024:.0f} MB used.",
+            extra={
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted_count,
+                "bytes": self.total_bytes,
+                "path": self.path,
+            },
+        )
+
+    def close(self):
+        self.flush()
+        self._writer.shutdown()
+        with self._lock:
+            self._conn.close()
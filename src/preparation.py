@@ -0,0 +1,315 @@
+import hashlib
+import multiprocessing
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from os.path import basename
+
+from annotation import RECTANGLE, build_annotation_json, split_unsupported
+from image_size import get_image_size
+from labels import read_labels
+from parse_cache import get_cache_key
+from profiler import Profiler
+from transcoding import transcode_image
+from walker import batched
+
+POOL_TYPES = ["process", "thread", "none"]
+
+# Everything a worker needs to build annotations of a dataset. Must be picklable and hashable.
+# `geometry` is the geometry name of object classes, `kpt_shape` is a tuple for keypoints classes,
+# `transcode` is TranscodeSettings if images are transcoded before upload,
+# `label_hash` stores the fingerprint of labels in image meta (see `get_label_hash`).
+PrepareContext = namedtuple(
+    "PrepareContext",
+    ["class_names", "tag_name", "geometry", "kpt_shape", "transcode", "label_hash"],
+    defaults=[RECTANGLE, None, None, False],
+)
+
+# Result of preparation of a single image. `ann_json` is None if the image can not be read.
+# `warnings` contains (message, extra) pairs to be logged by the main process.
+# `transcoded` is TranscodedImage uploaded instead of the image (see `transcoding.transcode_image`),
+# `meta` is the image meta uploaded with it (None - no meta).
+PreparedImage = namedtuple(
+    "PreparedImage",
+    ["name", "path", "ann_json", "warnings", "transcoded", "meta"],
+    defaults=[None, None],
+)
+
+# Image meta key of the fingerprint of labels the annotation is built from, see `get_label_hash`.
+LABEL_HASH_KEY = "yolo_label_hash"
+
+
+def default_workers_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+_DISABLED_PROFILER = Profiler(enabled=False)
+
+
+def get_label_hash(ann_path, context):
+    """
+    Fingerprint of the label file (None if the image has no labels) and of the settings of the
+    dataset the annotation depends on.
+    It is stored in image meta by delta imports to find changed labels on the next one.
+    """
+    settings = (context.class_names, context.tag_name, context.geometry, context.kpt_shape)
+    sha1 = hashlib.sha1(repr(settings).encode("utf-8"))
+    if ann_path is not None:
+        with open(ann_path, "rb") as f:
+            sha1.update(f.read())
+    return sha1.hexdigest()
+
+
+def prepare_image(image_path, ann_path, context, profiler=_DISABLED_PROFILER, size=None):
+    """
+    :param size: (height, width) of the image if it is already known (e.g. the image is
+        on the server and only its annotation is updated), the image is not read then
+    """
+    image_name = basename(image_path)
+    try:
+        with profiler.stage("image_size", items=1):
+            height, width = size if size is not None else get_image_size(image_path)
+    except Exception:
+        return PreparedImage(image_name, image_path, None, [])
+
+    groups = []
+    warnings = []
+    if ann_path is not None:
+        with profiler.stage("parse_labels", items=1):
+            groups, warnings = read_labels(ann_path, len(context.class_names), context.kpt_shape)
+            groups, unsupported = split_unsupported(groups, context.geometry)
+        for group in unsupported:
+            warnings.append(
+                (
+                    f"Labels of {group.format} format can not be converted "
+                    f"to {context.geometry} objects",
+                    {"filename": ann_path, "format": group.format, "count": len(group.class_ids)},
+                )
+            )
+
+    transcoded = None
+    if context.transcode is not None:
+        try:
+            with profiler.stage("transcode", items=1):
+                transcoded = transcode_image(image_path, context.transcode, (height, width))
+        except Exception as e:
+            warnings.append(
+                (
+                    "Image can not be transcoded, the original will be uploaded",
+                    {"filename": image_path, "error": repr(e)},
+                )
+            )
+        if transcoded is not None:
+            # Labels are normalized, so they are denormalized to the size of the transcoded image.
+            height, width = transcoded.height, transcoded.width
+
+    with profiler.stage("build_annotation", items=1):
+        ann_json = build_annotation_json(height, width, groups, context)
+    meta = None
+    if context.label_hash:
+        meta = {LABEL_HASH_KEY: get_label_hash(ann_path, context)}
+    return PreparedImage(image_name, image_path, ann_json, warnings, transcoded, meta)
+
+
+def prepare_chunk(items, context, profile=False):
+    """Returns prepared images and profiler stats of the chunk (None if `profile` is False)."""
+    if not profile:
+        return [
+            prepare_image(image_path, ann_path, context) for image_path, ann_path in items
+        ], None
+    profiler = Profiler(enabled=True, log_interval=0)
+    prepared = [
+        prepare_image(image_path, ann_path, context, profiler) for image_path, ann_path in items
+    ]
+    return prepared, profiler.get_stats()
+
+
+class ImagePreparer:
+    """
+    Runs per-image preparation (format validation, size probing, labels parsing and building
+    annotation JSON) in a pool of workers and yields the results in input order.
+    Images found in optional ParseCache are not prepared again.
+    """
+
+    def __init__(self, pool_type="process", workers=None, chunk_size=16, profiler=None, cache=None):
+        if pool_type not in POOL_TYPES:
+            raise ValueError(f"Unknown pool type {pool_type!r}. Supported types: {POOL_TYPES}")
+        self.workers = workers or default_workers_count()
+        self.pool_type = pool_type if self.workers > 1 else "none"
+        self.chunk_size = chunk_size
+        self.profiler = profiler or _DISABLED_PROFILER
+        self.cache = cache
+        self._executor = None
+
+    def __enter__(self):
+        if self.pool_type == "process":
+            # Main script has side effects on import (e.g. cleans storage dir),
+            # so workers must be forked instead of spawned.
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("fork")
+            )
+            # Workers are forked on the first submit. They are started right away, before other
+            # threads of the app exist: forking a process with running threads may leave locks
+            # (e.g. of logging) held forever in the children.
+            for future in [self._executor.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+        elif self.pool_type == "thread":
+            self._executor = ThreadPoolExecutor(self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _fetch(self, chunk, source):
+        with self.profiler.stage("fetch", items=len(chunk)):
+            source.fetch([image_path for image_path, _ in chunk])
+
+    def _collect(self, result):
+        prepared, stats = result
+        self.profiler.merge(stats)
+        return prepared
+
+    def _lookup(self, chunk, context):
+        """
+        Finds prepared images of the chunk in the cache.
+
+        :return: tuple (cached, keys): PreparedImage or None for every item and their cache keys
+        """
+        if self.cache is None or context.transcode is not None:
+            # Transcoded copies are removed after upload, so images must be transcoded every time.
+            return [None] * len(chunk), None
+        with self.profiler.stage("parse_cache", items=len(chunk)):
+            keys = [get_cache_key(image_path, ann_path, context) for image_path, ann_path in chunk]
+            found = self.cache.get_many(keys)
+        cached = []
+        for (image_path, _), key in zip(chunk, keys):
+            if key not in found:
+                cached.append(None)
+                continue
+            ann_json, warnings, meta = found[key]
+            cached.append(
+                PreparedImage(basename(image_path), image_path, ann_json, warnings, None, meta)
+            )
+        return cached, keys
+
+    def _merge(self, cached, keys, result):
+        """
+        Fills the items missing in the cache with the prepared ones and stores them in the cache.
+        """
+        prepared = iter(self._collect(result) if result is not None else [])
+        images = [image if image is not None else next(prepared) for image in cached]
+        if keys is not None:
+            new_items = [
+                (key, image.ann_json, image.warnings, image.meta)
+                for key, image, old in zip(keys, images, cached)
+                if old is None and key is not None and image.ann_json is not None
+            ]
+            with self.profiler.stage("parse_cache", items=len(new_items)):
+                self.cache.put_many(new_items)
+        return images
+
+    def _wait(self, chunks):
+        # Time the caller waits for workers: large values mean preparation is the bottleneck.
+        with self.profiler.stage("prepare_wait"):
+            return [
+                image
+                for cached, keys, future in chunks
+                for image in self._merge(
+                    cached, keys, future.result() if future is not None else None
+                )
+            ]
+
+    def _acquire(self, budget, paths, sizes):
+        with self.profiler.stage("budget_wait"):
+            budget.acquire(paths, sizes)
+
+    def _prepare_batches(self, items, context, source, batch_size, budget):
+        profile = self.profiler.enabled
+        if self._executor is None:
+            for batch in batched(items, batch_size):
+                if budget is not None:
+                    paths = [image_path for image_path, _ in batch]
+                    self._acquire(budget, paths, [source.get_size(path) for path in paths])
+                prepared = []
+                for chunk in batched(batch, self.chunk_size):
+                    self._fetch(chunk, source)
+                    cached, keys = self._lookup(chunk, context)
+                    misses = [item for item, image in zip(chunk, cached) if image is None]
+                    result = prepare_chunk(misses, context, profile) if len(misses) > 0 else None
+                    prepared.extend(self._merge(cached, keys, result))
+                yield prepared
+            return
+
+        # Chunks of every batch in flight: (cached images, cache keys, future of the items to
+        # prepare). The number of chunks in flight is bounded,
+        # so results are not accumulated in memory.
+        pending = deque()
+        for batch in batched(items, batch_size):
+            # Items may be a stream of unknown length,
+            # so every batch is split evenly between workers.
+            chunk_size = max(1, min(self.chunk_size, len(batch) // self.workers))
+            if budget is not None:
+                paths = [image_path for image_path, _ in batch]
+                sizes = [source.get_size(path) for path in paths]
+                if not budget.try_acquire(paths, sizes):
+                    # All acquired batches are yielded (and so submitted for upload) before waiting,
+                    # otherwise concurrent datasets could wait for each other forever.
+                    while len(pending) > 0:
+                        yield self._wait(pending.popleft())
+                    self._acquire(budget, paths, sizes)
+            chunks = []
+            for chunk in batched(batch, chunk_size):
+                self._fetch(chunk, source)
+                cached, keys = self._lookup(chunk, context)
+                misses = [item for item, image in zip(chunk, cached) if image is None]
+                future = None
+                if len(misses) > 0:
+                    future = self._executor.submit(prepare_chunk, misses, context, profile)
+                chunks.append((cached, keys, future))
+            pending.append(chunks)
+            while len(pending) > 1 and sum(len(chunks) for chunks in pending) > self.workers * 2:
+                yield self._wait(pending.popleft())
+        while len(pending) > 0:
+            yield self._wait(pending.popleft())
+
+    def map_chunks(self, fn, items, source, *args):
+        """
+        Runs `fn(chunk, *args)` for chunks of (image_path, ann_path) items in the pool.
+        Images are fetched from `source` before their chunk is submitted, the number of chunks
+        in flight is bounded.
+
+        :return: generator of (chunk, result) pairs in input order
+        """
+        if self._executor is None:
+            for chunk in batched(items, self.chunk_size):
+                self._fetch(chunk, source)
+                yield chunk, fn(chunk, *args)
+            return
+
+        pending = deque()
+        for chunk in batched(items, self.chunk_size):
+            self._fetch(chunk, source)
+            pending.append((chunk, self._executor.submit(fn, chunk, *args)))
+            if len(pending) > self.workers * 2:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while len(pending) > 0:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+    def prepare(self, items, context, source, batch_size=50, budget=None):
+        """
+        :param items: iterable of (image_path, ann_path) pairs, consumed lazily
+        :param context: PrepareContext
+        :param source: images source, images are fetched from it right before preparation
+        :param budget: InFlightBudget, acquired for every batch before its images are fetched
+            and expected to be released by the caller after upload
+        :return: generator of lists of PreparedImage with at most `batch_size` elements
+            in input order
+        """
+        return self._prepare_batches(items, context, source, batch_size, budget)
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+
+import supervisely as sly
+
+
+class _Stage:
+    __slots__ = ("_profiler", "_name", "_items", "_bytes", "_wall", "_cpu")
+
+    def __init__(self, profiler, name, items, bytes):
+        self._profiler = profiler
+        self._name = name
+        self._items = items
+        self._bytes = bytes
+
+    def add(self, items=0, bytes=0):
+        """Adds counts that are known only inside the stage (e.g. size of downloaded data)."""
+        self._items += items
+        self._bytes += bytes
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        self._profiler.add(self._name, wall, cpu, self._items, self._bytes)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def add(self, items=0, bytes=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    """
+    Collects cumulative wall time, CPU time (of the calling thread), number of calls, items
+    and bytes per stage of the import. Stages that run in parallel threads or workers are summed,
+    so their wall time may exceed the elapsed time.
+    When disabled, `stage` returns a shared no-op context manager and nothing is recorded.
+
+    Usage:
+        with profiler.stage("upload_images", items=len(paths)) as stage:
+            upload(paths)
+            stage.add(bytes=uploaded_size)
+    """
+
+    def __init__(self, enabled=False, log_interval=30):
+        self.enabled = enabled
+        self.log_interval = log_interval
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._last_log = self._start
+
+    def stage(self, name, items=0, bytes=0):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, items, bytes)
+
+    def add(self, name, wall=0.0, cpu=0.0, items=0, bytes=0, calls=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = [0.0, 0.0, 0, 0, 0]
+            stats[0] += wall
+            stats[1] += cpu
+            stats[2] += calls
+            stats[3] += items
+            stats[4] += bytes
+            now = time.perf_counter()
+            need_log = self.log_interval > 0 and now - self._last_log >= self.log_interval
+            if need_log:
+                self._last_log = now
+        if need_log:
+            self.log()
+
+    def get_stats(self):
+        """Raw stats to be sent from a worker process and merged with `merge`."""
+        with self._lock:
+            return {name: list(stats) for name, stats in self._stats.items()}
+
+    def merge(self, stats):
+        if not self.enabled or not stats:
+            return
+        for name, (wall, cpu, calls, items, bytes) in stats.items():
+            self.add(name, wall, cpu, items, bytes, calls)
+
+    def report(self):
+        elapsed = time.perf_counter() - self._start
+        stages = {}
+        for name, (wall, cpu, calls, items, bytes) in self.get_stats().items():
+            stage = {"wall_sec": round(wall, 4), "cpu_sec": round(cpu, 4), "calls": calls}
+            if items > 0:
+                stage["items"] = items
+                stage["items_per_sec"] = round(items / wall, 2) if wall > 0 else None
+            if bytes > 0:
+                stage["bytes"] = bytes
+                stage["mb_per_sec"] = round(bytes / 1024 / 1024 / wall, 2) if wall > 0 else None
+            stages[name] = stage
+        return {"elapsed_sec": round(elapsed, 4), "stages": stages}
+
+    def log(self):
+        if self.enabled:
+            sly.logger.info("Import profile", extra=self.report())
+
+    def save_report(self, path):
+        if not self.enabled:
+            return
+        report = self.report()
+        sly.fs.ensure_base_path(path)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+        sly.logger.info(f"Profile report has been saved to {path}", extra=report)
@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import supervisely as sly
+
+
+class InFlightBudget:
+    """
+    Limits total size of images that are fetched but not uploaded yet, summed over all
+    concurrently processed datasets. `max_bytes <= 0` means no limit.
+    A request larger than the whole budget is granted when nothing else is in flight.
+    """
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self._sizes = {}
+        self._used = 0
+        self._cond = threading.Condition()
+
+    def _can_acquire(self, size):
+        return self.max_bytes <= 0 or self._used == 0 or self._used + size <= self.max_bytes
+
+    def _acquire(self, paths, sizes):
+        for path, size in zip(paths, sizes):
+            self._sizes[path] = self._sizes.get(path, 0) + size
+        self._used += sum(sizes)
+
+    def try_acquire(self, paths, sizes):
+        with self._cond:
+            if not self._can_acquire(sum(sizes)):
+                return False
+            self._acquire(paths, sizes)
+            return True
+
+    def acquire(self, paths, sizes):
+        with self._cond:
+            self._cond.wait_for(lambda: self._can_acquire(sum(sizes)))
+            self._acquire(paths, sizes)
+
+    def release(self, paths):
+        with self._cond:
+            for path in paths:
+                self._used -= self._sizes.pop(path, 0)
+            self._cond.notify_all()
+
+    @property
+    def used(self):
+        return self._used
+
+
+class ImportScheduler:
+    """
+    Runs dataset tasks of all projects in a bounded pool of threads. Tasks are started in the order
+    of submission, so projects are completed one after another as soon as possible, while small
+    projects and datasets do not wait for large ones.
+    Errors are isolated per project: `results` yields (project key, error) for every project
+    after all its tasks have finished, error is None if all of them succeeded.
+
+    Usage:
+        with ImportScheduler(concurrency=4) as scheduler:
+            for project_key in projects:
+                for dataset in datasets:
+                    scheduler.submit(project_key, process_dataset, dataset)
+            for project_key, error in scheduler.results():
+                ...
+    """
+
+    def __init__(self, concurrency=4):
+        self.concurrency = max(1, concurrency)
+        self._executor = None
+        self._tasks = OrderedDict()
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="import")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._executor.shutdown(cancel_futures=exc_type is not None)
+        self._executor = None
+
+    def add_project(self, project_key):
+        """Registers project without tasks, e.g. when all its datasets are empty."""
+        self._tasks.setdefault(project_key, [])
+
+    def submit(self, project_key, fn, *args, **kwargs):
+        self.add_project(project_key)
+        self._tasks[project_key].append(self._executor.submit(fn, *args, **kwargs))
+
+    def results(self):
+        total = len(self._tasks)
+        for idx, (project_key, futures) in enumerate(self._tasks.items(), start=1):
+            error = None
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    error = error or e
+            sly.logger.info(f"Projects processed: {idx}/{total}")
+            yield project_key, error
+        self._tasks.clear()
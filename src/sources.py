@@ -0,0 +1,271 @@
+import os
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import supervisely as sly
+
+from archive import COPY_BUFFER_SIZE, is_junk, safe_member_path
+from walker import IMAGE, classify, walk_files
+
+
+def is_image_file(path):
+    return classify(path) == IMAGE
+
+
+class LocalSource:
+    """
+    Images that are already stored in the local directory.
+
+    Sources provide image paths for the converter and make sure that the files exist
+    between `fetch` (called before the image is read) and `release` (called after upload).
+    Config and label files are always available on local disk.
+    """
+
+    def walk_files(self, dir_path, recursive=True):
+        """Yields (kind, path) of all files in the directory, see `walker.walk_files`."""
+        return walk_files(dir_path, recursive)
+
+    def iter_images(self, dir_path):
+        """Yields images of the directory (not recursively) sorted by name."""
+        for kind, path in self.walk_files(dir_path, recursive=False):
+            if kind == IMAGE:
+                yield path
+
+    def get_size(self, path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def fetch(self, paths):
+        pass
+
+    def release(self, paths):
+        pass
+
+
+class OnDemandSource(LocalSource):
+    """
+    Base class for sources whose images are materialized on local disk only between
+    `fetch` and `release`. Subclasses register images with `_add_image` and implement
+    `_fetch_image`.
+    """
+
+    def __init__(self):
+        self._images = {}
+        self._sizes = {}
+        self._images_by_dir = defaultdict(list)
+
+    def _add_image(self, path, origin, size):
+        path = os.path.realpath(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._images[path] = origin
+        self._sizes[path] = size
+        self._images_by_dir[os.path.dirname(path)].append(path)
+
+    def _fetch_image(self, origin, path):
+        raise NotImplementedError()
+
+    def walk_files(self, dir_path, recursive=True):
+        """
+        Registered images (they may be absent on disk) sorted by directory and name,
+        then other files found on local disk.
+        """
+        dir_path = os.path.realpath(dir_path)
+        if recursive:
+            image_dirs = sorted(
+                image_dir
+                for image_dir in self._images_by_dir
+                if image_dir == dir_path or image_dir.startswith(dir_path + os.sep)
+            )
+        else:
+            image_dirs = [dir_path] if dir_path in self._images_by_dir else []
+        for image_dir in image_dirs:
+            for path in sorted(self._images_by_dir[image_dir]):
+                yield IMAGE, path
+        for kind, path in walk_files(dir_path, recursive):
+            # Images that are fetched at the moment are already listed.
+            if kind != IMAGE or path not in self._images:
+                yield kind, path
+
+    def get_size(self, path):
+        return self._sizes.get(path, 0)
+
+    def fetch(self, paths):
+        for path in paths:
+            origin = self._images.get(path)
+            if origin is not None and not os.path.isfile(path):
+                self._fetch_image(origin, path)
+
+    def release(self, paths):
+        for path in paths:
+            if path in self._images:
+                sly.fs.silent_remove(path)
+
+
+class ZipSource(OnDemandSource):
+    """
+    Images are read directly from zip archive on demand, so the archive is not extracted entirely.
+    Directory tree, configs and labels are extracted to `extract_dir` on initialization.
+    """
+
+    def __init__(self, archive_path, extract_dir):
+        super().__init__()
+        self._archive = zipfile.ZipFile(archive_path, "r")
+        for info in self._archive.infolist():
+            if is_junk(info.filename):
+                continue
+            path = safe_member_path(extract_dir, info.filename)
+            if path is None:
+                sly.logger.warn(
+                    f"Archive member {info.filename!r} is outside of archive root. Skipped."
+                )
+                continue
+            if info.is_dir():
+                os.makedirs(path, exist_ok=True)
+            elif is_image_file(path):
+                self._add_image(path, info, info.file_size)
+            else:
+                self._fetch_image(info, path)
+        sly.logger.info(
+            f"Found {len(self._images)} images in archive {archive_path}. "
+            "They will be extracted on demand."
+        )
+
+    def _fetch_image(self, info, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._archive.open(info) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        # Images are extracted on every run, keep modification time from the archive,
+        # so the hash cache can recognize them.
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        os.utime(path, (mtime, mtime))
+
+
+class TarSource(OnDemandSource):
+    """
+    Images are read directly from tar archive on demand, like in ZipSource. Members of
+    a compressed archive are located by decompressing it from the start, so the source
+    is meant for a single pass over images (e.g. dry run).
+    """
+
+    def __init__(self, archive_path, extract_dir):
+        super().__init__()
+        self._archive = tarfile.open(archive_path, "r:*")
+        self._lock = threading.Lock()
+        for member in self._archive:
+            if is_junk(member.name) or not (member.isfile() or member.isdir()):
+                continue
+            path = safe_member_path(extract_dir, member.name)
+            if path is None:
+                sly.logger.warn(
+                    f"Archive member {member.name!r} is outside of archive root. Skipped."
+                )
+                continue
+            if member.isdir():
+                os.makedirs(path, exist_ok=True)
+            elif is_image_file(path):
+                self._add_image(path, member, member.size)
+            else:
+                self._fetch_image(member, path)
+        sly.logger.info(
+            f"Found {len(self._images)} images in archive {archive_path}. "
+            "They will be extracted on demand."
+        )
+
+    def _fetch_image(self, member, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Members share the file object of the archive.
+        with self._lock, self._archive.extractfile(member) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        os.utime(path, (member.mtime, member.mtime))
+
+
+class RemoteSource(OnDemandSource):
+    """
+    Images are downloaded from Team Files in small batches right before preparation and removed
+    after upload, so the local disk holds only the images that are in flight.
+    Configs and labels are downloaded on initialization: directories without images as a whole,
+    other files one by one.
+    """
+
+    def __init__(self, api, team_id, remote_dir, local_dir, download_workers=8):
+        super().__init__()
+        self.api = api
+        self.team_id = team_id
+        self._executor = ThreadPoolExecutor(max(1, download_workers))
+        remote_dir = remote_dir.rstrip("/") + "/"
+
+        file_infos = api.file.list(team_id, remote_dir, recursive=True, return_type="fileinfo")
+        other_files = []
+        image_dirs = set()
+        for file_info in file_infos:
+            rel_path = (
+                file_info.path[len(remote_dir) :] if file_info.path.startswith(remote_dir) else None
+            )
+            if rel_path is None or rel_path.endswith("/") or is_junk(rel_path):
+                continue
+            if is_image_file(rel_path):
+                self._add_image(os.path.join(local_dir, rel_path), file_info.path, file_info.sizeb)
+                parent = os.path.dirname(rel_path)
+                while parent not in image_dirs:
+                    image_dirs.add(parent)
+                    parent = os.path.dirname(parent)
+            else:
+                other_files.append(rel_path)
+
+        # The topmost directories without images (e.g. "labels") are downloaded entirely.
+        dirs_to_download = set()
+        files_to_download = []
+        for rel_path in other_files:
+            parts = rel_path.split("/")[:-1]
+            top_dir = None
+            for idx in range(1, len(parts) + 1):
+                if "/".join(parts[:idx]) not in image_dirs:
+                    top_dir = "/".join(parts[:idx])
+                    break
+            if top_dir is None:
+                files_to_download.append(rel_path)
+            else:
+                dirs_to_download.add(top_dir)
+
+        sly.logger.info(
+            f"Found {len(self._images)} images and {len(other_files)} other files in {remote_dir}. "
+            f"Downloading {len(dirs_to_download)} directories and {len(files_to_download)} files "
+            "without images. Images will be downloaded on demand."
+        )
+        for rel_dir in sorted(dirs_to_download):
+            api.file.download_directory(
+                team_id, remote_dir + rel_dir, os.path.join(local_dir, rel_dir)
+            )
+        self._download_all(
+            [
+                (remote_dir + rel_path, os.path.join(local_dir, rel_path))
+                for rel_path in files_to_download
+            ]
+        )
+
+    def _fetch_image(self, remote_path, path):
+        self.api.file.download(self.team_id, remote_path, path)
+
+    def _download_all(self, pairs):
+        for future in [self._executor.submit(self._fetch_image, *pair) for pair in pairs]:
+            future.result()
+
+    def fetch(self, paths):
+        futures = {
+            self._executor.submit(self._fetch_image, self._images[path], path): path
+            for path in paths
+            if path in self._images and not os.path.isfile(path)
+        }
+        for future, path in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                # The image will be reported as unreadable during preparation.
+                sly.logger.warn(f"Failed to download image {self._images[path]}: {repr(e)}")
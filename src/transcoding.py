@@ -0,0 +1,206 @@
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import cv2
+import supervisely as sly
+
+from image_size import get_image_size
+
+JPEG = "jpeg"
+WEBP = "webp"
+# Extension of transcoded images and extensions of images that are already in the format.
+FORMAT_EXTS = {
+    JPEG: (".jpg", [".jpg", ".jpeg", ".jfif", ".mpo"]),
+    WEBP: (".webp", [".webp"]),
+}
+# Extensions encoded with quality parameter. Other formats (e.g. PNG) are lossless.
+QUALITY_PARAMS = {".jpg": cv2.IMWRITE_JPEG_QUALITY, ".webp": cv2.IMWRITE_WEBP_QUALITY}
+
+# Settings of transcoding before upload. `format` is a key of FORMAT_EXTS or None to keep
+# the format of images, `max_side` limits the longest side in pixels (0 - no limit).
+# Transcoded copies are written to `temp_dir`. Must be picklable and hashable.
+TranscodeSettings = namedtuple("TranscodeSettings", ["format", "quality", "max_side", "temp_dir"])
+
+# Copy of an image uploaded instead of it. `source_bytes` is the size of the original image,
+# `seconds` is the time spent to decode, resize and encode it.
+TranscodedImage = namedtuple(
+    "TranscodedImage", ["name", "path", "height", "width", "source_bytes", "bytes", "seconds"]
+)
+
+
+def get_output_ext(name, settings):
+    ext = sly.fs.get_file_ext(name)
+    if settings.format is None:
+        return ext
+    output_ext, format_exts = FORMAT_EXTS[settings.format]
+    return ext if ext.lower() in format_exts else output_ext
+
+
+def get_transcoded_name(name, settings, keep_ext=False):
+    """
+    Name of the image after transcoding, e.g. `image.jpg` for `image.bmp` transcoded to JPEG.
+    With `keep_ext` the original extension stays in the name: `image.bmp.jpg`.
+    """
+    ext = get_output_ext(name, settings)
+    if keep_ext and ext != sly.fs.get_file_ext(name):
+        return name + ext
+    return sly.fs.get_file_name(name) + ext
+
+
+def find_name_collisions(paths, settings):
+    """
+    Finds images that would get the same name after transcoding as another image of their directory,
+    e.g. `image.png` and `image.jpg` (or `image.bmp`) transcoded to JPEG. Their transcoded names
+    must keep the original extension, see `get_transcoded_name`.
+
+    :param paths: image paths with files of a directory yielded together
+        (as by `walker.walk_files`), only names of the current directory are kept in memory
+    :return: set of paths of colliding images
+    """
+    collisions = set()
+    groups = defaultdict(list)
+
+    def _flush():
+        for transcoded_name, group in groups.items():
+            if len(group) > 1:
+                # The image that already has the name keeps it.
+                collisions.update(
+                    path for path in group if os.path.basename(path) != transcoded_name
+                )
+        groups.clear()
+
+    last_dir = None
+    for path in paths:
+        cur_dir = os.path.dirname(path)
+        if cur_dir != last_dir:
+            _flush()
+            last_dir = cur_dir
+        groups[get_transcoded_name(os.path.basename(path), settings)].append(path)
+    _flush()
+    return collisions
+
+
+def _encode(img, ext, settings):
+    encode_ext = ext.lower()
+    if encode_ext in FORMAT_EXTS[JPEG][1]:
+        encode_ext = ".jpg"
+    params = []
+    if encode_ext in QUALITY_PARAMS:
+        params = [QUALITY_PARAMS[encode_ext], settings.quality]
+    is_success, data = cv2.imencode(encode_ext, img, params)
+    if not is_success:
+        raise IOError(f"OpenCV can not encode the image to {encode_ext!r}")
+    return data
+
+
+def transcode_image(path, settings, size=None):
+    """
+    Re-encodes the image to `settings.format` and downscales it to `settings.max_side`.
+    Labels stay consistent, because their coordinates are normalized to the image size.
+    Returns TranscodedImage or None if the original should be uploaded: it is already in the format
+    and not larger than the limit, or its copy would not be smaller. The name of TranscodedImage
+    does not account for other images of the directory, see `find_name_collisions`.
+
+    :param size: (height, width) of the image if it is already known
+    """
+    start = time.perf_counter()
+    name = os.path.basename(path)
+    ext = get_output_ext(name, settings)
+    height, width = size if size is not None else get_image_size(path)
+    is_large = settings.max_side > 0 and max(height, width) > settings.max_side
+    if not is_large and ext == sly.fs.get_file_ext(name):
+        return None
+
+    # The image is read as `sly.image.read` does:
+    # EXIF orientation is applied, alpha channel is dropped.
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise IOError(f"OpenCV can not open the file {path!r}")
+    height, width = img.shape[:2]
+    if is_large:
+        scale = settings.max_side / max(height, width)
+        height, width = max(1, round(height * scale)), max(1, round(width * scale))
+        img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+    data = _encode(img, ext, settings)
+    source_bytes = os.path.getsize(path)
+    if not is_large and data.size >= source_bytes:
+        return None
+
+    # Copies of images with the same name from different directories must not overwrite each other.
+    copy_name = hashlib.sha1(path.encode("utf-8")).hexdigest() + ext
+    copy_path = os.path.join(settings.temp_dir, copy_name)
+    with open(copy_path, "wb") as f:
+        f.write(data.tobytes())
+    return TranscodedImage(
+        get_transcoded_name(name, settings),
+        copy_path,
+        height,
+        width,
+        source_bytes,
+        data.size,
+        time.perf_counter() - start,
+    )
+
+
+def transcode_chunk(items, settings):
+    """
+    Transcodes images of (image_path, ann_path) items, see `transcode_image`.
+    Returns (TranscodedImage or None, error message or None) for every item.
+    """
+    results = []
+    for image_path, _ in items:
+        try:
+            results.append((transcode_image(image_path, settings), None))
+        except Exception as e:
+            results.append((None, repr(e)))
+    return results
+
+
+class TranscodeStats:
+    """Totals of transcoded images of all datasets, logged at the end of the import."""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self.images_count = 0
+        self.transcoded_count = 0
+        self.source_bytes = 0
+        self.transcoded_bytes = 0
+        self.seconds = 0.0
+
+    def add(self, transcoded=None):
+        """Counts a checked image, `transcoded` is None if the original is uploaded."""
+        with self._lock:
+            self.images_count += 1
+            if transcoded is not None:
+                self.transcoded_count += 1
+                self.source_bytes += transcoded.source_bytes
+                self.transcoded_bytes += transcoded.bytes
+                self.seconds += transcoded.seconds
+
+    def log_report(self):
+        saved_bytes = self.source_bytes - self.transcoded_bytes
+        # Time is summed over workers, so throughput is given per worker.
+        mb_per_second = self.source_bytes / 1024 / 1024 / self.seconds if self.seconds > 0 else 0
+        images_per_second = self.transcoded_count / self.seconds if self.seconds > 0 else 0
+        sly.logger.info(
+            f"Transcoding: {self.transcoded_count} of {self.images_count} images transcoded, "
+            f"{self.source_bytes / 1024 / 1024:.1f} MB -> "
+            f"{self.transcoded_bytes / 1024 / 1024:.1f} MB, "
+            f"{saved_bytes / 1024 / 1024:.1f} MB saved. Throughput per worker: "
+            f"{images_per_second:.1f} images/s, {mb_per_second:.1f} MB/s.",
+            extra={
+                "format": self.settings.format,
+                "quality": self.settings.quality,
+                "max_side": self.settings.max_side,
+                "images": self.images_count,
+                "transcoded": self.transcoded_count,
+                "source_bytes": self.source_bytes,
+                "transcoded_bytes": self.transcoded_bytes,
+                "saved_bytes": saved_bytes,
+                "seconds": round(self.seconds, 3),
+            },
+        )
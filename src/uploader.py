@@ -0,0 +1,336 @@
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import requests
+import supervisely as sly
+
+from profiler import Profiler
+
+# Batch of prepared images. `anns` is None when only images are uploaded,
+# `size` is the number of processed source items (including skipped ones) reported to `progress`,
+# `metas` are image metas (None - no meta).
+UploadBatch = namedtuple(
+    "UploadBatch",
+    ["dataset_id", "names", "paths", "anns", "progress", "size", "metas"],
+    defaults=[None],
+)
+
+# Function run by upload workers along with batches of the dataset, see `submit_task`.
+_Task = namedtuple("_Task", ["dataset_id", "fn", "args"])
+
+_STOP = object()
+
+# Approximate size of JSON of a single label, used to estimate annotation payload of a batch.
+LABEL_JSON_BYTES = 200
+
+
+def upload_anns(api, img_ids, anns, profiler):
+    """Uploads annotations, images are removed if it fails, so the batch can be uploaded again."""
+    try:
+        with profiler.stage("upload_anns", items=len(anns)):
+            api.annotation.upload_jsons(img_ids, anns)
+    except Exception:
+        api.image.remove_batch(img_ids)
+        raise
+
+
+def upload_batch(api, batch, profiler):
+    """Uploads images and annotations of the batch and returns ids of uploaded images."""
+    if len(batch.names) == 0:
+        return []
+    with profiler.stage("upload_images", items=len(batch.names)) as stage:
+        img_infos = api.image.upload_paths(
+            batch.dataset_id, batch.names, batch.paths, metas=batch.metas
+        )
+        if profiler.enabled:
+            stage.add(bytes=sum(os.path.getsize(path) for path in batch.paths))
+    img_ids = [x.id for x in img_infos]
+    if batch.anns is not None:
+        upload_anns(api, img_ids, batch.anns, profiler)
+    return img_ids
+
+
+class AdaptiveBatcher:
+    """
+    Splits batches by estimated payload: size of images plus size of annotation JSON.
+    The payload limit is adjusted AIMD-style: it grows by `step_bytes` after every batch
+    uploaded faster than `target_seconds` and is halved after slow uploads and after uploads
+    failed because of the connection or the server (see `is_transport_error`).
+    """
+
+    def __init__(
+        self,
+        initial_bytes=64 * 1024 * 1024,
+        target_seconds=30,
+        min_bytes=4 * 1024 * 1024,
+        max_bytes=512 * 1024 * 1024,
+        step_bytes=8 * 1024 * 1024,
+        max_items=50,
+    ):
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.limit_bytes = min(max(initial_bytes, min_bytes), max_bytes)
+        self.target_seconds = target_seconds
+        self.step_bytes = step_bytes
+        self.max_items = max_items
+        self._lock = threading.Lock()
+
+    def get_payload(self, batch, get_size):
+        """
+        Estimated payload in bytes of every image of the batch,
+        `get_size(path)` returns size of an image.
+        """
+        payload = [get_size(path) for path in batch.paths]
+        if batch.anns is not None:
+            payload = [
+                size + LABEL_JSON_BYTES * len(ann.get("objects", []))
+                for size, ann in zip(payload, batch.anns)
+            ]
+        return payload
+
+    def split(self, batch, payload):
+        """
+        Splits batch by the current limit. Progress of skipped items is reported with the last part.
+        """
+        parts = []
+        start = 0
+        cur_bytes = 0
+        for idx, size in enumerate(payload):
+            count = idx - start
+            if count > 0 and (count >= self.max_items or cur_bytes + size > self.limit_bytes):
+                parts.append(_slice_batch(batch, start, idx, size=count))
+                start = idx
+                cur_bytes = 0
+            cur_bytes += size
+        parts.append(_slice_batch(batch, start, len(payload), size=batch.size - start))
+        return parts
+
+    def on_success(self, seconds):
+        with self._lock:
+            if seconds <= self.target_seconds:
+                self.limit_bytes = min(self.limit_bytes + self.step_bytes, self.max_bytes)
+            else:
+                self.limit_bytes = max(self.limit_bytes // 2, self.min_bytes)
+
+    def on_failure(self):
+        with self._lock:
+            self.limit_bytes = max(self.limit_bytes // 2, self.min_bytes)
+
+
+def is_transport_error(error):
+    """
+    Checks if the upload failed because of the connection or the load of the server (the batch may
+    be too large for them), not because items of the batch were rejected.
+    """
+    if isinstance(
+        error,
+        (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError),
+    ):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        # Request timeout, payload too large, rate limit and server errors.
+        return error.response.status_code in (408, 413, 429) or error.response.status_code >= 500
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _slice_batch(batch, start, end, size):
+    return batch._replace(
+        names=batch.names[start:end],
+        paths=batch.paths[start:end],
+        anns=batch.anns[start:end] if batch.anns is not None else None,
+        metas=batch.metas[start:end] if batch.metas is not None else None,
+        size=size,
+    )
+
+
+class UploadPipeline:
+    """
+    Uploads batches in background threads while the caller prepares the next ones.
+    Submitted batches are split by `batcher` according to their payload.
+    `submit` blocks when `queue_size` batches are already waiting, so at most
+    `concurrency + queue_size` batches are kept in memory.
+    A batch that fails to upload is split in half and the halves are retried,
+    so only the images that can not be uploaded are skipped.
+    Images of the uploaded batch are released from the `source` and the in-flight `budget`.
+    Temporary copies registered by `add_copy` are removed after upload.
+    `on_uploaded(batch, img_ids)` is called after the batch has been uploaded successfully.
+    Other requests of a dataset (e.g. updates of annotations) can be run by the workers
+    along with uploads, see `submit_task`.
+    The pipeline can be shared by concurrently processed datasets, `wait_dataset` blocks
+    until all submitted batches and tasks of the dataset are processed.
+
+    Usage:
+        with UploadPipeline(api, source, concurrency=2) as pipeline:
+            for batch in prepare_batches():
+                pipeline.submit(batch)
+    """
+
+    def __init__(
+        self,
+        api,
+        source,
+        concurrency=2,
+        queue_size=None,
+        upload_fn=upload_batch,
+        on_uploaded=None,
+        profiler=None,
+        budget=None,
+        batcher=None,
+    ):
+        self.api = api
+        self.source = source
+        self.profiler = profiler or Profiler(enabled=False)
+        self.budget = budget
+        self.batcher = batcher or AdaptiveBatcher()
+        self._on_uploaded = on_uploaded
+        self.concurrency = max(1, concurrency)
+        self._upload_fn = upload_fn
+        self._queue = queue.Queue(maxsize=queue_size or self.concurrency)
+        self._progress_lock = threading.Lock()
+        self._copies = {}
+        self._copies_lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._pending_cond = threading.Condition()
+        self._threads = []
+        self._error = None
+
+    def __enter__(self):
+        for idx in range(self.concurrency):
+            thread = threading.Thread(target=self._worker, name=f"uploader-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if exc_type is None and self._error is not None:
+            raise self._error
+
+    def submit(self, batch):
+        if self._error is not None:
+            raise self._error
+        parts = self.batcher.split(batch, self.batcher.get_payload(batch, self._get_size))
+        with self._pending_cond:
+            self._pending[batch.dataset_id] += len(parts)
+        # Time spent here means that uploading is slower than preparation.
+        with self.profiler.stage("upload_wait"):
+            for part in parts:
+                self._queue.put(part)
+
+    def submit_task(self, dataset_id, fn, *args):
+        """
+        Runs `fn(*args)` in a worker in turn with batches. A failed task is logged and skipped
+        like a batch that can not be uploaded.
+        """
+        if self._error is not None:
+            raise self._error
+        with self._pending_cond:
+            self._pending[dataset_id] += 1
+        with self.profiler.stage("upload_wait"):
+            self._queue.put(_Task(dataset_id, fn, args))
+
+    def add_copy(self, path, copy_path):
+        """
+        Registers a temporary copy of the fetched image (e.g. transcoded) uploaded instead of it.
+        The image is released from the source right away, but stays in the in-flight budget
+        until the copy is uploaded, so the total size of copies is limited by the budget too.
+        """
+        self.source.release([path])
+        with self._copies_lock:
+            self._copies[copy_path] = path
+
+    def _get_size(self, path):
+        with self._copies_lock:
+            is_copy = path in self._copies
+        # Copies are written to local disk,
+        # while the source may know sizes of images it has not fetched.
+        return os.path.getsize(path) if is_copy else self.source.get_size(path)
+
+    def release(self, paths):
+        """Releases images that are uploaded or will not be uploaded (e.g. unsupported)."""
+        with self._copies_lock:
+            originals = {path: self._copies.pop(path) for path in paths if path in self._copies}
+        for copy_path in originals:
+            sly.fs.silent_remove(copy_path)
+        self.source.release([path for path in paths if path not in originals])
+        if self.budget is not None:
+            self.budget.release([originals.get(path, path) for path in paths])
+
+    def set_progress_total(self, progress, total):
+        """Sets total of the progress when images are streamed and their number becomes known."""
+        with self._progress_lock:
+            progress.set(progress.current, total, report=False)
+
+    def wait_dataset(self, dataset_id):
+        with self._pending_cond:
+            self._pending_cond.wait_for(
+                lambda: self._pending[dataset_id] == 0 or self._error is not None
+            )
+            self._pending.pop(dataset_id, None)
+        if self._error is not None:
+            raise self._error
+
+    def _upload(self, batch, is_retry=False):
+        try:
+            start = time.monotonic()
+            img_ids = self._upload_fn(self.api, batch, self.profiler)
+            self.batcher.on_success(time.monotonic() - start)
+        except Exception as e:
+            # The limit is decreased once per submitted batch: failures of its halves are caused
+            # by the same error, and rejected items do not mean that batches are too large.
+            if not is_retry and is_transport_error(e):
+                self.batcher.on_failure()
+            if len(batch.names) <= 1:
+                sly.logger.warn(f"Failed to upload images {batch.names}: {repr(e)}")
+                return
+            sly.logger.warn(
+                f"Failed to upload batch of {len(batch.names)} images, "
+                f"it will be uploaded by halves: {repr(e)}"
+            )
+            half = len(batch.names) // 2
+            self._upload(_slice_batch(batch, 0, half, size=0), is_retry=True)
+            self._upload(_slice_batch(batch, half, len(batch.names), size=0), is_retry=True)
+            return
+        if self._on_uploaded is not None:
+            try:
+                self._on_uploaded(batch, img_ids)
+            except Exception as e:
+                sly.logger.warn(msg=e)
+
+    def _run_task(self, task):
+        try:
+            task.fn(*task.args)
+        except Exception as e:
+            sly.logger.warn(
+                f"Failed to run {task.fn.__name__} for dataset {task.dataset_id}: {repr(e)}"
+            )
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if isinstance(item, _Task):
+                self._run_task(item)
+            else:
+                self._process(item)
+            with self._pending_cond:
+                self._pending[item.dataset_id] -= 1
+                self._pending_cond.notify_all()
+
+    def _process(self, batch):
+        try:
+            self._upload(batch)
+            self.release(batch.paths)
+            with self._progress_lock:
+                batch.progress.iters_done_report(batch.size)
+        except Exception as e:
+            # Unexpected error (e.g. in progress reporting): stop accepting new batches.
+            self._error = e
@@ -0,0 +1,214 @@
+import os
+
+import numpy as np
+
+from annotation import RECTANGLE, crop_rects, labels_to_boxes, split_unsupported
+from image_size import get_image_size
+from label_index import LabelIndex, get_labels_dir
+from labels import (
+    CLASS_OUT_OF_RANGE,
+    INVALID_BOX_SIZE,
+    LABEL_FORMATS,
+    MALFORMED_LINE,
+    denormalize_boxes,
+    read_labels,
+)
+from uploader import LABEL_JSON_BYTES
+
+# Number of examples of every issue kept in the report.
+MAX_EXAMPLES = 20
+# Approximate size of annotation JSON without labels.
+ANN_JSON_BYTES = 150
+# Tolerance of normalized coordinates, they are usually written with 6 decimal digits.
+BOUNDS_EPS = 1e-6
+
+DEGENERATE_BOX = "degenerate_box"
+OUT_OF_BOUNDS_BOX = "out_of_bounds_box"
+OUTSIDE_IMAGE_BOX = "outside_image_box"
+UNSUPPORTED_IMAGE = "unsupported_image"
+UNSUPPORTED_FORMAT = "unsupported_format"
+
+ISSUES = [
+    MALFORMED_LINE,
+    CLASS_OUT_OF_RANGE,
+    INVALID_BOX_SIZE,
+    DEGENERATE_BOX,
+    OUT_OF_BOUNDS_BOX,
+    OUTSIDE_IMAGE_BOX,
+    UNSUPPORTED_IMAGE,
+    UNSUPPORTED_FORMAT,
+]
+
+
+class DatasetReport:
+    """
+    Statistics of a dataset collected without upload. Reports of chunks are built by workers
+    and merged in the main process.
+
+    Issues:
+    - malformed_line, class_out_of_range, invalid_box_size: label lines that are skipped on import
+    - degenerate_box: box is smaller than a pixel, it is imported as a 1 pixel rectangle
+    - out_of_bounds_box: box extends beyond the image, it is cropped on import
+    - outside_image_box: box is entirely outside of the image, it is skipped on import
+    - unsupported_image: image can not be read, it is skipped on import
+    - unsupported_format: labels can not be converted to geometry of classes (e.g. boxes
+      in a keypoints project), they are skipped on import
+
+    Boxes of polygons and keypoints labels are their bounding boxes.
+    """
+
+    def __init__(self, classes_count):
+        self.images = 0
+        self.labeled_images = 0
+        self.image_bytes = 0
+        self.upload_bytes = 0
+        self.boxes = 0
+        self.class_histogram = np.zeros(classes_count, dtype=np.int64)
+        self.objects_by_format = dict.fromkeys(LABEL_FORMATS, 0)
+        self.issues = dict.fromkeys(ISSUES, 0)
+        self.examples = {issue: [] for issue in ISSUES}
+        self.label_files = 0
+        self.orphan_labels = 0
+
+    def add_issue(self, issue, count=1, example=None):
+        self.issues[issue] += count
+        if example is not None and len(self.examples[issue]) < MAX_EXAMPLES:
+            self.examples[issue].append(example)
+
+    def merge(self, other):
+        self.images += other.images
+        self.labeled_images += other.labeled_images
+        self.image_bytes += other.image_bytes
+        self.upload_bytes += other.upload_bytes
+        self.boxes += other.boxes
+        self.class_histogram += other.class_histogram
+        for label_format, count in other.objects_by_format.items():
+            self.objects_by_format[label_format] += count
+        for issue in ISSUES:
+            self.issues[issue] += other.issues[issue]
+            free = MAX_EXAMPLES - len(self.examples[issue])
+            self.examples[issue].extend(other.examples[issue][:free])
+        self.label_files += other.label_files
+        self.orphan_labels += other.orphan_labels
+
+    def to_json(self, class_names):
+        return {
+            "images": self.images,
+            "labeled_images": self.labeled_images,
+            "unlabeled_images": self.images - self.labeled_images,
+            "label_files": self.label_files,
+            "orphan_labels": self.orphan_labels,
+            "boxes": self.boxes,
+            "image_bytes": self.image_bytes,
+            "estimated_upload_bytes": self.upload_bytes,
+            "objects_by_format": dict(self.objects_by_format),
+            "class_histogram": dict(zip(class_names, self.class_histogram.tolist())),
+            "issues": dict(self.issues),
+            "examples": {issue: examples for issue, examples in self.examples.items() if examples},
+        }
+
+
+def validate_image(image_path, ann_path, class_names, report, geometry=RECTANGLE, kpt_shape=None):
+    report.images += 1
+    try:
+        image_bytes = os.path.getsize(image_path)
+    except OSError:
+        image_bytes = 0
+    report.image_bytes += image_bytes
+    try:
+        height, width = get_image_size(image_path)
+    except Exception as e:
+        report.add_issue(UNSUPPORTED_IMAGE, example={"filename": image_path, "error": repr(e)})
+        return
+    if ann_path is None:
+        report.upload_bytes += image_bytes + ANN_JSON_BYTES
+        return
+
+    report.labeled_images += 1
+    groups, warnings = read_labels(ann_path, len(class_names), kpt_shape)
+    for message, extra in warnings:
+        report.add_issue(extra["issue"], example=dict(extra, message=message))
+    groups, unsupported = split_unsupported(groups, geometry)
+    for group in unsupported:
+        example = {"filename": ann_path, "format": group.format}
+        report.add_issue(UNSUPPORTED_FORMAT, len(group.class_ids), example)
+    for group in groups:
+        report.objects_by_format[group.format] += len(group.class_ids)
+    class_ids, boxes = labels_to_boxes(groups)
+
+    x1 = boxes[:, 0] - boxes[:, 2] / 2
+    y1 = boxes[:, 1] - boxes[:, 3] / 2
+    x2 = boxes[:, 0] + boxes[:, 2] / 2
+    y2 = boxes[:, 1] + boxes[:, 3] / 2
+    out_of_bounds = (np.minimum(x1, y1) < -BOUNDS_EPS) | (np.maximum(x2, y2) > 1 + BOUNDS_EPS)
+    degenerate = (boxes[:, 2] * width < 1) | (boxes[:, 3] * height < 1)
+    _, keep = crop_rects(denormalize_boxes(boxes, width, height), height, width)
+    for issue, mask in [
+        (DEGENERATE_BOX, degenerate),
+        (OUT_OF_BOUNDS_BOX, out_of_bounds & keep),
+        (OUTSIDE_IMAGE_BOX, ~keep),
+    ]:
+        count = int(mask.sum())
+        if count > 0:
+            box = boxes[np.flatnonzero(mask)[0]].tolist()
+            report.add_issue(issue, count, {"filename": ann_path, "box": box})
+
+    report.boxes += int(keep.sum())
+    report.class_histogram += np.bincount(class_ids[keep], minlength=len(class_names))
+    report.upload_bytes += image_bytes + ANN_JSON_BYTES + LABEL_JSON_BYTES * int(keep.sum())
+
+
+def validate_chunk(items, class_names, geometry=RECTANGLE, kpt_shape=None):
+    """Validates (image_path, ann_path) items and returns their DatasetReport."""
+    report = DatasetReport(len(class_names))
+    for image_path, ann_path in items:
+        validate_image(image_path, ann_path, class_names, report, geometry, kpt_shape)
+    return report
+
+
+def validate_items(items, class_names, source, preparer, geometry=RECTANGLE, kpt_shape=None):
+    """
+    Validates (image_path, ann_path) items locally: image sizes are read from headers, labels are
+    parsed the same way as on import, chunks are processed in the preparation pool.
+    """
+    class_names = tuple(class_names)
+    report = DatasetReport(len(class_names))
+    chunk_reports = preparer.map_chunks(
+        validate_chunk, items, source, class_names, geometry, kpt_shape
+    )
+    for chunk, chunk_report in chunk_reports:
+        source.release([image_path for image_path, _ in chunk])
+        report.merge(chunk_report)
+    return report
+
+
+def validate_dataset(
+    input_dir, dataset_path, class_names, source, preparer, geometry=RECTANGLE, kpt_shape=None
+):
+    label_index = LabelIndex(get_labels_dir(input_dir, dataset_path))
+    items = (
+        (image_path, label_index.find(image_path, dataset_path))
+        for image_path in source.iter_images(dataset_path)
+    )
+    report = validate_items(items, class_names, source, preparer, geometry, kpt_shape)
+    report.label_files = label_index.labels_count
+    report.orphan_labels = label_index.orphans_count
+    return report
+
+
+def summarize_reports(dataset_jsons):
+    """Sums counters and issues of reports of datasets (see `DatasetReport.to_json`)."""
+    keys = [
+        "images",
+        "labeled_images",
+        "unlabeled_images",
+        "boxes",
+        "image_bytes",
+        "estimated_upload_bytes",
+    ]
+    total = {key: sum(dataset_json[key] for dataset_json in dataset_jsons) for key in keys}
+    total["issues"] = {
+        issue: sum(dataset_json["issues"][issue] for dataset_json in dataset_jsons)
+        for issue in ISSUES
+    }
+    return total
@@ -0,0 +1,65 @@
+import itertools
+import os
+
+import supervisely as sly
+
+from archive import JUNK_NAMES
+
+IMAGE = "image"
+LABEL = "label"
+CONFIG = "config"
+UNSUPPORTED = "unsupported"
+
+LABEL_EXTS = [".txt"]
+CONFIG_EXTS = [".yaml"]
+
+
+_KINDS_BY_EXT = {
+    **{ext: CONFIG for ext in CONFIG_EXTS},
+    **{ext: LABEL for ext in LABEL_EXTS},
+    **{ext.lower(): IMAGE for ext in sly.image.SUPPORTED_IMG_EXTS},
+}
+
+
+def classify(path):
+    return _KINDS_BY_EXT.get(os.path.splitext(path)[1].lower(), UNSUPPORTED)
+
+
+def walk_files(root_dir, recursive=True):
+    """
+    Yields (kind, path) of files in `root_dir` in a single pass with os.scandir.
+    The order is deterministic: files of a directory sorted by name, then its subdirectories
+    in the same order. Only the listing of the current directory and paths of directories
+    waiting to be visited are kept in memory. Junk files (e.g. `.DS_Store`, `__MACOSX`) are skipped.
+    """
+    stack = [root_dir]
+    while len(stack) > 0:
+        cur_dir = stack.pop()
+        try:
+            with os.scandir(cur_dir) as it:
+                entries = sorted((entry.name, entry.is_dir(follow_symlinks=False)) for entry in it)
+        except OSError:
+            continue
+        subdirs = []
+        prefix = os.path.join(cur_dir, "")
+        for name, is_dir in entries:
+            # The same check as `archive.is_junk` for a single path component.
+            if name.startswith("._") or name in JUNK_NAMES:
+                continue
+            path = prefix + name
+            if is_dir:
+                subdirs.append(path)
+            else:
+                yield classify(path), path
+        if recursive:
+            stack.extend(reversed(subdirs))
+
+
+def batched(iterable, size):
+    """Splits any iterable (e.g. a stream of files) into lists of at most `size` elements."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if len(batch) == 0:
+            return
+        yield batch
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules of the app are imported by name, as the main script does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
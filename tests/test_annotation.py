@@ -0,0 +1,57 @@
+import numpy as np
+import supervisely as sly
+
+from annotation import BoxAnnotation, build_annotation_json
+from labels import BBOX, LabelGroup, denormalize_boxes
+from preparation import PrepareContext
+
+CLASS_NAMES = ("cat", "dog", "bird")
+
+
+def _sly_annotation_json(img_height, img_width, class_ids, rects, tag_name):
+    obj_classes = [sly.ObjClass(name, sly.Rectangle) for name in CLASS_NAMES]
+    labels = [
+        sly.Label(sly.Rectangle(top, left, bottom, right), obj_classes[class_id])
+        for class_id, (top, left, bottom, right) in zip(class_ids.tolist(), rects.tolist())
+    ]
+    img_tags = sly.TagCollection([sly.Tag(sly.TagMeta(tag_name, sly.TagValueType.NONE))])
+    return sly.Annotation((img_height, img_width), labels=labels, img_tags=img_tags).to_json()
+
+
+def test_box_annotation_matches_sly_annotation():
+    rng = np.random.default_rng(0)
+    img_height, img_width = 480, 640
+    # Normalized boxes partially and completely outside of the image are cropped or removed.
+    boxes = np.concatenate(
+        [
+            rng.uniform(0, 1, size=(200, 2)),
+            rng.uniform(0, 0.6, size=(200, 2)),
+        ],
+        axis=1,
+    )
+    boxes[:10, :2] += 1.5
+    boxes[10:20, :2] -= 0.9
+    class_ids = rng.integers(0, len(CLASS_NAMES), size=len(boxes))
+    rects = denormalize_boxes(boxes, img_width, img_height)
+
+    ann = BoxAnnotation(img_height, img_width, class_ids, rects, CLASS_NAMES, "train")
+    expected = _sly_annotation_json(img_height, img_width, class_ids, rects, "train")
+    assert ann.to_json() == expected
+    assert 0 < len(expected["objects"]) < len(boxes)
+
+
+def test_box_annotation_without_labels():
+    ann = BoxAnnotation(10, 20, np.empty(0, dtype=np.int64), np.empty((0, 4)), CLASS_NAMES, "val")
+    assert ann.to_json() == _sly_annotation_json(
+        10, 20, np.empty(0, dtype=np.int64), np.empty((0, 4)), "val"
+    )
+
+
+def test_build_annotation_json_of_boxes():
+    group = LabelGroup(
+        BBOX, np.array([2, 0]), np.array([[0.5, 0.5, 0.2, 0.4], [0.1, 0.1, 0.2, 0.2]]), None
+    )
+    ann_json = build_annotation_json(100, 200, [group], PrepareContext(CLASS_NAMES, "train"))
+    assert [obj["classTitle"] for obj in ann_json["objects"]] == ["bird", "cat"]
+    assert ann_json["objects"][0]["points"]["exterior"] == [[80, 30], [120, 70]]
+    assert ann_json["tags"] == [{"name": "train"}]
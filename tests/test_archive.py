@@ -0,0 +1,118 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from archive import extract_tar_stream, extract_zip, is_junk, safe_member_path
+from sources import TarSource, ZipSource
+
+
+def _list_files(root_dir):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), root_dir)
+        for root, _, files in os.walk(root_dir)
+        for name in files
+    )
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("project/images/a.jpg", False),
+        ("project/._a.jpg", True),
+        ("__MACOSX/project/a.jpg", True),
+        ("project/.DS_Store", True),
+        ("project\\Thumbs.db", True),
+        ("/", True),
+        ("", True),
+    ],
+)
+def test_is_junk(name, expected):
+    assert is_junk(name) == expected
+
+
+def test_safe_member_path(tmp_path):
+    extract_dir = str(tmp_path / "out")
+    assert safe_member_path(extract_dir, "a/b.jpg") == os.path.join(extract_dir, "a", "b.jpg")
+    assert safe_member_path(extract_dir, "a/../b.jpg") == os.path.join(extract_dir, "b.jpg")
+    assert safe_member_path(extract_dir, "../b.jpg") is None
+    assert safe_member_path(extract_dir, "a/../../b.jpg") is None
+    assert safe_member_path(extract_dir, "/etc/passwd") is None
+    # A sibling directory with the same prefix is outside too.
+    assert safe_member_path(extract_dir, "../out2/b.jpg") is None
+
+
+def test_extract_tar_stream_skips_junk_and_unsafe_members(tmp_path):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as archive:
+        for name, content in [
+            ("project/images/a.jpg", b"a"),
+            ("project/labels/a.txt", b"0 0.5 0.5 0.1 0.1"),
+            ("project/._a.jpg", b"junk"),
+            ("__MACOSX/project/a.jpg", b"junk"),
+            ("../evil.txt", b"evil"),
+        ]:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    data.seek(0)
+    extract_dir = str(tmp_path / "out")
+    assert extract_tar_stream(data, extract_dir) == 2
+    assert _list_files(extract_dir) == ["project/images/a.jpg", "project/labels/a.txt"]
+    assert not (tmp_path / "evil.txt").exists()
+
+
+def test_extract_zip_skips_junk_and_unsafe_members(tmp_path):
+    archive_path = str(tmp_path / "input.zip")
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("project/images/a.jpg", b"a")
+        archive.writestr("project/labels/a.txt", b"0 0.5 0.5 0.1 0.1")
+        archive.writestr("project/._a.jpg", b"junk")
+        archive.writestr("__MACOSX/project/a.jpg", b"junk")
+        archive.writestr("project/.DS_Store", b"junk")
+        archive.writestr("../evil.txt", b"evil")
+    extract_dir = str(tmp_path / "out")
+    assert extract_zip(archive_path, extract_dir, workers=2) == 2
+    assert _list_files(extract_dir) == ["project/images/a.jpg", "project/labels/a.txt"]
+    assert not (tmp_path / "evil.txt").exists()
+
+
+def test_zip_source_extracts_images_on_demand(tmp_path):
+    archive_path = str(tmp_path / "input.zip")
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("project/images/a.jpg", b"a")
+        archive.writestr("project/labels/a.txt", b"0 0.5 0.5 0.1 0.1")
+        archive.writestr("project/._a.jpg", b"junk")
+    extract_dir = str(tmp_path / "out")
+    source = ZipSource(archive_path, extract_dir)
+    assert _list_files(extract_dir) == ["project/labels/a.txt"]
+    [image_path] = source.iter_images(os.path.join(extract_dir, "project", "images"))
+    source.fetch([image_path])
+    with open(image_path, "rb") as f:
+        assert f.read() == b"a"
+    source.release([image_path])
+    assert not os.path.exists(image_path)
+
+
+def test_tar_source_extracts_images_on_demand(tmp_path):
+    archive_path = str(tmp_path / "input.tar.gz")
+    with tarfile.open(archive_path, "w:gz") as archive:
+        for name, content in [
+            ("project/images/a.jpg", b"a"),
+            ("project/labels/a.txt", b"0 0.5 0.5 0.1 0.1"),
+            ("project/._a.jpg", b"junk"),
+        ]:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    extract_dir = str(tmp_path / "out")
+    source = TarSource(archive_path, extract_dir)
+    assert _list_files(extract_dir) == ["project/labels/a.txt"]
+    [image_path] = source.iter_images(os.path.join(extract_dir, "project", "images"))
+    source.fetch([image_path])
+    with open(image_path, "rb") as f:
+        assert f.read() == b"a"
+    source.release([image_path])
+    assert not os.path.exists(image_path)
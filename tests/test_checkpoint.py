@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+from checkpoint import (
+    ImportJournal,
+    get_or_create_datasets,
+    get_or_create_project,
+    get_uploaded_names,
+    journal_path,
+)
+
+
+class FakeApi:
+    """Projects, datasets and images of the server used by the journal helpers."""
+
+    def __init__(self):
+        self.ids = iter(range(1, 1000))
+        self.projects = {}
+        self.datasets = {}
+        self.images = {}
+        self.removed = []
+        self.project = SimpleNamespace(
+            create=self._create_project, get_info_by_id=lambda id: self.projects.get(id)
+        )
+        self.dataset = SimpleNamespace(
+            create=self._create_dataset,
+            get_list=lambda project_id: [
+                info for info in self.datasets.values() if info.project_id == project_id
+            ],
+        )
+        self.image = SimpleNamespace(
+            get_list=lambda dataset_id: [
+                info for info in self.images.values() if info.dataset_id == dataset_id
+            ],
+            remove_batch=self._remove_images,
+        )
+
+    def _create_project(self, workspace_id, name, change_name_if_conflict=False):
+        info = SimpleNamespace(id=next(self.ids), name=name)
+        self.projects[info.id] = info
+        return info
+
+    def _create_dataset(self, project_id, name, change_name_if_conflict=False):
+        info = SimpleNamespace(id=next(self.ids), name=name, project_id=project_id)
+        self.datasets[info.id] = info
+        return info
+
+    def add_image(self, dataset_id, name):
+        info = SimpleNamespace(id=next(self.ids), name=name, dataset_id=dataset_id)
+        self.images[info.id] = info
+        return info.id
+
+    def _remove_images(self, ids):
+        self.removed.extend(ids)
+        for id in ids:
+            self.images.pop(id)
+
+
+def test_journal_path_is_stable(tmp_path):
+    path = journal_path(str(tmp_path), 1, "/my data/project.zip")
+    assert path == journal_path(str(tmp_path), 1, "/my data/project.zip")
+    assert path != journal_path(str(tmp_path), 2, "/my data/project.zip")
+    assert path.endswith(".jsonl") and " " not in path
+
+
+def test_resume(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    api = FakeApi()
+    journal = ImportJournal(path)
+    project = get_or_create_project(api, journal, "project", 1, "project")
+    datasets = get_or_create_datasets(api, journal, "project", project.id, [("train", "train")])
+    dataset, resumed = datasets["train"]
+    assert not resumed
+    ids = [api.add_image(dataset.id, name) for name in ["a.jpg", "b.jpg"]]
+    journal.add_batch(dataset.id, ["a.jpg", "b.jpg"], ids)
+    # The next batch is uploaded, but the task is killed before the journal record is complete.
+    api.add_image(dataset.id, "c.jpg")
+    with open(path, "a") as f:
+        f.write('{"event": "batch", "dataset_id": ')
+
+    journal = ImportJournal(path, resume=True)
+    assert get_or_create_project(api, journal, "project", 1, "project") is project
+    datasets = get_or_create_datasets(api, journal, "project", project.id, [("train", "train")])
+    assert datasets["train"] == (dataset, True)
+    assert get_uploaded_names(api, journal, dataset.id) == {"a.jpg", "b.jpg"}
+    # Images of the interrupted batch are removed to be uploaded again.
+    assert [info.name for info in api.images.values()] == ["a.jpg", "b.jpg"]
+    assert len(api.removed) == 1
+    assert len(api.projects) == 1 and len(api.datasets) == 1
+
+
+def test_removed_project_is_created_again(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    api = FakeApi()
+    project = get_or_create_project(api, ImportJournal(path), "project", 1, "project")
+    api.projects.pop(project.id)
+    journal = ImportJournal(path, resume=True)
+    new_project = get_or_create_project(api, journal, "project", 1, "project")
+    assert new_project.id != project.id
+    assert journal.get_project_id("project") == new_project.id
+
+
+def test_journal_without_resume_starts_over(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    ImportJournal(path).add_project("project", 1)
+    journal = ImportJournal(path, resume=False)
+    assert journal.get_project_id("project") is None
+    assert ImportJournal(path, resume=True).get_project_id("project") is None
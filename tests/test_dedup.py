@@ -0,0 +1,114 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from dedup import DedupUploader, ImageHasher, get_file_hash
+from profiler import Profiler
+from uploader import UploadBatch
+
+
+class FakeApi:
+    """Image payloads and images of the server, upload of a payload takes `delay` seconds."""
+
+    def __init__(self, payloads=(), delay=0, fail_names=()):
+        self.delay = delay
+        self.fail_names = set(fail_names)
+        self.payloads = set(payloads)
+        self.payload_uploads = []
+        self.images = {}
+        self.ids = iter(range(1, 1000))
+        self.lock = threading.Lock()
+        self.image = SimpleNamespace(
+            check_existing_hashes=lambda hashes: [h for h in hashes if h in self.payloads],
+            upload_paths=self._upload_paths,
+            upload_hashes=self._upload_hashes,
+            remove_batch=lambda ids: [self.images.pop(id) for id in ids],
+        )
+        self.annotation = SimpleNamespace(upload_jsons=lambda img_ids, anns: None)
+
+    def _upload_paths(self, dataset_id, names, paths, metas=None):
+        # Like the SDK: payloads missing on the server are found and then uploaded.
+        hashes = [get_file_hash(path) for path in paths]
+        with self.lock:
+            missing = set(hashes) - self.payloads
+        time.sleep(self.delay)
+        with self.lock:
+            self.payload_uploads.extend(missing)
+            self.payloads.update(missing)
+        return self._upload_hashes(dataset_id, names, hashes)
+
+    def _upload_hashes(self, dataset_id, names, hashes, metas=None):
+        infos = []
+        with self.lock:
+            for name, file_hash in zip(names, hashes):
+                if name in self.fail_names:
+                    raise ConnectionError(name)
+                assert file_hash in self.payloads
+                info = SimpleNamespace(id=next(self.ids), name=name, hash=file_hash)
+                self.images[info.id] = (dataset_id, info)
+                infos.append(info)
+        return infos
+
+
+@pytest.fixture
+def paths(tmp_path):
+    result = []
+    for name, data in [("a.jpg", b"a"), ("b.jpg", b"b"), ("a_copy.jpg", b"a"), ("c.jpg", b"c")]:
+        path = tmp_path / name
+        path.write_bytes(data)
+        result.append(str(path))
+    return result
+
+
+def _batch(dataset_id, paths):
+    names = [path.rsplit("/", 1)[-1] for path in paths]
+    return UploadBatch(dataset_id, names, paths, None, None, len(paths))
+
+
+def _upload(api, uploader, batch):
+    img_ids = uploader(api, batch, Profiler(enabled=False))
+    return [(api.images[id][0], api.images[id][1].name) for id in img_ids]
+
+
+def test_every_payload_is_uploaded_once(paths):
+    api = FakeApi(payloads=[get_file_hash(paths[3])])
+    uploader = DedupUploader(ImageHasher(2))
+    # Images are returned in the order of the batch.
+    assert _upload(api, uploader, _batch(1, paths)) == [
+        (1, "a.jpg"),
+        (1, "b.jpg"),
+        (1, "a_copy.jpg"),
+        (1, "c.jpg"),
+    ]
+    assert _upload(api, uploader, _batch(2, paths[:2])) == [(2, "a.jpg"), (2, "b.jpg")]
+    assert sorted(api.payload_uploads) == sorted(get_file_hash(path) for path in paths[:2])
+    assert uploader.images_count == 6 and uploader.uploaded_count == 2
+
+
+def test_concurrent_batches_upload_shared_payload_once(paths):
+    api = FakeApi(delay=0.2)
+    uploader = DedupUploader(ImageHasher(2))
+    threads = [
+        threading.Thread(target=_upload, args=(api, uploader, _batch(dataset_id, paths[:2])))
+        for dataset_id in [1, 2, 3]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(api.payload_uploads) == 2
+    assert len(api.images) == 6
+
+
+def test_failed_batch_is_removed(paths):
+    api = FakeApi(fail_names=["a_copy.jpg"])
+    uploader = DedupUploader(ImageHasher(2))
+    with pytest.raises(ConnectionError):
+        uploader(api, _batch(1, paths), Profiler(enabled=False))
+    # Images added before the failure are removed, so the batch can be uploaded again.
+    assert api.images == {}
+    api.fail_names.clear()
+    assert len(_upload(api, uploader, _batch(1, paths))) == 4
+    assert len(api.payload_uploads) == 3
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+from delta import CHANGED_IMAGE, CHANGED_LABELS, NEW, UNCHANGED, DatasetDelta
+from preparation import LABEL_HASH_KEY, PrepareContext, get_label_hash, prepare_image
+from sources import LocalSource
+from uploader import UploadPipeline
+
+CONTEXT = PrepareContext(("cat",), "train", label_hash=True)
+
+
+class FakeApi:
+    """Records annotation, meta and removal requests of the delta import."""
+
+    def __init__(self):
+        self.anns = {}
+        self.metas = {}
+        self.removed = []
+        self.annotation = SimpleNamespace(upload_jsons=self._upload_jsons)
+        self.image = SimpleNamespace(
+            update_meta=lambda id, meta: self.metas.__setitem__(id, meta),
+            remove_batch=self.removed.extend,
+        )
+
+    def _upload_jsons(self, img_ids, anns):
+        self.anns.update(zip(img_ids, anns))
+
+
+def _write(tmp_path, name, data, label=None):
+    image_path = tmp_path / "images" / name
+    image_path.parent.mkdir(exist_ok=True)
+    image_path.write_bytes(data)
+    ann_path = None
+    if label is not None:
+        ann_path = tmp_path / "labels" / (name.rsplit(".", 1)[0] + ".txt")
+        ann_path.parent.mkdir(exist_ok=True)
+        ann_path.write_text(label)
+        ann_path = str(ann_path)
+    return str(image_path), ann_path
+
+
+def _info(id, name, size, meta=None):
+    return SimpleNamespace(id=id, name=name, size=size, meta=meta, height=10, width=20, hash=None)
+
+
+def test_dataset_delta(tmp_path):
+    items = [
+        _write(tmp_path, "a.jpg", b"a", "0 0.5 0.5 0.2 0.2\n"),
+        _write(tmp_path, "b.jpg", b"b", "0 0.5 0.5 0.2 0.2\n"),
+        _write(tmp_path, "d.jpg", b"dd"),
+        _write(tmp_path, "e.jpg", b"e"),
+    ]
+    remote_images = {
+        "a.jpg": _info(1, "a.jpg", 1, {LABEL_HASH_KEY: get_label_hash(items[0][1], CONTEXT)}),
+        # Uploaded by an ordinary import, without the fingerprint of labels.
+        "b.jpg": _info(2, "b.jpg", 1),
+        "c.jpg": _info(3, "c.jpg", 1),
+        "d.jpg": _info(4, "d.jpg", 1),
+    }
+    delta = DatasetDelta(1, remote_images, remove_deleted=True)
+    api = FakeApi()
+    with UploadPipeline(api, LocalSource()) as pipeline:
+        assert list(delta.filter(iter(items), CONTEXT, LocalSource())) == items[2:]
+        delta.finish(api, pipeline, CONTEXT)
+        pipeline.wait_dataset(1)
+    assert delta.counts == {NEW: 1, CHANGED_IMAGE: 1, CHANGED_LABELS: 1, UNCHANGED: 1}
+    assert delta.skipped_count == 2
+    # The annotation is built for the size of the uploaded image.
+    expected = prepare_image(*items[1], CONTEXT, size=(10, 20))
+    assert api.anns == {2: expected.ann_json}
+    assert api.metas == {2: expected.meta}
+    assert api.removed == [3] and delta.removed_count == 1
+
+
+def test_label_hash_is_stored_only_with_delta(tmp_path):
+    image_path, ann_path = _write(tmp_path, "a.jpg", b"a", "0 0.5 0.5 0.2 0.2\n")
+    context = CONTEXT._replace(label_hash=False)
+    assert prepare_image(image_path, ann_path, context, size=(10, 20)).meta is None
+    meta = prepare_image(image_path, ann_path, CONTEXT, size=(10, 20)).meta
+    assert meta == {LABEL_HASH_KEY: get_label_hash(ann_path, CONTEXT)}
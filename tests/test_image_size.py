@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+import supervisely as sly
+
+from image_size import get_image_size, read_header_size
+
+FORMATS = [".jpg", ".png", ".webp", ".bmp", ".tiff"]
+
+
+def _write_image(tmp_path, ext, height=30, width=50):
+    path = str(tmp_path / f"image{ext}")
+    img = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    assert cv2.imwrite(path, img)
+    return path
+
+
+def _truncate(path, size):
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:size])
+
+
+@pytest.mark.parametrize("ext", FORMATS)
+def test_header_size_matches_decoded_size(tmp_path, ext):
+    path = _write_image(tmp_path, ext)
+    assert read_header_size(path) == (30, 50)
+    assert get_image_size(path) == sly.image.read(path).shape[:2]
+
+
+def test_png_with_padding_after_end(tmp_path):
+    path = _write_image(tmp_path, ".png")
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 100)
+    assert read_header_size(path) == (30, 50)
+
+
+@pytest.mark.parametrize("ext", [".jpg", ".png", ".webp", ".bmp"])
+def test_truncated_image_is_decoded(tmp_path, ext):
+    path = _write_image(tmp_path, ext, 300, 500)
+    with open(path, "rb") as f:
+        size = len(f.read())
+    _truncate(path, size // 2)
+    assert read_header_size(path) is None
+
+
+def _decode_size(path):
+    """Size as the baseline reads it: validation and full decode of the image."""
+    try:
+        sly.image.validate_format(path)
+        return sly.image.read(path).shape[:2]
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("ext", [".jpg", ".png"])
+def test_truncated_image_falls_back_to_decoding(tmp_path, monkeypatch, ext):
+    path = _write_image(tmp_path, ext, 300, 500)
+    _truncate(path, 4000)
+    expected = _decode_size(path)
+    decoded = []
+    read = sly.image.read
+    monkeypatch.setattr(sly.image, "read", lambda path: decoded.append(path) or read(path))
+    try:
+        size = get_image_size(path)
+    except Exception as e:
+        size = type(e)
+    assert decoded == [path]
+    assert size == expected
+
+
+def test_unknown_format(tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(b"not an image" * 10)
+    assert read_header_size(str(path)) is None
+    with pytest.raises(Exception):
+        get_image_size(str(path))
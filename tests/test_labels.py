@@ -0,0 +1,77 @@
+import numpy as np
+
+from labels import (
+    BBOX,
+    CLASS_OUT_OF_RANGE,
+    INVALID_BOX_SIZE,
+    MALFORMED_LINE,
+    POLYGON,
+    POSE,
+    read_labels,
+)
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "labels.txt"
+    path.write_text(text)
+    return str(path)
+
+
+def test_bbox(tmp_path):
+    path = _write(tmp_path, "0 0.5 0.5 0.2 0.4\n1 0.1 0.2 0.3 0.4\n")
+    groups, warnings = read_labels(path, 2)
+    assert warnings == []
+    assert len(groups) == 1
+    assert groups[0].format == BBOX
+    assert groups[0].class_ids.tolist() == [0, 1]
+    np.testing.assert_allclose(groups[0].coords, [[0.5, 0.5, 0.2, 0.4], [0.1, 0.2, 0.3, 0.4]])
+
+
+def test_polygon(tmp_path):
+    path = _write(tmp_path, "1 0.1 0.1 0.5 0.1 0.5 0.5\n0 0.2 0.2 0.4 0.2 0.4 0.4 0.2 0.4\n")
+    groups, warnings = read_labels(path, 2)
+    assert warnings == []
+    assert [group.format for group in groups] == [POLYGON, POLYGON]
+    assert [group.class_ids.tolist() for group in groups] == [[1], [0]]
+    assert [group.line_nums.tolist() for group in groups] == [[0], [1]]
+
+
+def test_pose(tmp_path):
+    path = _write(tmp_path, "0 0.5 0.5 0.2 0.2 0.45 0.45 2 0.55 0.55 1\n")
+    groups, warnings = read_labels(path, 1, kpt_shape=(2, 3))
+    assert warnings == []
+    assert groups[0].format == POSE
+    assert groups[0].coords.shape == (1, 10)
+    # Without keypoints shape in the config the line is a polygon.
+    groups, _ = read_labels(path, 1)
+    assert groups[0].format == POLYGON
+
+
+def test_malformed_lines_are_skipped(tmp_path):
+    path = _write(
+        tmp_path,
+        "0 0.5 0.5 0.2 0.2\n"
+        "0 0.5 0.5\n"
+        "1 a 0.5 0.2 0.2\n"
+        "\n"
+        "5 0.5 0.5 0.2 0.2\n"
+        "1 0.5 0.5 -0.2 0.2\n"
+        "1 0.1 0.1 0.5 0.1 0.5 0.5\n"
+        "1 0.3 0.3 0.1 0.1\n",
+    )
+    groups, warnings = read_labels(path, 2)
+    assert [(extra["line_num"], extra["issue"]) for _, extra in warnings] == [
+        (1, MALFORMED_LINE),
+        (2, MALFORMED_LINE),
+        (4, CLASS_OUT_OF_RANGE),
+        (5, INVALID_BOX_SIZE),
+    ]
+    assert all(extra["filename"] == path for _, extra in warnings)
+    by_format = {group.format: group for group in groups}
+    assert by_format[BBOX].class_ids.tolist() == [0, 1]
+    assert by_format[BBOX].line_nums.tolist() == [0, 7]
+    assert by_format[POLYGON].line_nums.tolist() == [6]
+
+
+def test_empty_file(tmp_path):
+    assert read_labels(_write(tmp_path, "\n  \n"), 1) == ([], [])
@@ -0,0 +1,15 @@
+from palette import generate_colors
+
+
+def test_colors_are_unique():
+    for count in range(1, 1001):
+        colors = generate_colors(count)
+        assert len(colors) == count
+        assert len({tuple(color) for color in colors}) == count
+        assert all(0 <= channel <= 255 for color in colors for channel in color)
+
+
+def test_colors_are_deterministic():
+    colors = generate_colors(1000)
+    assert generate_colors(10) == colors[:10]
+    assert generate_colors(1000) == colors
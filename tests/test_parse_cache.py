@@ -0,0 +1,50 @@
+import os
+
+from parse_cache import ParseCache, get_cache_key
+from preparation import PrepareContext
+
+
+def test_cache_key_depends_on_files_and_settings(tmp_path):
+    image_path = tmp_path / "a.jpg"
+    ann_path = tmp_path / "a.txt"
+    image_path.write_bytes(b"a")
+    ann_path.write_text("0 0.5 0.5 0.1 0.1")
+    context = PrepareContext(["cat"], None)
+    key = get_cache_key(str(image_path), str(ann_path), context)
+    assert key == get_cache_key(str(image_path), str(ann_path), PrepareContext(["cat"], None))
+    assert key != get_cache_key(str(image_path), str(ann_path), PrepareContext(["dog"], None))
+    assert key != get_cache_key(str(image_path), str(ann_path), context._replace(label_hash=True))
+    assert key != get_cache_key(str(image_path), None, context)
+    ann_path.write_text("0 0.5 0.5 0.1 0.1\n1 0.5 0.5 0.2 0.2")
+    assert key != get_cache_key(str(image_path), str(ann_path), context)
+    assert get_cache_key(str(tmp_path / "missing.jpg"), None, context) is None
+
+
+def test_entries_are_buffered_and_persisted(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ParseCache(path, 1024 * 1024)
+    cache.put_many([("a", {"size": {"width": 1, "height": 1}}, [], None)])
+    assert cache.total_bytes == 0
+    cache.close()
+    cache = ParseCache(path, 1024 * 1024)
+    assert cache.get_many(["a", "b", None]) == {
+        "a": [{"size": {"width": 1, "height": 1}}, [], None]
+    }
+    assert cache.hits == 1 and cache.misses == 1
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.sqlite3"), 1024 * 1024)
+    for key in ["a", "b", "c"]:
+        # Random data is not compressed, so the entries are about the same size.
+        cache.put_many([(key, os.urandom(512).hex(), [], None)])
+        cache.flush()
+    # The limit is exceeded by the fourth entry.
+    cache.max_bytes = cache.total_bytes * 7 // 6
+    cache.get_many(["a"])
+    cache.put_many([("d", os.urandom(512).hex(), [], None)])
+    cache.flush()
+    assert sorted(cache.get_many(["a", "b", "c", "d"])) == ["a", "c", "d"]
+    assert cache.evicted_count == 1 and cache.total_bytes <= cache.max_bytes
+    cache.close()
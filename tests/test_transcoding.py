@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import supervisely as sly
+
+from transcoding import (
+    JPEG,
+    TranscodeSettings,
+    find_name_collisions,
+    get_transcoded_name,
+    transcode_image,
+)
+
+
+def _settings(tmp_path, format=JPEG, max_side=0):
+    temp_dir = tmp_path / "transcoded"
+    temp_dir.mkdir(exist_ok=True)
+    return TranscodeSettings(format, 90, max_side, str(temp_dir))
+
+
+def test_transcoded_name(tmp_path):
+    settings = _settings(tmp_path)
+    assert get_transcoded_name("image.bmp", settings) == "image.jpg"
+    assert get_transcoded_name("image.bmp", settings, keep_ext=True) == "image.bmp.jpg"
+    assert get_transcoded_name("image.JPEG", settings, keep_ext=True) == "image.JPEG"
+
+
+def test_name_collisions(tmp_path):
+    settings = _settings(tmp_path)
+    paths = [
+        "ds/images/a.bmp",
+        "ds/images/a.jpg",
+        "ds/images/b.bmp",
+        "ds/images/c.bmp",
+        "ds/images/c.png",
+        "ds/other/a.png",
+    ]
+    assert find_name_collisions(paths, settings) == {
+        "ds/images/a.bmp",
+        "ds/images/c.bmp",
+        "ds/images/c.png",
+    }
+    # Names are kept as is, so images do not collide.
+    assert find_name_collisions(paths, _settings(tmp_path, format=None)) == set()
+
+
+def test_colliding_images_are_uploaded_with_unique_names(tmp_path):
+    settings = _settings(tmp_path)
+    img = np.random.default_rng(0).integers(0, 255, (32, 48, 3), dtype=np.uint8)
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    paths = []
+    for name in ["foo.jpg", "foo.png"]:
+        paths.append(str(images_dir / name))
+        sly.image.write(paths[-1], img)
+
+    renamed = find_name_collisions(paths, settings)
+    assert renamed == {paths[1]}
+    transcoded = transcode_image(paths[1], settings)
+    assert transcoded is not None
+    assert (transcoded.height, transcoded.width) == (32, 48)
+    names = [
+        os.path.basename(paths[0]),
+        get_transcoded_name(os.path.basename(paths[1]), settings, paths[1] in renamed),
+    ]
+    assert names == ["foo.jpg", "foo.png.jpg"]
@@ -0,0 +1,136 @@
+from types import SimpleNamespace
+
+import requests
+
+from sources import LocalSource
+from uploader import AdaptiveBatcher, UploadBatch, UploadPipeline, is_transport_error
+
+MB = 1024 * 1024
+
+
+class FakeApi:
+    """Uploads images by name: `bad_names` are rejected, `flaky_names` fail once with a timeout."""
+
+    def __init__(self, bad_names=(), flaky_names=()):
+        self.bad_names = set(bad_names)
+        self.flaky_names = set(flaky_names)
+        self.uploaded = []
+        self.requests = []
+        self.image = SimpleNamespace(upload_paths=self._upload_paths)
+
+    def _upload_paths(self, dataset_id, names, paths, metas=None):
+        self.requests.append(list(names))
+        for name in names:
+            if name in self.bad_names:
+                raise ValueError(f"Image {name} is rejected")
+            if name in self.flaky_names:
+                self.flaky_names.remove(name)
+                raise requests.Timeout()
+        self.uploaded.extend(names)
+        return [
+            SimpleNamespace(id=len(self.uploaded) - len(names) + idx) for idx in range(len(names))
+        ]
+
+
+def _write_images(tmp_path, count, size=1000):
+    paths = []
+    for idx in range(count):
+        path = tmp_path / f"{idx}.jpg"
+        path.write_bytes(b"\0" * size)
+        paths.append(str(path))
+    return paths
+
+
+def _upload(api, batcher, batches):
+    progress = SimpleNamespace(done=0)
+    progress.iters_done_report = lambda count: setattr(progress, "done", progress.done + count)
+    with UploadPipeline(api, LocalSource(), concurrency=1, batcher=batcher) as pipeline:
+        for paths in batches:
+            names = [path.rsplit("/", 1)[-1] for path in paths]
+            pipeline.submit(UploadBatch(1, names, paths, None, progress, len(paths)))
+    return progress.done
+
+
+def test_split_by_limit_and_max_items(tmp_path):
+    paths = _write_images(tmp_path, 10)
+    batch = UploadBatch(1, [str(idx) for idx in range(10)], paths, None, None, 12)
+    batcher = AdaptiveBatcher(initial_bytes=3000, min_bytes=1000, max_items=2)
+    parts = batcher.split(batch, batcher.get_payload(batch, LocalSource().get_size))
+    assert [len(part.names) for part in parts] == [2, 2, 2, 2, 2]
+    # Skipped items of the batch are reported with the last part.
+    assert [part.size for part in parts] == [2, 2, 2, 2, 4]
+    batcher = AdaptiveBatcher(initial_bytes=3500, min_bytes=1000)
+    assert [len(part.names) for part in batcher.split(batch, [1000] * 10)] == [3, 3, 3, 1]
+
+
+def test_limit_is_adjusted_aimd(tmp_path):
+    batcher = AdaptiveBatcher(16 * MB, target_seconds=10, min_bytes=4 * MB, step_bytes=MB)
+    batcher.on_success(1)
+    assert batcher.limit_bytes == 17 * MB
+    batcher.on_success(20)
+    assert batcher.limit_bytes == 17 * MB // 2
+    batcher.on_failure()
+    batcher.on_failure()
+    assert batcher.limit_bytes == 4 * MB
+    batcher.on_success(1)
+    assert batcher.limit_bytes == 5 * MB
+
+
+def test_transport_errors():
+    assert is_transport_error(requests.ConnectionError())
+    assert is_transport_error(TimeoutError())
+    response = requests.Response()
+    response.status_code = 503
+    assert is_transport_error(requests.HTTPError(response=response))
+    response.status_code = 400
+    assert not is_transport_error(requests.HTTPError(response=response))
+    assert not is_transport_error(ValueError())
+
+
+def test_rejected_item_is_isolated_without_shrinking_the_limit(tmp_path):
+    paths = _write_images(tmp_path, 8)
+    api = FakeApi(bad_names=["5.jpg"])
+    batcher = AdaptiveBatcher(initial_bytes=8 * MB, min_bytes=MB, step_bytes=MB)
+    assert _upload(api, batcher, [paths]) == 8
+    assert sorted(api.uploaded) == sorted(f"{idx}.jpg" for idx in range(8) if idx != 5)
+    # The batch is retried by halves until the rejected image is left alone.
+    assert [names for names in api.requests if len(names) < 4] == [
+        ["4.jpg", "5.jpg"],
+        ["4.jpg"],
+        ["5.jpg"],
+        ["6.jpg", "7.jpg"],
+    ]
+    # Halves of the batch succeed fast, a rejected item does not shrink the limit.
+    assert batcher.limit_bytes > 8 * MB
+
+
+def test_limit_recovers_after_transport_error(tmp_path):
+    paths = _write_images(tmp_path, 8)
+    api = FakeApi(flaky_names=["0.jpg", "1.jpg"])
+    batcher = AdaptiveBatcher(initial_bytes=8 * MB, min_bytes=MB, step_bytes=MB)
+    assert _upload(api, batcher, [paths[:4]]) == 4
+    assert sorted(api.uploaded) == [f"{idx}.jpg" for idx in range(4)]
+    # The limit is halved once per submitted batch, not for every failed half,
+    # and grows after each of the three halves uploaded then.
+    assert batcher.limit_bytes == 4 * MB + 3 * MB
+    assert _upload(api, batcher, [paths[4:6], paths[6:]]) == 4
+    assert batcher.limit_bytes == 9 * MB
+
+
+def test_tasks_run_along_with_batches(tmp_path):
+    paths = _write_images(tmp_path, 4)
+    api = FakeApi()
+    done = []
+
+    def _fail():
+        raise ValueError("Task is failed")
+
+    with UploadPipeline(api, LocalSource(), concurrency=2) as pipeline:
+        progress = SimpleNamespace(iters_done_report=lambda count: None)
+        pipeline.submit(UploadBatch(1, ["0.jpg", "1.jpg"], paths[:2], None, progress, 2))
+        pipeline.submit_task(1, done.append, "update")
+        pipeline.submit_task(1, _fail)
+        pipeline.submit(UploadBatch(1, ["2.jpg", "3.jpg"], paths[2:], None, progress, 2))
+        pipeline.wait_dataset(1)
+        # A failed task does not stop the pipeline.
+        assert done == ["update"] and len(api.uploaded) == 4
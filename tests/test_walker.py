@@ -0,0 +1,44 @@
+import os
+
+from walker import CONFIG, IMAGE, LABEL, UNSUPPORTED, batched, walk_files
+
+
+def _touch(root_dir, names):
+    for name in names:
+        path = root_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+
+
+def test_walk_files_order_and_kinds(tmp_path):
+    _touch(
+        tmp_path,
+        ["data.yaml", "b/labels/1.txt", "a/2.PNG", "a/1.jpg", "a/sub/3.jpg", "a/notes.md"],
+    )
+    files = [(kind, os.path.relpath(path, tmp_path)) for kind, path in walk_files(str(tmp_path))]
+    assert files == [
+        (CONFIG, "data.yaml"),
+        (IMAGE, "a/1.jpg"),
+        (IMAGE, "a/2.PNG"),
+        (UNSUPPORTED, "a/notes.md"),
+        (IMAGE, "a/sub/3.jpg"),
+        (LABEL, "b/labels/1.txt"),
+    ]
+    assert [path for _, path in walk_files(str(tmp_path / "a"), recursive=False)] == [
+        str(tmp_path / "a" / name) for name in ["1.jpg", "2.PNG", "notes.md"]
+    ]
+
+
+def test_walk_files_skips_junk(tmp_path):
+    _touch(
+        tmp_path, ["images/b.jpg", "images/a.png", "images/._a.png", ".DS_Store", "__MACOSX/c.jpg"]
+    )
+    assert [os.path.relpath(path, tmp_path) for _, path in walk_files(str(tmp_path))] == [
+        "images/a.png",
+        "images/b.jpg",
+    ]
+
+
+def test_batched():
+    assert list(batched(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 2)) == []